@@ -1,9 +1,14 @@
 import json
 import streamlit as st
+from clients import MissingKeyError
+from deadline import DEADLINE_S
+from log_sink import load_run
 from main_langchain import run_agent
 
 st.set_page_config(page_title="AutoResearch Agent", page_icon="🧠", layout="wide")
 
+LOG_PAGE_SIZES = [10, 25, 50, 100]
+
 # ---------- Styles ----------
 st.markdown("""
 <style>
@@ -24,6 +29,49 @@ if "final_answer" not in st.session_state:
     st.session_state.final_answer = ""
 if "thinking_log" not in st.session_state:
     st.session_state.thinking_log = []
+if "run_id" not in st.session_state:
+    st.session_state.run_id = None
+
+
+# ---------- Thinking log rendering ----------
+# Reruns happen on every widget interaction, so nothing here may cost O(log size) in serialization:
+# entries are serialized once per run (and only when first shown), the download only when clicked.
+@st.cache_data(max_entries=8, show_spinner=False)
+def run_log_json(run_id: str) -> str:
+    """Full thinking log of a run as JSON, read back from the JSONL sink once per run."""
+    events = load_run(run_id)
+    return json.dumps(events, indent=2) if events else ""
+
+
+def log_view() -> dict:
+    """Newest-first entries of the current log, with a per-run memo of their rendered bodies."""
+    logs = st.session_state.thinking_log
+    key = (st.session_state.run_id, len(logs))
+    view = st.session_state.get("log_view")
+    if view is None or view["key"] != key:
+        entries = list(reversed(logs))
+        view = st.session_state.log_view = {
+            "key": key,
+            "entries": entries,
+            "steps": sorted({str(e.get("step", "")) for e in entries}),
+            "bodies": {},  # id(entry) -> (kind, text)
+        }
+    return view
+
+
+def entry_body(view: dict, item: dict):
+    body = view["bodies"].get(id(item))
+    if body is None:
+        data = item.get("data", None)
+        if data is None:
+            body = ("text", "—")
+        elif isinstance(data, (dict, list)):
+            body = ("json", json.dumps(data, indent=2))
+        else:
+            body = ("text", str(data))
+        view["bodies"][id(item)] = body
+    return body
+
 
 # ---------- Header ----------
 st.markdown(
@@ -56,11 +104,20 @@ with right:
         st.markdown("### 🧾 Thinking Log")
 
     with btn_col:
+        # The in-memory log is a bounded ring; the download reads the full run back from the JSONL sink.
+        # Built on click (in a worker thread), not on every rerun
+        run_id = st.session_state.run_id
+        ring = st.session_state.thinking_log
+
+        def download_log() -> str:
+            return (run_log_json(run_id) if run_id else "") or json.dumps(ring, indent=2)
+
         st.download_button(
             "⬇️ Download Tlog",
-            data=json.dumps(st.session_state.thinking_log, indent=2),
+            data=download_log,
             file_name="thinking_log.json",
             mime="application/json",
+            on_click="ignore",
             use_container_width=True,
         )
 
@@ -68,21 +125,30 @@ with right:
     st.markdown("<div class='small'>Live internal events: plan, queries, tool calls, evaluation, synthesis</div>", unsafe_allow_html=True)
     st.markdown("<hr/>", unsafe_allow_html=True)
 
-    logs = st.session_state.thinking_log
-    if logs:
+    view = log_view()
+    if view["entries"]:
+        f1, f2 = st.columns([2.2, 1])
+        steps = f1.multiselect("Steps", view["steps"], placeholder="All steps", label_visibility="collapsed")
+        page_size = f2.selectbox("Per page", LOG_PAGE_SIZES, index=1, label_visibility="collapsed")
         # newest first
-        for item in reversed(logs):
+        entries = [e for e in view["entries"] if str(e.get("step", "")) in steps] if steps else view["entries"]
+        pages = max(1, -(-len(entries) // page_size))
+        page = 1
+        if pages > 1:
+            page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, step=1)
+        start = (page - 1) * page_size
+        st.caption(f"{start + 1}–{min(start + page_size, len(entries))} of {len(entries)} events" if entries else "No events")
+
+        for item in entries[start:start + page_size]:
             t = item.get("time", "")
             step = item.get("step", "")
-            data = item.get("data", None)
 
             with st.expander(f"{t} — {step}", expanded=False):
-                if data is None:
-                    st.write("—")
-                elif isinstance(data, (dict, list)):
-                    st.code(json.dumps(data, indent=2), language="json")
+                kind, text = entry_body(view, item)
+                if kind == "json":
+                    st.code(text, language="json")
                 else:
-                    st.write(str(data))
+                    st.write(text)
     else:
         st.info("Run a question to see the thinking log.")
 
@@ -107,7 +173,7 @@ with left:
     st.markdown("<hr/>", unsafe_allow_html=True)
     st.markdown("### ⚙️ Run Options")
 
-    opt1, opt2, opt3 = st.columns([1, 1, 1])
+    opt1, opt2, opt3, opt4 = st.columns([1, 1, 1, 1])
 
     with opt1:
         max_iters = st.slider("Max iterations", 1, 6, 3)
@@ -115,6 +181,11 @@ with left:
         max_results = st.slider("Results per search", 1, 8, 3)
     with opt3:
         mode = st.selectbox("Mode", ["Fast", "Balanced", "Deep"], index=1)
+    with opt4:
+        deadline_s = st.number_input(
+            "Deadline (s)", min_value=0, max_value=max(600, int(DEADLINE_S)), value=int(DEADLINE_S), step=5,
+            help="Answer within this many seconds: fewer iterations and a shorter answer when time runs out. 0 = no deadline.",
+        )
 
     # Buttons row
     st.markdown("<hr/>", unsafe_allow_html=True)
@@ -126,34 +197,51 @@ with left:
     if clear_btn:
         st.session_state.final_answer = ""
         st.session_state.thinking_log = []
+        st.session_state.run_id = None
 
-    # Run logic
-    if run_btn:
-        if not question.strip():
-            st.error("Please enter a research question.")
-        else:
-            with st.spinner("Running agent…"):
-                final_answer, thinking_log = run_agent(
-                    question.strip(),
-                    max_iterations=max_iters,
-                    max_results=max_results,
-                    mode=mode,
-                )
-
-            st.session_state.final_answer = final_answer
-            st.session_state.thinking_log = thinking_log
-            st.rerun()
+    # Spinner / errors render here, above the answer card
+    run_status = st.container()
 
     st.write("")
 
-    # Final Answer panel
+    # Final Answer panel (the slot is filled live while synthesis streams)
     st.markdown("<div class='card'>", unsafe_allow_html=True)
     st.markdown("### ✅ Final Answer")
     st.markdown("<hr/>", unsafe_allow_html=True)
 
+    answer_slot = st.empty()
     if st.session_state.final_answer:
-        st.markdown(st.session_state.final_answer)
+        answer_slot.markdown(st.session_state.final_answer)
     else:
-        st.info("Run a question to see the final answer here.")
+        answer_slot.info("Run a question to see the final answer here.")
 
-    st.markdown("</div>", unsafe_allow_html=True)
+    st.markdown("</div>", unsafe_allow_html=True)
+
+    # Run logic
+    if run_btn:
+        if not question.strip():
+            run_status.error("Please enter a research question.")
+        else:
+            streamed = []
+
+            def show_token(chunk: str):
+                streamed.append(chunk)
+                answer_slot.markdown("".join(streamed) + "▌")
+
+            try:
+                with run_status, st.spinner("Running agent…"):
+                    final_answer, thinking_log = run_agent(
+                        question.strip(),
+                        max_iterations=max_iters,
+                        max_results=max_results,
+                        mode=mode,
+                        on_token=show_token,
+                        deadline_s=float(deadline_s),
+                    )
+            except MissingKeyError as e:
+                run_status.error(str(e))
+            else:
+                st.session_state.final_answer = final_answer
+                st.session_state.thinking_log = thinking_log
+                st.session_state.run_id = thinking_log[0].get("run_id") if thinking_log else None
+                st.rerun()
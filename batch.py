@@ -0,0 +1,167 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+from typing import Any, Dict, Iterable, List, Set
+
+from rich.console import Console
+
+from clients import MissingKeyError, require_keys, run_closing
+from main_langchain import GROQ_API_KEY, TAVILY_API_KEY, AgentRun, execute_run, utc_now_iso
+
+# Progress goes to stderr so JSONL can be streamed to stdout
+console = Console(stderr=True)
+
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+
+
+def question_id(question: str) -> str:
+    return hashlib.sha1(question.strip().encode("utf-8")).hexdigest()[:12]
+
+
+def read_questions(lines: Iterable[str]) -> List[Dict[str, str]]:
+    """
+    One question per line, either plain text or a JSON object
+    {"id": ..., "question": ...}. Blank lines and '#' comments are skipped.
+    """
+    items: List[Dict[str, str]] = []
+    seen: Set[str] = set()
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("{"):
+            obj = json.loads(line)
+            q = str(obj.get("question", "")).strip()
+            qid = str(obj.get("id") or question_id(q))
+        else:
+            q, qid = line, question_id(line)
+        if q and qid not in seen:
+            seen.add(qid)
+            items.append({"id": qid, "question": q})
+    return items
+
+
+def completed_ids(path: str, retry_errors: bool = False) -> Set[str]:
+    """IDs already present in an existing output file (for --resume)."""
+    done: Set[str] = set()
+    if not path or path == "-" or not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # torn last line from an interrupted sweep
+            if retry_errors and rec.get("error"):
+                continue
+            done.add(str(rec.get("id")))
+    return done
+
+
+async def answer_one(item: Dict[str, str], run_kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    started = time.perf_counter()
+    run = AgentRun(item["question"], quiet=True, **run_kwargs)
+    record: Dict[str, Any] = {"id": item["id"], "question": item["question"]}
+    try:
+        answer, run_log = await execute_run(run)
+        stops = [e["data"] for e in run_log if e["step"] == "stop"]
+        record.update({
+            "answer": answer,
+            "sources": [{"title": s.get("title"), "url": s.get("url")} for s in run.sources],
+            "stats": {
+                "iterations": stops[-1].get("iteration") if stops else None,
+                "stop_reason": stops[-1].get("reason") if stops else None,
+                "cache": run.cache_stats(),
+                **run.metrics.summary(),
+            },
+            "error": None,
+        })
+    except Exception as e:
+        # Keep the sweep going; the record says what went wrong
+        record.update({"answer": None, "sources": [], "stats": None, "error": f"{type(e).__name__}: {e}"})
+    record["elapsed_s"] = round(time.perf_counter() - started, 3)
+    record["finished_at"] = utc_now_iso()
+    return record
+
+
+async def run_batch(
+    items: List[Dict[str, str]],
+    out,
+    concurrency: int = BATCH_CONCURRENCY,
+    run_kwargs: Dict[str, Any] | None = None,
+) -> Dict[str, int]:
+    """Run every item with at most `concurrency` in flight; write each record as soon as it finishes."""
+    sem = asyncio.Semaphore(max(1, concurrency))
+    kwargs = run_kwargs or {}
+
+    async def guarded(item):
+        async with sem:
+            return await answer_one(item, kwargs)
+
+    counts = {"ok": 0, "error": 0}
+    tasks = [asyncio.create_task(guarded(item)) for item in items]
+    for n, fut in enumerate(asyncio.as_completed(tasks), start=1):
+        rec = await fut
+        out.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        out.flush()
+        status = "error" if rec["error"] else "ok"
+        counts[status] += 1
+        color = "red" if rec["error"] else "green"
+        console.print(f"[{color}]{status}[/{color}] {rec['id']} ({n}/{len(items)}) {rec['elapsed_s']:.1f}s")
+    return counts
+
+
+def main(argv: List[str] | None = None):
+    parser = argparse.ArgumentParser(description="Run a file of research questions through run_agent concurrently.")
+    parser.add_argument("input", help="questions file (plain text or JSONL with id/question), or - for stdin")
+    parser.add_argument("-o", "--output", default="-", help="JSONL output path (default: stdout)")
+    parser.add_argument("-c", "--concurrency", type=int, default=BATCH_CONCURRENCY)
+    parser.add_argument("--resume", action="store_true", help="skip IDs already present in --output")
+    parser.add_argument("--retry-errors", action="store_true", help="with --resume, re-run IDs that failed")
+    parser.add_argument("--mode", default="Balanced", choices=["Fast", "Balanced", "Deep"])
+    parser.add_argument("--max-iterations", type=int, default=None)
+    parser.add_argument("--max-results", type=int, default=None)
+    parser.add_argument("--fanout", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    try:
+        require_keys(GROQ_API_KEY=GROQ_API_KEY, TAVILY_API_KEY=TAVILY_API_KEY)
+    except MissingKeyError as e:
+        console.print(f"[red]{e}[/red]")
+        raise SystemExit(1)
+
+    if args.input == "-":
+        items = read_questions(sys.stdin)
+    else:
+        with open(args.input, "r", encoding="utf-8") as f:
+            items = read_questions(f)
+
+    if args.resume:
+        done = completed_ids(args.output, retry_errors=args.retry_errors)
+        skipped = sum(1 for it in items if it["id"] in done)
+        items = [it for it in items if it["id"] not in done]
+        console.print(f"[cyan]Resume: skipping {skipped} already answered[/cyan]")
+
+    console.print(f"[cyan]Running {len(items)} questions, concurrency {args.concurrency}[/cyan]")
+    run_kwargs = {
+        "mode": args.mode,
+        "max_iterations": args.max_iterations,
+        "max_results": args.max_results,
+        "fanout": args.fanout,
+    }
+
+    out = sys.stdout if args.output == "-" else open(args.output, "a", encoding="utf-8")
+    try:
+        counts = run_closing(run_batch(items, out, args.concurrency, run_kwargs))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    console.print(f"[bold green]Done:[/bold green] {counts['ok']} ok, {counts['error']} failed")
+
+
+if __name__ == "__main__":
+    main()
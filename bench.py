@@ -0,0 +1,617 @@
+import os
+import re
+import json
+import time
+import random
+import asyncio
+import hashlib
+import argparse
+import tempfile
+import threading
+import statistics
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from rich.console import Console
+from rich.table import Table
+
+from textutil import content_terms, estimate_tokens
+
+console = Console()
+
+BENCH_BASELINE = os.getenv("BENCH_BASELINE", "bench_baseline.json")
+BENCH_TOLERANCE = float(os.getenv("BENCH_TOLERANCE", "0.10"))  # allowed relative slowdown before flagging
+
+DEFAULT_QUESTIONS = [
+    "What are the most significant quantum computing breakthroughs announced in 2025?",
+    "How do solid-state batteries compare to lithium-ion for electric vehicles?",
+    "What is the current scientific consensus on the health effects of intermittent fasting?",
+    "Which open-source large language models lead public benchmarks and why?",
+    "What caused the 2023 banking turmoil in the United States and Switzerland?",
+    "How effective are mRNA vaccines against new influenza strains?",
+    "What are the main approaches to carbon capture and how much do they cost per ton?",
+    "How does the EU AI Act classify high-risk AI systems?",
+]
+
+
+def _digest(*parts: Any) -> str:
+    raw = json.dumps(parts, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:20]
+
+
+# ---------------------------
+# Backends (what the fake clients delegate to)
+# ---------------------------
+class Backend:
+    """
+    One LLM + one search provider. complete()/search() return the payload and how
+    long the caller should wait to simulate latency (0 for real calls).
+    complete() also gets the call's routed model/temperature/max_tokens; only
+    RealBackend acts on them. Counters are per question: reset() before each run.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counts = {"llm_calls": 0, "search_calls": 0, "prompt_bytes": 0}
+
+    def _tally(self, field: str, n: int = 1) -> None:
+        with self._lock:
+            self.counts[field] += n
+
+    def complete(self, prompt: str, **params: Any) -> Tuple[str, float]:
+        self._tally("llm_calls")
+        self._tally("prompt_bytes", len(prompt.encode("utf-8")))
+        return self._complete(prompt, **params)
+
+    def search(self, query: str, max_results: int) -> Tuple[List[Dict[str, Any]], float]:
+        self._tally("search_calls")
+        return self._search(query, max_results)
+
+    def _complete(self, prompt: str, **params: Any) -> Tuple[str, float]:
+        raise NotImplementedError
+
+    def _search(self, query: str, max_results: int) -> Tuple[List[Dict[str, Any]], float]:
+        raise NotImplementedError
+
+
+class SyntheticBackend(Backend):
+    """
+    Deterministic fake: responses and latencies are drawn from an RNG seeded by
+    (seed, prompt), so a run does not depend on call order or concurrency.
+    """
+
+    def __init__(
+        self,
+        llm_latency_ms: float = 300.0,
+        search_latency_ms: float = 400.0,
+        jitter: float = 0.3,
+        p_yes: float = 0.5,
+        answer_words: int = 250,
+        seed: int = 0,
+    ):
+        self.llm_latency_ms = llm_latency_ms
+        self.search_latency_ms = search_latency_ms
+        self.jitter = jitter
+        self.p_yes = p_yes
+        self.answer_words = answer_words
+        self.seed = seed
+        super().__init__()
+
+    def _rng(self, *parts: Any) -> random.Random:
+        return random.Random(_digest(self.seed, *parts))
+
+    def _latency(self, rng: random.Random, mean_ms: float) -> float:
+        return max(0.0, mean_ms * rng.uniform(1 - self.jitter, 1 + self.jitter)) / 1000
+
+    def _complete(self, prompt: str, **params: Any) -> Tuple[str, float]:
+        rng = self._rng("llm", prompt)
+        match = re.search(r"(?:question|researching):\s*(.+)", prompt, re.IGNORECASE)
+        terms = content_terms(match.group(1) if match else prompt)[:6] or ["topic"]
+
+        if "STOP_CRITERIA" in prompt:
+            text = "PLAN:\n" + "\n".join(f"{n}) Find sources on {t}" for n, t in enumerate(terms[:3], 1))
+            text += "\nSTOP_CRITERIA: At least two independent sources agree."
+        elif "DECISION: YES or NO" in prompt:
+            if rng.random() < self.p_yes:
+                text = "DECISION: YES\nGAPS: None"
+            else:
+                text = f"DECISION: NO\nGAPS: Missing recent figures on {rng.choice(terms)}."
+        elif "search quer" in prompt.lower():
+            k = re.search(r"Return (\d+) diverse", prompt)
+            lines = []
+            for _ in range(int(k.group(1)) if k else 1):
+                picked = rng.sample(terms, min(len(terms), 4))
+                lines.append(" ".join(picked + [rng.choice(["2025", "review", "analysis", "report"])]))
+            text = "\n".join(lines)
+        else:
+            urls = re.findall(r"https?://[^\s\"|]+", prompt)[:5]
+            body = " ".join(rng.choice(terms) for _ in range(self.answer_words))
+            text = (
+                f"1) Answer\n{body}\n\n2) Key points\n- {terms[0]}\n\n"
+                "3) Contradictions / uncertainty\nNone noted.\n\n"
+                "4) Citations\n" + "\n".join(urls) + "\n\n5) Confidence\n70 - synthetic answer."
+            )
+        return text, self._latency(rng, self.llm_latency_ms)
+
+    def _search(self, query: str, max_results: int) -> Tuple[List[Dict[str, Any]], float]:
+        rng = self._rng("search", query, max_results)
+        terms = content_terms(query) or ["topic"]
+        results = []
+        for i in range(max_results):
+            # A small pool of domains so later iterations hit duplicates, like real search
+            site = rng.randrange(12)
+            words = [rng.choice(terms) if rng.random() < 0.3 else rng.choice(_FILLER) for _ in range(60)]
+            results.append({
+                "title": f"{' '.join(terms[:3]).title()} ({site})",
+                "url": f"https://source{site}.example.com/{'-'.join(terms[:3])}/{i}",
+                "content": " ".join(words).capitalize() + ".",
+            })
+        return results, self._latency(rng, self.search_latency_ms)
+
+
+_FILLER = (
+    "the researchers reported results in a study published this year with data from several "
+    "independent groups showing measurable gains although experts caution about limits and costs"
+).split()
+
+
+class RealBackend(Backend):
+    """Live Groq + Tavily through their SDKs (used for --record), with each call's routed model settings."""
+
+    def __init__(self):
+        from groq import Groq
+        from tavily import TavilyClient
+
+        self.llm = Groq(api_key=os.getenv("GROQ_API_KEY"), max_retries=0)
+        self.search_client = TavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
+        super().__init__()
+
+    def _complete(self, prompt: str, **params: Any) -> Tuple[str, float]:
+        from model_routing import stage_model
+
+        # Calls that carry no routing get the base model, like an unknown stage would
+        cfg = {**stage_model("default"), **{k: v for k, v in params.items() if v is not None}}
+        resp = self.llm.chat.completions.create(
+            model=cfg["model"],
+            messages=[{"role": "user", "content": prompt}],
+            temperature=cfg["temperature"],
+            max_tokens=cfg["max_tokens"],
+        )
+        return (resp.choices[0].message.content or "").strip(), 0.0
+
+    def _search(self, query: str, max_results: int) -> Tuple[List[Dict[str, Any]], float]:
+        results = self.search_client.search(query, max_results=max_results)
+        items = [
+            {"title": r.get("title"), "url": r.get("url"), "content": r.get("content")}
+            for r in results.get("results", [])
+        ]
+        return items, 0.0
+
+
+class RecordingBackend(Backend):
+    """Wraps another backend and captures every call (with its latency) as a replay fixture."""
+
+    def __init__(self, inner: Backend):
+        self.inner = inner
+        self.fixture: Dict[str, Dict[str, Any]] = {"llm": {}, "search": {}}
+        super().__init__()
+
+    def _complete(self, prompt: str, **params: Any) -> Tuple[str, float]:
+        started = time.perf_counter()
+        text, wait = self.inner._complete(prompt, **params)
+        elapsed = time.perf_counter() - started + wait
+        with self._lock:
+            self.fixture["llm"][_digest(prompt)] = {"text": text, "latency_ms": round(elapsed * 1000, 1)}
+        return text, wait
+
+    def _search(self, query: str, max_results: int) -> Tuple[List[Dict[str, Any]], float]:
+        started = time.perf_counter()
+        results, wait = self.inner._search(query, max_results)
+        elapsed = time.perf_counter() - started + wait
+        with self._lock:
+            self.fixture["search"][_digest(query, max_results)] = {
+                "results": results,
+                "latency_ms": round(elapsed * 1000, 1),
+            }
+        return results, wait
+
+    def save(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.fixture, f, ensure_ascii=False, indent=1)
+
+
+class ReplayBackend(Backend):
+    """Serves a recorded fixture; an unrecorded prompt or query is an error, not a live call."""
+
+    def __init__(self, path: str, latency_scale: float = 1.0):
+        with open(path, "r", encoding="utf-8") as f:
+            self.fixture = json.load(f)
+        self.latency_scale = latency_scale
+        super().__init__()
+
+    def _complete(self, prompt: str, **params: Any) -> Tuple[str, float]:
+        hit = self.fixture["llm"].get(_digest(prompt))
+        if hit is None:
+            raise LookupError(f"no recorded LLM response for prompt {prompt[:80]!r}")
+        return hit["text"], hit["latency_ms"] * self.latency_scale / 1000
+
+    def _search(self, query: str, max_results: int) -> Tuple[List[Dict[str, Any]], float]:
+        hit = self.fixture["search"].get(_digest(query, max_results))
+        if hit is None:
+            raise LookupError(f"no recorded search for {query!r} (max_results={max_results})")
+        return hit["results"], hit["latency_ms"] * self.latency_scale / 1000
+
+
+# ---------------------------
+# Client adapters (same surface as the real clients each pipeline uses)
+# ---------------------------
+def make_chat_model(backend: Backend):
+    """
+    A LangChain chat model (ainvoke/astream + usage metadata) backed by `backend`.
+    Its model_name/temperature/max_tokens are passed on with every call; use
+    model_copy(update=...) for per-stage variants.
+    """
+    from langchain_core.language_models.chat_models import BaseChatModel
+    from langchain_core.messages import AIMessage, AIMessageChunk
+    from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+    def _prompt(messages) -> str:
+        return "\n".join(str(m.content) for m in messages)
+
+    def _usage(prompt: str, text: str) -> Dict[str, int]:
+        p, c = estimate_tokens(prompt), estimate_tokens(text)
+        return {"input_tokens": p, "output_tokens": c, "total_tokens": p + c}
+
+    class BackendChatModel(BaseChatModel):
+        model_name: str = "bench"
+        temperature: Optional[float] = None
+        max_tokens: Optional[int] = None
+
+        @property
+        def _llm_type(self) -> str:
+            return "bench"
+
+        def _params(self) -> Dict[str, Any]:
+            model = None if self.model_name == "bench" else self.model_name
+            return {"model": model, "temperature": self.temperature, "max_tokens": self.max_tokens}
+
+        def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+            prompt = _prompt(messages)
+            text, wait = backend.complete(prompt, **self._params())
+            time.sleep(wait)
+            message = AIMessage(content=text, usage_metadata=_usage(prompt, text))
+            return ChatResult(generations=[ChatGeneration(message=message)])
+
+        async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+            prompt = _prompt(messages)
+            text, wait = await asyncio.to_thread(backend.complete, prompt, **self._params())
+            await asyncio.sleep(wait)
+            message = AIMessage(content=text, usage_metadata=_usage(prompt, text))
+            return ChatResult(generations=[ChatGeneration(message=message)])
+
+        async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+            prompt = _prompt(messages)
+            text, wait = await asyncio.to_thread(backend.complete, prompt, **self._params())
+            # First token after ~30% of the latency, the rest in a few bursts over the remainder
+            words = re.findall(r"\S+\s*", text) or [text]
+            step = max(1, len(words) // 8)
+            pieces = ["".join(words[i:i + step]) for i in range(0, len(words), step)]
+            await asyncio.sleep(wait * 0.3)
+            for n, piece in enumerate(pieces):
+                usage = _usage(prompt, text) if n == len(pieces) - 1 else None
+                chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece, usage_metadata=usage))
+                if run_manager:
+                    await run_manager.on_llm_new_token(piece, chunk=chunk)
+                yield chunk
+                await asyncio.sleep(wait * 0.7 / len(pieces))
+
+    return BackendChatModel()
+
+
+class BackendGroqClient:
+    """Stands in for groq.Groq (chat.completions.create) in main.py."""
+
+    def __init__(self, backend: Backend):
+        self.chat = self
+        self.completions = self
+        self.backend = backend
+
+    def create(self, model=None, messages=None, temperature=None, max_tokens=None, **kwargs):
+        from types import SimpleNamespace
+
+        prompt = "\n".join(m["content"] for m in messages)
+        text, wait = self.backend.complete(prompt, model=model, temperature=temperature, max_tokens=max_tokens)
+        time.sleep(wait)
+        p, c = estimate_tokens(prompt), estimate_tokens(text)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=text))],
+            usage=SimpleNamespace(prompt_tokens=p, completion_tokens=c, total_tokens=p + c),
+        )
+
+
+class BackendTavilyClient:
+    """Stands in for tavily.TavilyClient (search with per-call max_results) in both pipelines."""
+
+    def __init__(self, backend: Backend):
+        self.backend = backend
+
+    def search(self, query: str, max_results: int = 5, **kwargs) -> Dict[str, Any]:
+        results, wait = self.backend.search(query, max_results)
+        time.sleep(wait)
+        return {"results": results}
+
+
+# ---------------------------
+# Runners
+# ---------------------------
+def prepare_env(offline: bool) -> None:
+    """Must run before the agent modules are imported (they read env at import time)."""
+    # Every question must exercise the full loop: no cache hits between runs
+    os.environ["LLM_CACHE_CHAINS"] = "none"
+    os.environ["SEARCH_CACHE_BYPASS"] = "1"
+    if offline:
+        # Placeholders satisfy the import-time key check; nothing is sent anywhere
+        os.environ.setdefault("GROQ_API_KEY", "offline-bench")
+        os.environ.setdefault("TAVILY_API_KEY", "offline-bench")
+        # Client-side rate limits would only measure our own throttling
+        for name in ("GROQ_RPM", "GROQ_TPM", "TAVILY_RPM"):
+            os.environ[name] = "0"
+
+
+def _outcome(events: List[Dict[str, Any]]) -> Dict[str, Any]:
+    evals = sum(1 for e in events if e["step"] == "evaluation")
+    stops = [e["data"] for e in events if e["step"] == "stop"]
+    reached = bool(stops) and stops[-1].get("reason") == "sufficient_information"
+    return {"iterations": evals, "iterations_to_yes": evals if reached else None}
+
+
+def run_langchain(backend: Backend, questions: List[str], run_kwargs: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    import main_langchain as agent
+
+    chat = make_chat_model(backend)
+    models: Dict[Tuple[Any, ...], Any] = {}
+
+    def routed_chat_model(model, temperature, max_tokens, api_key=None):
+        key = (model, temperature, max_tokens)
+        if key not in models:
+            models[key] = chat.model_copy(update={"model_name": model, "temperature": temperature, "max_tokens": max_tokens})
+        return models[key]
+
+    # No injected llm: every chain resolves its stage's model through the real routing path
+    agent.get_chat_model = routed_chat_model
+    search = BackendTavilyClient(backend)
+    for question in questions:
+        backend.reset()
+        run = agent.AgentRun(question, quiet=True, bypass_cache=True, search_tool=search, **run_kwargs)
+        started = time.perf_counter()
+        error = None
+        try:
+            _, events = asyncio.run(agent.execute_run(run))
+        except Exception as e:
+            events, error = run.thinking_log, f"{type(e).__name__}: {e}"
+        yield {
+            "question": question,
+            "wall_ms": round((time.perf_counter() - started) * 1000, 1),
+            **backend.counts,
+            **_outcome(events),
+            "error": error,
+        }
+
+
+def run_main(backend: Backend, questions: List[str], run_kwargs: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    import main as agent
+
+    agent.llm = BackendGroqClient(backend)
+    agent.search = BackendTavilyClient(backend)
+    agent.console = Console(quiet=True)
+    for question in questions:
+        backend.reset()
+        started = time.perf_counter()
+        error = None
+        try:
+            agent.research(question)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        events = agent.thinking_log.events()
+        yield {
+            "question": question,
+            "wall_ms": round((time.perf_counter() - started) * 1000, 1),
+            **backend.counts,
+            **_outcome(events),
+            "error": error,
+        }
+
+
+PIPELINES = {"langchain": run_langchain, "main": run_main}
+
+
+# ---------------------------
+# Report + baseline comparison
+# ---------------------------
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    pos = (len(ordered) - 1) * q
+    lo, hi = int(pos), min(int(pos) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (pos - lo)
+
+
+def summarize(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    ok = [r for r in records if not r["error"]]
+    walls = [r["wall_ms"] for r in ok]
+    yes = [r["iterations_to_yes"] for r in ok if r["iterations_to_yes"] is not None]
+    n = len(ok) or 1
+    return {
+        "questions": len(records),
+        "errors": len(records) - len(ok),
+        "p50_ms": round(percentile(walls, 0.5), 1),
+        "p90_ms": round(percentile(walls, 0.9), 1),
+        "p95_ms": round(percentile(walls, 0.95), 1),
+        "max_ms": round(max(walls, default=0.0), 1),
+        "llm_calls_per_q": round(sum(r["llm_calls"] for r in ok) / n, 2),
+        "search_calls_per_q": round(sum(r["search_calls"] for r in ok) / n, 2),
+        "prompt_kb_per_q": round(sum(r["prompt_bytes"] for r in ok) / n / 1024, 2),
+        "iterations_per_q": round(sum(r["iterations"] for r in ok) / n, 2),
+        "iterations_to_yes": round(statistics.mean(yes), 2) if yes else None,
+        "yes_rate": round(len(yes) / n, 2),
+    }
+
+
+# Metrics where a larger value is a regression (yes_rate is the reverse)
+LOWER_IS_BETTER = (
+    "p50_ms", "p95_ms", "llm_calls_per_q", "search_calls_per_q",
+    "prompt_kb_per_q", "iterations_per_q",
+)
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float) -> List[Dict[str, Any]]:
+    rows = []
+    for pipeline, cur in current.items():
+        base = baseline.get(pipeline)
+        if not base:
+            continue
+        for metric in LOWER_IS_BETTER + ("yes_rate",):
+            b, c = base.get(metric), cur.get(metric)
+            if b is None or c is None:
+                continue
+            change = (c - b) / b if b else (0.0 if c == b else float("inf"))
+            worse = -change if metric == "yes_rate" else change
+            rows.append({
+                "pipeline": pipeline,
+                "metric": metric,
+                "baseline": b,
+                "current": c,
+                "change": change,
+                "regressed": worse > tolerance,
+            })
+    return rows
+
+
+def print_summary(results: Dict[str, Dict[str, Any]]) -> None:
+    table = Table(title="Benchmark")
+    table.add_column("Metric", style="cyan")
+    for pipeline in results:
+        table.add_column(pipeline, justify="right")
+    metrics = next(iter(results.values())).keys()
+    for metric in metrics:
+        table.add_row(metric, *("-" if r[metric] is None else str(r[metric]) for r in results.values()))
+    console.print(table)
+
+
+def print_comparison(rows: List[Dict[str, Any]], tolerance: float) -> None:
+    table = Table(title=f"Against baseline (tolerance {tolerance:.0%})")
+    for col in ("Pipeline", "Metric", "Baseline", "Current", "Change"):
+        table.add_column(col, justify="left" if col in ("Pipeline", "Metric") else "right")
+    for r in rows:
+        style = "red" if r["regressed"] else ""
+        table.add_row(
+            r["pipeline"], r["metric"], str(r["baseline"]), str(r["current"]),
+            f"{r['change']:+.1%}", style=style,
+        )
+    console.print(table)
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the research loop offline (or record/replay live calls).")
+    parser.add_argument("-p", "--pipeline", choices=sorted(PIPELINES), action="append",
+                        help="pipeline(s) to run (default: both)")
+    parser.add_argument("-q", "--questions", help="questions file (plain text or JSONL with id/question)")
+    parser.add_argument("-n", "--limit", type=int, default=None, help="use only the first N questions")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--record", metavar="FIXTURE", help="call the live APIs and save every response")
+    source.add_argument("--replay", metavar="FIXTURE", help="serve responses from a recorded fixture")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="replay: multiply recorded latencies")
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    parser.add_argument("--search-latency-ms", type=float, default=400.0)
+    parser.add_argument("--jitter", type=float, default=0.3, help="latency spread, as a fraction of the mean")
+    parser.add_argument("--p-yes", type=float, default=0.5, help="chance each evaluation says DECISION: YES")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mode", default="Balanced", choices=["Fast", "Balanced", "Deep"])
+    parser.add_argument("--fanout", type=int, default=None)
+    parser.add_argument("--baseline", default=BENCH_BASELINE, help="baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="write this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=BENCH_TOLERANCE)
+    parser.add_argument("--json", metavar="PATH", help="also write per-question records + summary here")
+    args = parser.parse_args(argv)
+
+    prepare_env(offline=not args.record)
+    baseline_path = os.path.abspath(args.baseline)
+    json_path = os.path.abspath(args.json) if args.json else None
+
+    if args.questions:
+        from batch import read_questions
+
+        with open(args.questions, "r", encoding="utf-8") as f:
+            questions = [item["question"] for item in read_questions(f)]
+    else:
+        questions = list(DEFAULT_QUESTIONS)
+    questions = questions[: args.limit] if args.limit else questions
+
+    if args.record:
+        backend: Backend = RecordingBackend(RealBackend())
+    elif args.replay:
+        backend = ReplayBackend(args.replay, latency_scale=args.latency_scale)
+    else:
+        backend = SyntheticBackend(
+            llm_latency_ms=args.llm_latency_ms,
+            search_latency_ms=args.search_latency_ms,
+            jitter=args.jitter,
+            p_yes=args.p_yes,
+            seed=args.seed,
+        )
+
+    run_kwargs = {"mode": args.mode, "fanout": args.fanout}
+    records: Dict[str, List[Dict[str, Any]]] = {}
+    cwd = os.getcwd()
+    # Run in a scratch directory so benchmark runs stay out of the user's logs/ and caches
+    with tempfile.TemporaryDirectory(prefix="bench-") as scratch:
+        os.chdir(scratch)
+        try:
+            for pipeline in args.pipeline or sorted(PIPELINES):
+                records[pipeline] = []
+                with console.status(f"Running {pipeline} on {len(questions)} questions…"):
+                    for rec in PIPELINES[pipeline](backend, questions, run_kwargs):
+                        records[pipeline].append(rec)
+                        if rec["error"]:
+                            console.print(f"[red]{pipeline} error[/red] {rec['question'][:60]}: {rec['error']}")
+        finally:
+            from log_sink import get_log_sink
+
+            get_log_sink().close()
+            os.chdir(cwd)
+
+    if args.record:
+        backend.save(args.record)
+        console.print(f"[green]Recorded {len(backend.fixture['llm'])} LLM and "
+                      f"{len(backend.fixture['search'])} search responses to {args.record}[/green]")
+
+    results = {pipeline: summarize(recs) for pipeline, recs in records.items()}
+    print_summary(results)
+
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump({"summary": results, "records": records}, f, ensure_ascii=False, indent=2)
+
+    status = 0
+    if args.save_baseline:
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+        console.print(f"[green]Saved baseline to {args.baseline}[/green]")
+    elif os.path.exists(baseline_path):
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            rows = compare(json.load(f), results, args.tolerance)
+        print_comparison(rows, args.tolerance)
+        regressed = [r for r in rows if r["regressed"]]
+        if regressed:
+            console.print(f"[bold red]{len(regressed)} metric(s) regressed beyond {args.tolerance:.0%}[/bold red]")
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
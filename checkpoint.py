@@ -0,0 +1,167 @@
+import os
+import json
+import time
+import argparse
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional
+
+# ---------------------------
+# Config
+# ---------------------------
+CHECKPOINTS = os.getenv("CHECKPOINTS", "1") == "1"  # 0 = never write checkpoints
+CHECKPOINT_PATH = os.getenv("CHECKPOINT_PATH", os.path.join(".cache", "checkpoints.sqlite3"))
+CHECKPOINT_TTL_S = float(os.getenv("CHECKPOINT_TTL_S", str(3 * 24 * 60 * 60)))  # unfinished runs kept this long
+CHECKPOINT_KEEP_DONE = os.getenv("CHECKPOINT_KEEP_DONE", "0") == "1"  # keep checkpoints of finished runs
+
+
+class CheckpointStore:
+    """
+    Latest loop state of every unfinished run, keyed by run ID, in SQLite.
+    Each save replaces the previous one (one row per run). Thread-safe.
+    """
+
+    def __init__(self, path: str = CHECKPOINT_PATH, ttl_s: float = CHECKPOINT_TTL_S):
+        self.path = path
+        self.ttl_s = ttl_s
+        self.saves = 0
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            folder = os.path.dirname(self.path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute(
+                """CREATE TABLE IF NOT EXISTS checkpoints (
+                       run_id TEXT PRIMARY KEY,
+                       pipeline TEXT NOT NULL,
+                       stage TEXT NOT NULL,
+                       question TEXT NOT NULL,
+                       state TEXT NOT NULL,
+                       updated_at REAL NOT NULL
+                   )"""
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_checkpoints_updated ON checkpoints(updated_at)")
+            self._db.commit()
+        return self._db
+
+    def save(self, run_id: str, pipeline: str, stage: str, state: Dict[str, Any]) -> None:
+        """Record that `stage` finished; `state` must hold everything needed to continue from there."""
+        payload = json.dumps(state, ensure_ascii=False, default=str)
+        with self._lock:
+            db = self._conn()
+            db.execute(
+                """INSERT INTO checkpoints (run_id, pipeline, stage, question, state, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(run_id) DO UPDATE SET
+                       stage = excluded.stage, state = excluded.state, updated_at = excluded.updated_at""",
+                (run_id, pipeline, stage, str(state.get("question", "")), payload, time.time()),
+            )
+            db.commit()
+            self.saves += 1
+
+    def load(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """{"run_id", "pipeline", "stage", "updated_at", "state"} or None."""
+        with self._lock:
+            row = self._conn().execute(
+                "SELECT pipeline, stage, state, updated_at FROM checkpoints WHERE run_id = ?", (run_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        pipeline, stage, state, updated_at = row
+        return {"run_id": run_id, "pipeline": pipeline, "stage": stage, "updated_at": updated_at, "state": json.loads(state)}
+
+    def finish(self, run_id: str) -> None:
+        """The run completed: its checkpoint is no longer needed (unless CHECKPOINT_KEEP_DONE)."""
+        if CHECKPOINT_KEEP_DONE:
+            return
+        with self._lock:
+            db = self._conn()
+            db.execute("DELETE FROM checkpoints WHERE run_id = ?", (run_id,))
+            db.commit()
+
+    def latest(self, pipeline: Optional[str] = None) -> Optional[str]:
+        """Run ID of the most recently checkpointed run."""
+        with self._lock:
+            if pipeline:
+                row = self._conn().execute(
+                    "SELECT run_id FROM checkpoints WHERE pipeline = ? ORDER BY updated_at DESC LIMIT 1", (pipeline,)
+                ).fetchone()
+            else:
+                row = self._conn().execute(
+                    "SELECT run_id FROM checkpoints ORDER BY updated_at DESC LIMIT 1"
+                ).fetchone()
+        return row[0] if row else None
+
+    def list(self, limit: int = 20) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn().execute(
+                """SELECT run_id, pipeline, stage, question, updated_at FROM checkpoints
+                   ORDER BY updated_at DESC LIMIT ?""",
+                (limit,),
+            ).fetchall()
+        now = time.time()
+        return [
+            {"run_id": r, "pipeline": p, "stage": s, "question": q, "age_min": round((now - u) / 60, 1)}
+            for r, p, s, q, u in rows
+        ]
+
+    def gc(self, older_than_s: Optional[float] = None) -> int:
+        """Drop checkpoints not updated within older_than_s (default: the TTL)."""
+        cutoff = time.time() - (self.ttl_s if older_than_s is None else older_than_s)
+        with self._lock:
+            db = self._conn()
+            cur = db.execute("DELETE FROM checkpoints WHERE updated_at < ?", (cutoff,))
+            db.commit()
+            return max(cur.rowcount, 0)
+
+    def clear(self) -> None:
+        with self._lock:
+            db = self._conn()
+            db.execute("DELETE FROM checkpoints")
+            db.commit()
+
+
+_store: Optional[CheckpointStore] = None
+_store_lock = threading.Lock()
+
+
+def get_checkpoint_store() -> CheckpointStore:
+    """Process-wide store; expired checkpoints are collected when it is first opened."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = CheckpointStore()
+            _store.gc()
+        return _store
+
+
+def main(argv: List[str] | None = None):
+    parser = argparse.ArgumentParser(description="Inspect or clean up run checkpoints.")
+    parser.add_argument("command", choices=["list", "show", "gc", "clear"])
+    parser.add_argument("run_id", nargs="?", help="show: run ID (default: the latest)")
+    parser.add_argument("--older-than-hours", type=float, default=None, help="gc: age cutoff (default: CHECKPOINT_TTL_S)")
+    args = parser.parse_args(argv)
+
+    store = get_checkpoint_store()
+    if args.command == "list":
+        for item in store.list():
+            print(f"{item['run_id']}  {item['pipeline']:<9} {item['stage']:<8} {item['age_min']:>7} min  {item['question'][:70]}")
+    elif args.command == "show":
+        run_id = args.run_id or store.latest()
+        checkpoint = store.load(run_id) if run_id else None
+        if checkpoint is None:
+            raise SystemExit(f"No checkpoint for run {args.run_id or 'latest'!r}")
+        print(json.dumps(checkpoint, ensure_ascii=False, indent=2))
+    elif args.command == "gc":
+        age_s = args.older_than_hours * 3600 if args.older_than_hours is not None else None
+        print(f"Removed {store.gc(age_s)} expired checkpoints")
+    elif args.command == "clear":
+        store.clear()
+
+
+if __name__ == "__main__":
+    main()
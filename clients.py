@@ -0,0 +1,229 @@
+import os
+import asyncio
+import threading
+import weakref
+from typing import Any, Dict, Optional, Tuple
+
+# ---------------------------
+# Config
+# ---------------------------
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "20"))  # max pooled connections per host
+HTTP_KEEPALIVE_S = float(os.getenv("HTTP_KEEPALIVE_S", "60"))  # idle keep-alive connections closed after this
+
+
+class MissingKeyError(RuntimeError):
+    """A required API key is not configured."""
+
+    retryable = False  # rate_limit must not back off and retry a configuration error
+
+
+def require_keys(**keys: Optional[str]) -> None:
+    """Raise MissingKeyError naming every empty key (e.g. require_keys(GROQ_API_KEY=...))."""
+    missing = [name for name, value in keys.items() if not value]
+    if missing:
+        raise MissingKeyError(f"Missing API keys in .env file: {', '.join(missing)}")
+
+
+_lock = threading.Lock()
+_counts = {"created": 0, "reused": 0}
+_session = None
+_httpx_client = None
+_tavily: Dict[Optional[str], Any] = {}
+_groq: Dict[Optional[str], Any] = {}
+# Async HTTP connections belong to the event loop that opened them, so every loop gets one
+# AsyncClient shared by all of its chat models (one per stage config). Whoever owns the loop
+# closes it with aclose_loop_clients() before the loop ends; long-lived loops (server.py
+# workers, batch.py) keep it across runs
+_loop_http: "weakref.WeakKeyDictionary[Any, Any]" = weakref.WeakKeyDictionary()
+_chat_models: "weakref.WeakKeyDictionary[Any, Dict[Tuple, Any]]" = weakref.WeakKeyDictionary()
+_sync_chat_models: Dict[Tuple, Any] = {}
+_async_counts = {"created": 0, "closed": 0}
+
+
+def _hit(found: bool) -> None:
+    _counts["reused" if found else "created"] += 1
+
+
+def get_http_session():
+    """Process-wide requests.Session with a keep-alive pool (used by the Tavily client)."""
+    global _session
+    with _lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            _session = requests.Session()
+            # Retries are handled by rate_limit; the adapter only pools connections
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE, max_retries=0)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+
+def _httpx_limits():
+    import httpx
+
+    return httpx.Limits(
+        max_connections=HTTP_POOL_SIZE,
+        max_keepalive_connections=HTTP_POOL_SIZE,
+        keepalive_expiry=HTTP_KEEPALIVE_S,
+    )
+
+
+def get_httpx_client():
+    """Process-wide sync httpx client shared by the Groq SDK and ChatGroq."""
+    global _httpx_client
+    with _lock:
+        if _httpx_client is None:
+            import httpx
+
+            _httpx_client = httpx.Client(limits=_httpx_limits(), timeout=httpx.Timeout(60.0, connect=10.0))
+        return _httpx_client
+
+
+def _loop_httpx_client(loop):
+    # Caller holds _lock
+    client = _loop_http.get(loop)
+    if client is None:
+        import httpx
+
+        client = _loop_http[loop] = httpx.AsyncClient(limits=_httpx_limits(), timeout=httpx.Timeout(60.0, connect=10.0))
+        _async_counts["created"] += 1
+    return client
+
+
+async def aclose_loop_clients() -> None:
+    """Close the running loop's async HTTP pool and forget its chat models; await before the loop ends."""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        client = _loop_http.pop(loop, None)
+        _chat_models.pop(loop, None)
+        if client is not None:
+            _async_counts["closed"] += 1
+    if client is not None:
+        await client.aclose()
+
+
+def run_closing(coro):
+    """asyncio.run(coro) for one-shot loops: the loop's async HTTP pool is closed before the loop is."""
+
+    async def closing():
+        try:
+            return await coro
+        finally:
+            await aclose_loop_clients()
+
+    return asyncio.run(closing())
+
+
+def get_tavily_client(api_key: Optional[str] = None):
+    """TavilyClient over the pooled session; max_results is passed per search() call."""
+    api_key = api_key or os.getenv("TAVILY_API_KEY")
+    session = get_http_session()
+    with _lock:
+        client = _tavily.get(api_key)
+        _hit(client is not None)
+        if client is None:
+            from tavily import TavilyClient
+
+            client = _tavily[api_key] = TavilyClient(api_key=api_key, session=session)
+        return client
+
+
+def get_groq_client(api_key: Optional[str] = None):
+    """groq.Groq over the pooled httpx client (SDK retries off; rate_limit owns backoff)."""
+    api_key = api_key or os.getenv("GROQ_API_KEY")
+    http_client = get_httpx_client()
+    with _lock:
+        client = _groq.get(api_key)
+        _hit(client is not None)
+        if client is None:
+            from groq import Groq
+
+            client = _groq[api_key] = Groq(api_key=api_key, max_retries=0, http_client=http_client)
+        return client
+
+
+def get_chat_model(model: str, temperature: float, max_tokens: Optional[int], api_key: Optional[str] = None):
+    """
+    ChatGroq for one configuration. Inside an event loop the model is reused for the
+    lifetime of that loop and shares the loop's async connection pool with every other
+    configuration; outside one it is process-wide.
+    """
+    api_key = api_key or os.getenv("GROQ_API_KEY")
+    key = (model, temperature, max_tokens, api_key)
+    http_client = get_httpx_client()
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    with _lock:
+        cache = _sync_chat_models if loop is None else _chat_models.setdefault(loop, {})
+        chat = cache.get(key)
+        _hit(chat is not None)
+        if chat is None:
+            from langchain_groq import ChatGroq
+
+            extra = {"http_async_client": _loop_httpx_client(loop)} if loop is not None else {}
+            chat = cache[key] = ChatGroq(
+                model=model,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                api_key=api_key,
+                max_retries=0,  # retries/backoff are owned by rate_limit.get_limiter("groq")
+                http_client=http_client,
+                **extra,
+            )
+        return chat
+
+
+def _urllib3_stats(session) -> Dict[str, int]:
+    pools = opened = requests = idle = 0
+    for adapter in session.adapters.values():
+        manager = getattr(adapter, "poolmanager", None)
+        if manager is None:
+            continue
+        for key in list(manager.pools.keys()):
+            pool = manager.pools.get(key)
+            if pool is None:
+                continue
+            pools += 1
+            opened += pool.num_connections
+            requests += pool.num_requests
+            idle += pool.pool.qsize() if pool.pool is not None else 0
+    return {"pools": pools, "connections_opened": opened, "requests": requests, "idle": idle}
+
+
+def _httpx_stats(client) -> Dict[str, int]:
+    pool = getattr(getattr(client, "_transport", None), "_pool", None)
+    conns = list(getattr(pool, "connections", []) or [])
+    return {
+        "connections": len(conns),
+        "idle": sum(1 for c in conns if getattr(c, "is_idle", lambda: False)()),
+    }
+
+
+def pool_stats() -> Dict[str, Any]:
+    """Client reuse and connection-pool counters (connections_opened < requests means keep-alive works)."""
+    with _lock:
+        stats: Dict[str, Any] = {
+            "clients_created": _counts["created"],
+            "clients_reused": _counts["reused"],
+            "pool_size": HTTP_POOL_SIZE,
+        }
+        session, http_client = _session, _httpx_client
+        async_clients = list(_loop_http.values())
+        async_counts = dict(_async_counts)
+    if session is not None:
+        stats["search_http"] = _urllib3_stats(session)
+    if http_client is not None:
+        stats["llm_http"] = _httpx_stats(http_client)
+    per_loop = [_httpx_stats(c) for c in async_clients]
+    stats["llm_async_http"] = {
+        "clients_open": len(async_clients),
+        "clients_created": async_counts["created"],
+        "clients_closed": async_counts["closed"],
+        "connections": sum(s["connections"] for s in per_loop),
+        "idle": sum(s["idle"] for s in per_loop),
+    }
+    return stats
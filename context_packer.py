@@ -0,0 +1,153 @@
+import math
+from collections import Counter
+from typing import Any, Dict, List, Sequence, Tuple
+
+from textutil import content_terms, estimate_tokens, split_sentences
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+MIN_PASSAGE_TOKENS = 12  # a trimmed passage shorter than this is not worth its header
+
+
+def bm25_scores(query: Sequence[str], docs: Sequence[Sequence[str]]) -> List[float]:
+    """Okapi BM25 of every tokenized doc against the query terms (IDF from the docs themselves)."""
+    n = len(docs)
+    if not n or not query:
+        return [0.0] * n
+    avg_len = sum(len(d) for d in docs) / n or 1.0
+    df = Counter()
+    for d in docs:
+        df.update(set(d))
+    terms = set(query)
+    idf = {t: math.log(1 + (n - df[t] + 0.5) / (df[t] + 0.5)) for t in terms}
+
+    scores = []
+    for d in docs:
+        tf = Counter(d)
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * len(d) / avg_len)
+        scores.append(sum(
+            idf[t] * tf[t] * (BM25_K1 + 1) / (tf[t] + norm)
+            for t in terms if tf[t]
+        ))
+    return scores
+
+
+def rank_sources(question: str, sources: List[Dict[str, Any]]) -> List[float]:
+    """Source-level BM25 relevance (title + content) to the question."""
+    docs = [content_terms(f"{s.get('title') or ''} {s.get('content') or ''}") for s in sources]
+    return bm25_scores(content_terms(question), docs)
+
+
+def _header(idx: int, source: Dict[str, Any]) -> str:
+    return f"[{idx}] {(source.get('title') or '').strip()} | {(source.get('url') or '').strip()}"
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    """Cut text at a word boundary so it (plus an ellipsis) estimates to at most max_tokens."""
+    cut = text[: max(0, max_tokens * 4 - 4)]
+    if " " in cut:
+        cut = cut[: cut.rfind(" ")]
+    return cut.rstrip() + "…"
+
+
+def pack_context(
+    question: str,
+    sources: List[Dict[str, Any]],
+    token_budget: int,
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    Pick the passages (sentences) most relevant to the question until token_budget is spent.
+
+    Every source first gets its single best passage (so citations stay diverse),
+    then the remaining budget goes to the highest-scoring passages overall. A best
+    passage too long for what is left is trimmed rather than dropped, to at most an
+    even share of the remaining budget among the sources still waiting for theirs.
+    Output is compact plain text grouped by source, passages in original order:
+
+        [1] Title | https://url
+        passage ... passage
+    """
+    passages: List[Tuple[int, int, str]] = []  # (source idx, position, text)
+    for si, s in enumerate(sources):
+        for pi, sent in enumerate(split_sentences(s.get("content") or "")):
+            passages.append((si, pi, sent))
+
+    q_terms = content_terms(question)
+    p_scores = bm25_scores(q_terms, [content_terms(p[2]) for p in passages])
+    s_scores = rank_sources(question, sources)
+    top_source = max(s_scores, default=0.0) or 1.0
+    # Passage relevance, nudged by how relevant its whole source is
+    scored = sorted(
+        range(len(passages)),
+        key=lambda i: p_scores[i] + 0.5 * s_scores[passages[i][0]] / top_source,
+        reverse=True,
+    )
+
+    best_per_source: Dict[int, int] = {}
+    for i in scored:
+        best_per_source.setdefault(passages[i][0], i)
+    firsts = set(best_per_source.values())
+    order = list(best_per_source.values()) + [i for i in scored if i not in firsts]
+
+    chosen: Dict[int, List[int]] = {}
+    trimmed: Dict[int, str] = {}
+    pending = set(firsts)  # best passages not placed yet
+    used = 0
+    for i in order:
+        pending.discard(i)
+        si, _, text = passages[i]
+        header = 0 if si in chosen else estimate_tokens(_header(0, sources[si])) + 1
+        cost = estimate_tokens(text) + 1 + header
+        if used + cost > token_budget:
+            if si in chosen:
+                continue
+            room = (token_budget - used) // (1 + len(pending)) - header - 1
+            if room < MIN_PASSAGE_TOKENS:
+                continue
+            trimmed[i] = _truncate(text, room)
+            cost = estimate_tokens(trimmed[i]) + 1 + header
+        chosen.setdefault(si, []).append(i)
+        used += cost
+
+    blocks = []
+    for n, si in enumerate(sorted(chosen), start=1):
+        ordered = sorted(chosen[si], key=lambda i: passages[i][1])
+        body = " ".join(trimmed.get(i, passages[i][2]) for i in ordered)
+        blocks.append(f"{_header(n, sources[si])}\n{body}")
+    text = "\n\n".join(blocks)
+
+    stats = {
+        "budget": token_budget,
+        "tokens": estimate_tokens(text),
+        "sources_in": len(sources),
+        "sources_used": len(chosen),
+        "passages_in": len(passages),
+        "passages_used": sum(len(v) for v in chosen.values()),
+        "passages_trimmed": len(trimmed),
+    }
+    return text, stats
+
+
+def source_tokens(source: Dict[str, Any]) -> int:
+    """Estimated prompt tokens of one source in full (header + content)."""
+    return estimate_tokens(_header(0, source)) + estimate_tokens(source.get("content") or "") + 2
+
+
+def batch_sources(sources: List[Dict[str, Any]], token_budget: int) -> List[List[Dict[str, Any]]]:
+    """
+    Split sources, in order, into batches of at most token_budget estimated tokens.
+    A source larger than the budget gets a batch of its own (pack_context trims it).
+    """
+    batches: List[List[Dict[str, Any]]] = []
+    current: List[Dict[str, Any]] = []
+    used = 0
+    for s in sources:
+        cost = source_tokens(s)
+        if current and used + cost > token_budget:
+            batches.append(current)
+            current, used = [], 0
+        current.append(s)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
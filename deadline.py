@@ -0,0 +1,101 @@
+import os
+import time
+import threading
+from typing import Dict, Iterable, Optional
+
+# ---------------------------
+# Config
+# ---------------------------
+DEADLINE_S = float(os.getenv("DEADLINE_S", "0"))  # wall-clock budget per run; 0 = none (bounded by iterations only)
+DEADLINE_MARGIN_S = float(os.getenv("DEADLINE_MARGIN_S", "0.5"))  # slack kept when deciding whether a stage fits
+STAGE_COST_ALPHA = 0.3  # weight of the newest observation in the running estimate
+
+# Starting estimates (seconds) until stages have been observed in this process
+STAGE_PRIOR_S = {
+    "plan": 1.0,
+    "query": 0.8,
+    "improve_query": 0.8,
+    "multi_query": 1.0,
+    "improve_multi_query": 1.0,
+    "search": 1.5,
+    "fetch": 3.0,
+    "eval": 1.0,
+    "synth_map": 3.0,
+    "synth_fast": 3.0,
+    "synth_balanced": 5.0,
+    "synth_deep": 9.0,
+}
+
+
+class StageCosts:
+    """Running (exponentially weighted) wall time per stage, shared by all runs in the process. Thread-safe."""
+
+    def __init__(self, priors: Optional[Dict[str, float]] = None, alpha: float = STAGE_COST_ALPHA):
+        self.alpha = alpha
+        self._est: Dict[str, float] = dict(STAGE_PRIOR_S if priors is None else priors)
+        self._seen: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float) -> None:
+        """Fold one measured stage into its estimate (stages without a prior are ignored)."""
+        with self._lock:
+            if stage not in self._est:
+                return
+            n = self._seen.get(stage, 0)
+            # The first measurement replaces the prior outright
+            self._est[stage] = seconds if n == 0 else (1 - self.alpha) * self._est[stage] + self.alpha * seconds
+            self._seen[stage] = n + 1
+
+    def estimate(self, stage: str) -> float:
+        with self._lock:
+            return self._est.get(stage, 0.0)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {s: {"est_s": round(v, 3), "observed": self._seen.get(s, 0)} for s, v in self._est.items()}
+
+
+_costs: Optional[StageCosts] = None
+_costs_lock = threading.Lock()
+
+
+def get_stage_costs() -> StageCosts:
+    global _costs
+    with _costs_lock:
+        if _costs is None:
+            _costs = StageCosts()
+        return _costs
+
+
+class Deadline:
+    """
+    Wall-clock budget of one run, started at construction. With seconds <= 0
+    it never expires and every stage fits.
+    """
+
+    def __init__(self, seconds: Optional[float] = None, costs: Optional[StageCosts] = None):
+        self.seconds = max(0.0, float(DEADLINE_S if seconds is None else seconds))
+        self.costs = costs or get_stage_costs()
+        self._t0 = time.perf_counter()
+
+    @property
+    def enabled(self) -> bool:
+        return self.seconds > 0
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._t0
+
+    def remaining(self) -> float:
+        return self.seconds - self.elapsed() if self.enabled else float("inf")
+
+    def estimate(self, stages: Iterable[str]) -> float:
+        return sum(self.costs.estimate(s) for s in stages)
+
+    def fits(self, stages: Iterable[str], reserve: Iterable[str] = ()) -> bool:
+        """Whether `stages` can run and still leave time for `reserve` (e.g. synthesis) before the deadline."""
+        if not self.enabled:
+            return True
+        return self.remaining() >= self.estimate(stages) + self.estimate(reserve) + DEADLINE_MARGIN_S
+
+    def status(self) -> Dict[str, float]:
+        return {"deadline_s": self.seconds, "elapsed_s": round(self.elapsed(), 3), "remaining_s": round(self.remaining(), 3)}
@@ -0,0 +1,130 @@
+import os
+import random
+import hashlib
+from typing import Any, Dict, List, Set, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from textutil import estimate_tokens, tokenize
+
+# ---------------------------
+# Config
+# ---------------------------
+NEAR_DUP_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", "0.8"))  # estimated Jaccard similarity
+SHINGLE_SIZE = 5
+NUM_PERM = 64
+
+_TRACKING_PARAMS = {
+    "gclid", "fbclid", "msclkid", "yclid", "dclid", "igshid", "mc_cid", "mc_eid",
+    "ref", "ref_src", "ref_url", "referrer", "spm", "_hsenc", "_hsmi", "cmpid", "ncid",
+}
+_HOST_PREFIXES = ("www.", "m.", "amp.")
+
+_MERSENNE = (1 << 61) - 1
+_rng = random.Random(1337)
+_PERMS = [(_rng.randrange(1, _MERSENNE), _rng.randrange(0, _MERSENNE)) for _ in range(NUM_PERM)]
+
+
+def canonicalize_url(url: str) -> str:
+    """Normalize a URL for identity checks: host, tracking params, fragment, trailing slash."""
+    raw = (url or "").strip()
+    if not raw:
+        return ""
+    parts = urlsplit(raw if "://" in raw else "https://" + raw)
+    host = (parts.hostname or "").lower()
+    for prefix in _HOST_PREFIXES:
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+            break
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+    path = parts.path or "/"
+    if len(path) > 1:
+        path = path.rstrip("/")
+    if path.endswith("/amp"):
+        path = path[: -len("/amp")] or "/"
+    query = sorted(
+        (k, v)
+        for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in _TRACKING_PARAMS
+    )
+    # Scheme is dropped on purpose: http/https copies are the same document
+    return urlunsplit(("https", host, path, urlencode(query), ""))
+
+
+def _shingles(text: str) -> Set[str]:
+    words = tokenize(text)
+    if len(words) < SHINGLE_SIZE:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def minhash(text: str) -> Tuple[int, ...]:
+    hashes = [
+        int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big")
+        for s in _shingles(text)
+    ]
+    if not hashes:
+        return ()
+    return tuple(min((a * h + b) % _MERSENNE for h in hashes) for a, b in _PERMS)
+
+
+def similarity(sig_a: Tuple[int, ...], sig_b: Tuple[int, ...]) -> float:
+    """Estimated Jaccard similarity of two MinHash signatures."""
+    if not sig_a or not sig_b:
+        return 0.0
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / len(sig_a)
+
+
+class SourceDeduper:
+    """
+    Drops exact (canonical URL) and near-duplicate (MinHash on content) sources.
+    Keeps state across iterations, so one instance should live for a whole run.
+    """
+
+    def __init__(self, threshold: float = NEAR_DUP_THRESHOLD):
+        self.threshold = threshold
+        self._urls: Set[str] = set()
+        self._signatures: List[Tuple[int, ...]] = []
+        self.kept = 0
+        self.dropped_exact = 0
+        self.dropped_near = 0
+        self.tokens_saved = 0
+
+    def add(self, sources: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Return the sources not seen before (in order) and remember them."""
+        fresh: List[Dict[str, Any]] = []
+        for s in sources:
+            url = canonicalize_url(s.get("url") or "")
+            content = s.get("content") or ""
+            if url and url in self._urls:
+                self.dropped_exact += 1
+                self.tokens_saved += estimate_tokens(content)
+                continue
+
+            sig = minhash(content)
+            if sig and any(similarity(sig, seen) >= self.threshold for seen in self._signatures):
+                self.dropped_near += 1
+                self.tokens_saved += estimate_tokens(content)
+                if url:
+                    self._urls.add(url)
+                continue
+
+            if url:
+                self._urls.add(url)
+            if sig:
+                self._signatures.append(sig)
+            self.kept += 1
+            fresh.append(s)
+        return fresh
+
+    def seen_urls(self) -> Set[str]:
+        """Canonical URLs of every source seen so far (kept or dropped)."""
+        return set(self._urls)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "kept": self.kept,
+            "dropped_exact": self.dropped_exact,
+            "dropped_near": self.dropped_near,
+            "tokens_saved": self.tokens_saved,
+        }
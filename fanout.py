@@ -0,0 +1,63 @@
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+from dedup import canonicalize_url
+
+# Upper bound on concurrent search calls per iteration (fan-out mode)
+SEARCH_WORKERS = int(os.getenv("SEARCH_WORKERS", "4"))
+
+_LIST_PREFIX = re.compile(r"^\s*(?:[-*•]+|\d+[.)]|Query\s*\d*:)\s*", re.IGNORECASE)
+
+
+def parse_queries(text: str, k: int) -> List[str]:
+    """Turn an LLM "one query per line" reply into at most k clean, distinct queries."""
+    queries: List[str] = []
+    seen = set()
+    for line in (text or "").splitlines():
+        q = _LIST_PREFIX.sub("", line).strip().strip('"').strip("'").strip()[:300]
+        if not q or q.lower() in seen:
+            continue
+        seen.add(q.lower())
+        queries.append(q)
+        if len(queries) >= k:
+            break
+    return queries
+
+
+def search_concurrently(
+    search_fn: Callable[[str], List[Dict[str, Any]]],
+    queries: List[str],
+    max_workers: int | None = None,
+) -> List[List[Dict[str, Any]]]:
+    """Run search_fn for every query in a bounded thread pool; results keep query order."""
+    if not queries:
+        return []
+    workers = max(1, min(max_workers or SEARCH_WORKERS, len(queries)))
+    if workers == 1:
+        return [search_fn(q) for q in queries]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="search") as pool:
+        return list(pool.map(search_fn, queries))
+
+
+def merge_by_url(result_lists: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    Merge per-query results, dropping repeated (canonicalized) URLs.
+    Results are interleaved round-robin so every query's top hit comes first.
+    """
+    merged: List[Dict[str, Any]] = []
+    seen = set()
+    depth = max((len(r) for r in result_lists), default=0)
+    for rank in range(depth):
+        for results in result_lists:
+            if rank >= len(results):
+                continue
+            item = results[rank]
+            url = canonicalize_url(item.get("url") or "")
+            if url:
+                if url in seen:
+                    continue
+                seen.add(url)
+            merged.append(item)
+    return merged
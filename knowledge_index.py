@@ -0,0 +1,271 @@
+import os
+import re
+import time
+import argparse
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+from dedup import canonicalize_url
+from textutil import content_terms, tokenize
+
+# ---------------------------
+# Config
+# ---------------------------
+KNOWLEDGE_INDEX = os.getenv("KNOWLEDGE_INDEX", "1") == "1"  # 0 = never consult or update the index
+KNOWLEDGE_INDEX_PATH = os.getenv("KNOWLEDGE_INDEX_PATH", os.path.join(".cache", "knowledge.sqlite3"))
+KNOWLEDGE_MAX_DOCS = int(os.getenv("KNOWLEDGE_MAX_DOCS", "20000"))
+KNOWLEDGE_FRESH_S = float(os.getenv("KNOWLEDGE_FRESH_S", str(7 * 24 * 60 * 60)))  # older docs are not served
+KNOWLEDGE_MIN_MATCH = float(os.getenv("KNOWLEDGE_MIN_MATCH", "0.6"))  # share of query terms a doc must contain
+
+
+_SITE_FILTER = re.compile(r"\bsite:\S+", re.IGNORECASE)
+
+
+def _fts_query(terms: List[str]) -> str:
+    # Quote every term so FTS5 operators/punctuation in user text cannot break the query
+    return " OR ".join('"' + t.replace('"', '""') + '"' for t in terms)
+
+
+class KnowledgeIndex:
+    """
+    Every source the agent has collected, in SQLite FTS5 (BM25 ranking), with
+    fetch time for freshness and an LRU size cap. Thread-safe.
+    """
+
+    def __init__(
+        self,
+        path: str = KNOWLEDGE_INDEX_PATH,
+        max_docs: int = KNOWLEDGE_MAX_DOCS,
+        fresh_s: float = KNOWLEDGE_FRESH_S,
+        min_match: float = KNOWLEDGE_MIN_MATCH,
+    ):
+        self.path = path
+        self.max_docs = max(1, max_docs)
+        self.fresh_s = fresh_s
+        self.min_match = min_match
+        self.hits = 0
+        self.misses = 0
+        self.added = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            folder = os.path.dirname(self.path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS docs (
+                    id INTEGER PRIMARY KEY,
+                    url TEXT NOT NULL UNIQUE,  -- canonical URL: identity only, never served
+                    source_url TEXT,           -- URL as the search provider returned it
+                    title TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_docs_access ON docs(last_access);
+                CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5(
+                    title, content, content='docs', content_rowid='id'
+                );
+                CREATE TRIGGER IF NOT EXISTS docs_ai AFTER INSERT ON docs BEGIN
+                    INSERT INTO docs_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+                END;
+                CREATE TRIGGER IF NOT EXISTS docs_ad AFTER DELETE ON docs BEGIN
+                    INSERT INTO docs_fts(docs_fts, rowid, title, content)
+                    VALUES ('delete', old.id, old.title, old.content);
+                END;
+                CREATE TRIGGER IF NOT EXISTS docs_au AFTER UPDATE OF title, content ON docs BEGIN
+                    INSERT INTO docs_fts(docs_fts, rowid, title, content)
+                    VALUES ('delete', old.id, old.title, old.content);
+                    INSERT INTO docs_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+                END;
+                """
+            )
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(docs)")}
+            if "source_url" not in columns:
+                # Indexes created before source_url existed serve their canonical URL
+                self._db.execute("ALTER TABLE docs ADD COLUMN source_url TEXT")
+            self._db.commit()
+        return self._db
+
+    def add(self, sources: List[Dict[str, Any]]) -> int:
+        """Insert or refresh sources (keyed by canonical URL, original URL kept); returns how many were written."""
+        now = time.time()
+        rows = []
+        for s in sources:
+            original = (s.get("url") or "").strip()
+            url = canonicalize_url(original)
+            content = (s.get("content") or "").strip()
+            if url and content:
+                rows.append((url, original, (s.get("title") or "").strip(), content, now, now))
+        if not rows:
+            return 0
+        with self._lock:
+            db = self._conn()
+            db.executemany(
+                """INSERT INTO docs (url, source_url, title, content, fetched_at, last_access)
+                   VALUES (?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(url) DO UPDATE SET
+                       source_url = excluded.source_url, title = excluded.title, content = excluded.content,
+                       fetched_at = excluded.fetched_at, last_access = excluded.last_access""",
+                rows,
+            )
+            self.added += len(rows)
+            self._evict(db)
+            db.commit()
+        return len(rows)
+
+    def search(
+        self,
+        query: str,
+        limit: int,
+        max_age_s: Optional[float] = None,
+        exclude: Optional[Iterable[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Fresh documents that contain most of the query's terms, best BM25 first
+        (title matches weigh double). `exclude` holds canonical URLs the caller
+        already has. Empty when the index cannot answer.
+        """
+        skip = set(exclude or ())
+        # Web-search operators (site:…) say nothing about a document's content
+        terms = list(dict.fromkeys(content_terms(_SITE_FILTER.sub(" ", query or ""))))
+        if not terms or limit <= 0:
+            return []
+        now = time.time()
+        cutoff = now - (self.fresh_s if max_age_s is None else max_age_s)
+        with self._lock:
+            db = self._conn()
+            rows = db.execute(
+                """SELECT d.id, d.url, d.source_url, d.title, d.content, d.fetched_at, bm25(docs_fts, 2.0, 1.0) AS rank
+                   FROM docs_fts JOIN docs d ON d.id = docs_fts.rowid
+                   WHERE docs_fts MATCH ? AND d.fetched_at >= ?
+                   ORDER BY rank LIMIT ?""",
+                (_fts_query(terms), cutoff, (limit + len(skip)) * 4),
+            ).fetchall()
+            results = []
+            for doc_id, url, source_url, title, content, fetched_at, rank in rows:
+                if url in skip:
+                    continue
+                words = set(tokenize(f"{title} {content}"))
+                if sum(1 for t in terms if t in words) / len(terms) < self.min_match:
+                    continue
+                results.append({
+                    "id": doc_id,
+                    "title": title,
+                    "url": source_url or url,
+                    "content": content,
+                    "fetched_at": fetched_at,
+                    "score": round(-rank, 3),
+                })
+                if len(results) >= limit:
+                    break
+            if results:
+                db.executemany("UPDATE docs SET last_access = ? WHERE id = ?", [(now, r["id"]) for r in results])
+                db.commit()
+                self.hits += 1
+            else:
+                self.misses += 1
+        for r in results:
+            r.pop("id")
+        return results
+
+    def _evict(self, db: sqlite3.Connection) -> None:
+        (count,) = db.execute("SELECT COUNT(*) FROM docs").fetchone()
+        overflow = count - self.max_docs
+        if overflow > 0:
+            cur = db.execute(
+                "DELETE FROM docs WHERE id IN (SELECT id FROM docs ORDER BY last_access ASC LIMIT ?)",
+                (overflow,),
+            )
+            self.evictions += max(cur.rowcount, 0)
+
+    def prune(self, older_than_s: float) -> int:
+        """Drop documents fetched more than older_than_s ago."""
+        with self._lock:
+            db = self._conn()
+            cur = db.execute("DELETE FROM docs WHERE fetched_at < ?", (time.time() - older_than_s,))
+            db.commit()
+            return max(cur.rowcount, 0)
+
+    def rebuild(self) -> None:
+        """Regenerate the full-text index from the docs table (e.g. after a crash or manual edits)."""
+        with self._lock:
+            db = self._conn()
+            db.execute("INSERT INTO docs_fts(docs_fts) VALUES ('rebuild')")
+            db.commit()
+
+    def compact(self) -> None:
+        """Merge FTS segments and reclaim space left by deletes."""
+        with self._lock:
+            db = self._conn()
+            db.execute("INSERT INTO docs_fts(docs_fts) VALUES ('optimize')")
+            db.commit()
+            db.execute("VACUUM")
+
+    def clear(self) -> None:
+        with self._lock:
+            db = self._conn()
+            db.execute("DELETE FROM docs")
+            db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            docs, oldest, newest = self._conn().execute(
+                "SELECT COUNT(*), MIN(fetched_at), MAX(fetched_at) FROM docs"
+            ).fetchone()
+        now = time.time()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "added": self.added,
+            "evictions": self.evictions,
+            "docs": docs,
+            "oldest_age_h": round((now - oldest) / 3600, 1) if oldest else None,
+            "newest_age_h": round((now - newest) / 3600, 1) if newest else None,
+        }
+
+
+_knowledge_index: Optional[KnowledgeIndex] = None
+_knowledge_index_lock = threading.Lock()
+
+
+def get_knowledge_index() -> KnowledgeIndex:
+    """Process-wide index shared by main.py and main_langchain.py."""
+    global _knowledge_index
+    with _knowledge_index_lock:
+        if _knowledge_index is None:
+            _knowledge_index = KnowledgeIndex()
+        return _knowledge_index
+
+
+def main(argv: List[str] | None = None):
+    parser = argparse.ArgumentParser(description="Maintain the local knowledge index.")
+    parser.add_argument("command", choices=["stats", "rebuild", "compact", "prune", "clear"])
+    parser.add_argument("--older-than-days", type=float, default=None,
+                        help="prune/compact: drop docs fetched longer ago (default: KNOWLEDGE_FRESH_S)")
+    args = parser.parse_args(argv)
+
+    index = get_knowledge_index()
+    age_s = args.older_than_days * 86400 if args.older_than_days is not None else index.fresh_s
+    if args.command == "rebuild":
+        index.rebuild()
+    elif args.command == "prune":
+        print(f"Pruned {index.prune(age_s)} stale docs")
+    elif args.command == "compact":
+        # Stale docs are never served, so compaction drops them before merging segments
+        print(f"Pruned {index.prune(age_s)} stale docs")
+        index.rebuild()
+        index.compact()
+    elif args.command == "clear":
+        index.clear()
+    print(index.stats())
+
+
+if __name__ == "__main__":
+    main()
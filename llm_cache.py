@@ -0,0 +1,189 @@
+import os
+import time
+import json
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+# ---------------------------
+# Config
+# ---------------------------
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "512"))  # in-memory LRU entries
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "")  # e.g. .cache/llm_cache.sqlite3; empty = memory only
+LLM_CACHE_CHAINS = os.getenv("LLM_CACHE_CHAINS", "all")  # "all", "none" or e.g. "plan,query,eval"
+LLM_CACHE_TTL_S = float(os.getenv("LLM_CACHE_TTL_S", str(7 * 24 * 60 * 60)))  # persistent rows; 0 = never expire
+LLM_CACHE_DISK_MAX_ENTRIES = int(os.getenv("LLM_CACHE_DISK_MAX_ENTRIES", "20000"))  # persistent rows, LRU beyond
+
+
+def make_key(model: str, temperature: float, max_tokens: Optional[int], prompt: str) -> str:
+    raw = json.dumps([model, temperature, max_tokens, prompt], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """Two-tier completion cache: in-memory LRU, optionally backed by SQLite (TTL and LRU size bound)."""
+
+    def __init__(
+        self,
+        max_entries: int = LLM_CACHE_SIZE,
+        path: str = LLM_CACHE_PATH,
+        chains: str = LLM_CACHE_CHAINS,
+        ttl_s: float = LLM_CACHE_TTL_S,
+        disk_max_entries: int = LLM_CACHE_DISK_MAX_ENTRIES,
+    ):
+        self.max_entries = max(1, max_entries)
+        self.path = path
+        self.ttl_s = ttl_s
+        self.disk_max_entries = max(1, disk_max_entries)
+        self.evictions = 0
+        spec = (chains or "").strip().lower()
+        self._all = spec == "all"
+        self._chains = set() if spec in ("all", "none", "") else {
+            c.strip() for c in spec.split(",") if c.strip()
+        }
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+
+    def enabled(self, chain: str) -> bool:
+        return self._all or chain in self._chains
+
+    def _conn(self) -> Optional[sqlite3.Connection]:
+        if not self.path:
+            return None
+        if self._db is None:
+            folder = os.path.dirname(self.path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute(
+                """CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    chain TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL
+                )"""
+            )
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(llm_cache)")}
+            if "last_access" not in columns:
+                # Caches written before the size bound: their rows count as accessed when created
+                self._db.execute("ALTER TABLE llm_cache ADD COLUMN last_access REAL")
+                self._db.execute("UPDATE llm_cache SET last_access = created_at")
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_access ON llm_cache(last_access)")
+            self._db.commit()
+        return self._db
+
+    def _count(self, chain: str, field: str) -> None:
+        c = self._counts.setdefault(chain, {"hits": 0, "disk_hits": 0, "misses": 0})
+        c[field] += 1
+
+    def _remember(self, key: str, value: str) -> None:
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, chain: str, key: str) -> Optional[str]:
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._count(chain, "hits")
+                return self._memory[key]
+            db = self._conn()
+            row = db.execute("SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone() if db else None
+            now = time.time()
+            if row is not None and self._expired(row[1], now):
+                db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                db.commit()
+                row = None
+            if row is not None:
+                db.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+                db.commit()
+                self._remember(key, row[0])
+                self._count(chain, "hits")
+                self._count(chain, "disk_hits")
+                return row[0]
+            self._count(chain, "misses")
+            return None
+
+    def put(self, chain: str, key: str, value: str) -> None:
+        if not value:
+            return
+        with self._lock:
+            self._remember(key, value)
+            db = self._conn()
+            if db is not None:
+                now = time.time()
+                db.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, chain, value, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                    (key, chain, value, now, now),
+                )
+                self._evict(db, now)
+                db.commit()
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_s > 0 and now - created_at > self.ttl_s
+
+    def _evict(self, db: sqlite3.Connection, now: float) -> None:
+        # Expired rows first, then least-recently-used rows beyond the size bound
+        if self.ttl_s > 0:
+            cur = db.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_s,))
+            self.evictions += max(cur.rowcount, 0)
+        (count,) = db.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+        overflow = count - self.disk_max_entries
+        if overflow > 0:
+            cur = db.execute(
+                """DELETE FROM llm_cache WHERE key IN (
+                    SELECT key FROM llm_cache ORDER BY last_access ASC LIMIT ?
+                )""",
+                (overflow,),
+            )
+            self.evictions += max(cur.rowcount, 0)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            by_chain = {name: dict(c) for name, c in self._counts.items()}
+            memory_entries = len(self._memory)
+            evictions = self.evictions
+        return {
+            "hits": sum(c["hits"] for c in by_chain.values()),
+            "misses": sum(c["misses"] for c in by_chain.values()),
+            "evictions": evictions,
+            "memory_entries": memory_entries,
+            "persistent": bool(self.path),
+            "by_chain": by_chain,
+        }
+
+
+_llm_cache: Optional[LLMCache] = None
+_llm_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> LLMCache:
+    global _llm_cache
+    with _llm_cache_lock:
+        if _llm_cache is None:
+            _llm_cache = LLMCache()
+        return _llm_cache
+
+
+def stats_delta(before: Dict[str, Any], after: Dict[str, Any]) -> Dict[str, Any]:
+    """Per-run view of two stats() snapshots (only chains that were touched)."""
+    by_chain = {}
+    for name, c in after["by_chain"].items():
+        prev = before["by_chain"].get(name, {})
+        d = {field: n - prev.get(field, 0) for field, n in c.items()}
+        if any(d.values()):
+            by_chain[name] = d
+    return {
+        "hits": after["hits"] - before["hits"],
+        "misses": after["misses"] - before["misses"],
+        "evictions": after["evictions"] - before["evictions"],
+        "memory_entries": after["memory_entries"],
+        "persistent": after["persistent"],
+        "by_chain": by_chain,
+    }
@@ -0,0 +1,207 @@
+import os
+import json
+import time
+import uuid
+import argparse
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+# ---------------------------
+# Config
+# ---------------------------
+THINKING_LOG_PATH = os.getenv("THINKING_LOG_PATH", "logs/thinking_log.jsonl")
+THINKING_LOG_MAX_BYTES = int(os.getenv("THINKING_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+THINKING_LOG_MAX_AGE_S = float(os.getenv("THINKING_LOG_MAX_AGE_S", "86400"))  # 0 = never rotate by age
+THINKING_LOG_BACKUPS = int(os.getenv("THINKING_LOG_BACKUPS", "5"))  # rotated files kept (.1 … .N)
+THINKING_LOG_RING = int(os.getenv("THINKING_LOG_RING", "2000"))  # events kept in memory per run
+THINKING_LOG_FSYNC = os.getenv("THINKING_LOG_FSYNC", "0") == "1"  # also survive power loss, not just crashes
+
+
+def new_run_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+class LogSink:
+    """
+    Append-only JSONL file shared by every run in the process. Each event is one
+    line, flushed as soon as it is written, so a crash loses at most the event
+    being written. The file rotates (.1, .2, …) by size or age.
+    """
+
+    def __init__(
+        self,
+        path: str = THINKING_LOG_PATH,
+        max_bytes: int = THINKING_LOG_MAX_BYTES,
+        max_age_s: float = THINKING_LOG_MAX_AGE_S,
+        backups: int = THINKING_LOG_BACKUPS,
+        fsync: bool = THINKING_LOG_FSYNC,
+    ):
+        self.path = os.path.abspath(path)  # stable even if the process changes directory
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_s
+        self.backups = max(0, backups)
+        self.fsync = fsync
+        self._file = None
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def _open(self) -> None:
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        if os.path.exists(self.path) and self._expired(os.path.getmtime(self.path)):
+            self._rotate()
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._opened_at = time.time()
+
+    def _expired(self, since: float) -> bool:
+        return bool(self.max_age_s) and time.time() - since >= self.max_age_s
+
+    def _rotate(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if not self.backups:
+            os.remove(self.path)
+            return
+        for n in range(self.backups, 0, -1):
+            src = self.path if n == 1 else f"{self.path}.{n - 1}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{n}")
+
+    def write(self, event: Dict[str, Any]) -> None:
+        line = json.dumps(event, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            if self._file is None:
+                self._open()
+            elif self._file.tell() >= self.max_bytes or self._expired(self._opened_at):
+                self._rotate()
+                self._open()
+            self._file.write(line)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+
+    def files(self) -> List[str]:
+        """Active file first, then rotated files newest to oldest."""
+        candidates = [self.path] + [f"{self.path}.{n}" for n in range(1, self.backups + 1)]
+        return [p for p in candidates if os.path.exists(p)]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+_sink: Optional[LogSink] = None
+_sink_lock = threading.Lock()
+
+
+def get_log_sink() -> LogSink:
+    global _sink
+    with _sink_lock:
+        if _sink is None:
+            _sink = LogSink()
+        return _sink
+
+
+class RunLog:
+    """
+    Thinking log of one run: every event goes to the JSONL sink immediately and
+    into a bounded ring for the UI. The full log is read back with load_run().
+    """
+
+    def __init__(self, run_id: Optional[str] = None, ring: int = THINKING_LOG_RING, sink: Optional[LogSink] = None):
+        self.run_id = run_id or new_run_id()
+        self.sink = sink or get_log_sink()
+        self.on_event: Optional[Callable[[Dict[str, Any]], None]] = None  # live subscriber (e.g. server.py SSE)
+        self._ring: deque = deque(maxlen=max(1, ring))
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def append(self, entry: Dict[str, Any]) -> None:
+        """Record an event dict (time/step/data); run_id and a sequence number are added."""
+        with self._lock:
+            self._seq += 1
+            event = {"run_id": self.run_id, "seq": self._seq, **entry}
+            self._ring.append(event)
+        try:
+            self.sink.write(event)
+        except OSError:
+            pass  # a full or read-only disk must not fail the research run; the ring still has it
+        if self.on_event is not None:
+            self.on_event(event)
+
+    @classmethod
+    def resume(cls, run_id: str, ring: int = THINKING_LOG_RING, sink: Optional[LogSink] = None) -> "RunLog":
+        """Continue an earlier run's log: its events are reloaded into the ring and numbering carries on."""
+        log = cls(run_id, ring, sink)
+        events = load_run(run_id, log.sink)
+        log._ring.extend(events)
+        log._seq = max((e.get("seq", 0) for e in events), default=0)
+        return log
+
+    def events(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._ring)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._ring)
+
+
+def _iter_events(paths: List[str], run_id: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    # Oldest file first so events come out in write order
+    needle = f'"run_id": "{run_id}"' if run_id else None
+    for path in reversed(paths):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if needle and needle not in line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn line from a crash mid-write
+
+
+def load_run(run_id: str, sink: Optional[LogSink] = None) -> List[Dict[str, Any]]:
+    """All events of one run, across rotated files, as the JSON array the old thinking_log.json held."""
+    sink = sink or get_log_sink()
+    events = [e for e in _iter_events(sink.files(), run_id) if e.get("run_id") == run_id]
+    return sorted(events, key=lambda e: e.get("seq", 0))
+
+
+def latest_run_id(sink: Optional[LogSink] = None) -> Optional[str]:
+    sink = sink or get_log_sink()
+    for path in sink.files():
+        with open(path, "rb") as f:
+            # Only the tail is needed; avoid reading a large file in full
+            f.seek(max(0, os.path.getsize(path) - 65536))
+            lines = f.read().decode("utf-8", errors="ignore").splitlines()
+        for line in reversed(lines):
+            try:
+                return json.loads(line)["run_id"]
+            except (json.JSONDecodeError, KeyError, TypeError):
+                continue
+    return None
+
+
+def main(argv: List[str] | None = None):
+    parser = argparse.ArgumentParser(description="Export one run from the JSONL thinking log as a JSON array.")
+    parser.add_argument("run_id", nargs="?", default="latest", help="run ID (default: the most recent run)")
+    parser.add_argument("-o", "--output", default="thinking_log.json")
+    args = parser.parse_args(argv)
+
+    run_id = latest_run_id() if args.run_id == "latest" else args.run_id
+    events = load_run(run_id) if run_id else []
+    if not events:
+        raise SystemExit(f"No events found for run {args.run_id!r} in {THINKING_LOG_PATH}")
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(events, f, ensure_ascii=False, indent=2)
+    print(f"Wrote {len(events)} events of run {run_id} to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,28 @@
 import os
+import sys
 import json
+import sqlite3
 from datetime import datetime
 from dotenv import load_dotenv
-from groq import Groq
-from tavily import TavilyClient
 from rich.console import Console
 from rich.panel import Panel
 from rich.table import Table
 
+from checkpoint import CHECKPOINTS, get_checkpoint_store
+from clients import MissingKeyError, get_groq_client, get_tavily_client, pool_stats, require_keys
+from dedup import SourceDeduper
+from fanout import merge_by_url, parse_queries, search_concurrently
+from knowledge_index import KNOWLEDGE_INDEX, get_knowledge_index
+from llm_cache import get_llm_cache, make_key
+from llm_cache import stats_delta as llm_stats_delta
+from log_sink import RunLog
+from model_routing import routing_table, stage_model
+from pre_eval import pre_evaluate
+from rate_limit import get_limiter, limiter_stats
+from search_cache import SEARCH_CACHE_BYPASS, get_search_cache, stats_delta
+from telemetry import RunMetrics
+from textutil import estimate_tokens
+
 # ---------------------------
 # Setup
 # ---------------------------
@@ -17,24 +32,40 @@ console = Console()
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
 
-if not GROQ_API_KEY or not TAVILY_API_KEY:
-    console.print("[red]Missing API keys in .env file[/red]")
-    console.print("Make sure .env contains:")
-    console.print("GROQ_API_KEY=...\nTAVILY_API_KEY=...")
-    raise SystemExit(1)
+# Shared clients over pooled keep-alive connections (retries/backoff live in rate_limit),
+# built on first use so importing this module does not load the SDKs
+llm = None
+search = None
+
+
+def get_llm():
+    global llm
+    if llm is None:
+        require_keys(GROQ_API_KEY=GROQ_API_KEY)
+        llm = get_groq_client(GROQ_API_KEY)
+    return llm
+
+
+def get_search():
+    global search
+    if search is None:
+        require_keys(TAVILY_API_KEY=TAVILY_API_KEY)
+        search = get_tavily_client(TAVILY_API_KEY)
+    return search
 
-llm = Groq(api_key=GROQ_API_KEY)
-search = TavilyClient(api_key=TAVILY_API_KEY)
 
-# Use a current Groq model name
-MODEL = "llama-3.1-8b-instant"   # fallback: "llama-3.1-8b-instant"
-TEMPERATURE = 0.3
+# Model, temperature and max_tokens are chosen per stage: see model_routing.py
 
 MAX_ITERATIONS = 3
 MAX_RESULTS_PER_SEARCH = 3
+QUERY_FANOUT = int(os.getenv("QUERY_FANOUT", "1"))  # queries searched per iteration
 
-# Thinking log (for demo + possible export)
-thinking_log = []
+# Thinking log of the current research() run: streamed to the JSONL sink, bounded in memory
+thinking_log = RunLog()
+# Per-stage latency / tokens of the current run (logged as run_summary)
+metrics = RunMetrics()
+# Sources of the current run seen so far (search_once keeps the knowledge index from re-serving them)
+deduper = SourceDeduper()
 
 
 def log(step: str, data=None):
@@ -47,14 +78,38 @@ def log(step: str, data=None):
     thinking_log.append(entry)
 
 
-def ask_llm(prompt: str) -> str:
-    """Call Groq chat completion and return text."""
-    resp = llm.chat.completions.create(
-        model=MODEL,
-        messages=[{"role": "user", "content": prompt}],
-        temperature=TEMPERATURE,
-    )
-    return (resp.choices[0].message.content or "").strip()
+def ask_llm(prompt: str, chain: str = "default") -> str:
+    """Call Groq chat completion and return text (served from the LLM cache when possible)."""
+    cfg = stage_model(chain)
+    cache = get_llm_cache()
+    key = make_key(cfg["model"], cfg["temperature"], cfg["max_tokens"], prompt) if cache.enabled(chain) else None
+    if key:
+        cached = cache.get(chain, key)
+        if cached is not None:
+            return cached
+
+    limiter = get_limiter("groq")
+    estimated = estimate_tokens(prompt)
+    with metrics.span(chain, llm=True, model=cfg["model"], prompt_bytes=len(prompt.encode("utf-8"))) as span:
+        resp = limiter.call(
+            lambda: get_llm().chat.completions.create(
+                model=cfg["model"],
+                messages=[{"role": "user", "content": prompt}],
+                temperature=cfg["temperature"],
+                max_tokens=cfg["max_tokens"],
+            ),
+            tokens=estimated,
+            on_retry=lambda info: log("retry", {"stage": chain, **info}),
+        )
+        usage = getattr(resp, "usage", None)
+        if usage is not None and getattr(usage, "total_tokens", None):
+            span["prompt_tokens"] = getattr(usage, "prompt_tokens", 0) or 0
+            span["completion_tokens"] = getattr(usage, "completion_tokens", 0) or 0
+            limiter.tokens.adjust(usage.total_tokens - estimated)
+    text = (resp.choices[0].message.content or "").strip()
+    if key:
+        cache.put(chain, key, text)
+    return text
 
 
 def make_plan(question: str) -> str:
@@ -72,7 +127,7 @@ PLAN:
 3) ...
 STOP_CRITERIA: one sentence
 """
-    plan = ask_llm(prompt)
+    plan = ask_llm(prompt, "plan")
     return plan
 
 
@@ -85,7 +140,7 @@ Return ONLY ONE short Google-style search query (max 12 words).
 No explanations. No quotes. No bullet points.
 Only the query text.
 """
-    q = ask_llm(prompt)
+    q = ask_llm(prompt, "query")
     return q[:300].strip()
 
 
@@ -106,10 +161,90 @@ Constraints:
 - no bullet points
 - only the query text
 """
-    q = ask_llm(prompt)
+    q = ask_llm(prompt, "improve_query")
     return q[:300].strip()
 
 
+def choose_initial_queries(question: str, k: int) -> list:
+    """Generate K diverse initial search queries (fan-out mode)."""
+    prompt = f"""
+Research question: {question}
+
+Return {k} diverse Google-style search queries (max 12 words each).
+Each query should cover a different angle of the question.
+One query per line. No numbering. No explanations. No quotes.
+"""
+    return parse_queries(ask_llm(prompt, "multi_query"), k) or [question[:300].strip()]
+
+
+def improve_queries(question: str, previous_queries: list, evaluation: str, k: int) -> list:
+    """Generate K improved search queries based on gaps (fan-out mode)."""
+    prompt = f"""
+Research question: {question}
+
+Previous queries: {" | ".join(previous_queries)}
+
+Evaluator feedback:
+{evaluation}
+
+Return {k} diverse improved search queries that target the missing gaps.
+Constraints:
+- max 12 words each
+- no quotes
+- no bullet points, no numbering
+- one query per line
+"""
+    return parse_queries(ask_llm(prompt, "improve_multi_query"), k) or list(previous_queries[:1])
+
+
+def search_once(query: str) -> list:
+    """Run one Tavily search (through the local result cache) and keep title/url/content only."""
+    if not SEARCH_CACHE_BYPASS:
+        cached = get_search_cache().get(query, MAX_RESULTS_PER_SEARCH)
+        if cached is not None:
+            return cached
+
+    # Reuse sources from earlier runs when the local corpus covers the query with docs this run does not have yet
+    index = get_knowledge_index() if KNOWLEDGE_INDEX else None
+    if index is not None and not SEARCH_CACHE_BYPASS:
+        local = index.search(query, MAX_RESULTS_PER_SEARCH, exclude=deduper.seen_urls())
+        if len(local) >= MAX_RESULTS_PER_SEARCH:
+            log("knowledge_hit", {"query": query, "count": len(local)})
+            return [{"title": d["title"], "url": d["url"], "content": d["content"]} for d in local]
+
+    with metrics.span("search", prompt_bytes=len(query.encode("utf-8"))) as span:
+        results = get_limiter("tavily").call(
+            lambda: get_search().search(query, max_results=MAX_RESULTS_PER_SEARCH),
+            on_retry=lambda info: log("retry", {"stage": "search", **info}),
+        )
+        items = [
+            {"title": r.get("title"), "url": r.get("url"), "content": r.get("content")}
+            for r in results.get("results", [])
+        ]
+        span["result_count"] = len(items)
+    if items and not SEARCH_CACHE_BYPASS:
+        get_search_cache().put(query, MAX_RESULTS_PER_SEARCH, items)
+    if index is not None:
+        index.add(items)
+    return items
+
+
+def search_or_empty(query: str) -> list:
+    """search_once for fan-out: one failing query must not sink the others."""
+    try:
+        return search_once(query)
+    except Exception as e:
+        log("tool_search_error", {"query": query, "error": str(e)[:200]})
+        return []
+
+
+def search_all(queries: list) -> list:
+    """Search every query concurrently and merge the hits by URL."""
+    if len(queries) == 1:
+        return search_once(queries[0])
+    return merge_by_url(search_concurrently(search_or_empty, queries))
+
+
 def evaluate_enough(question: str, recent_sources: list) -> str:
     """Ask LLM if we have enough info; must output DECISION & GAPS."""
     prompt = f"""
@@ -122,7 +257,7 @@ Answer in EXACTLY this format (2 lines):
 DECISION: YES or NO
 GAPS: one short sentence on what's missing
 """
-    return ask_llm(prompt)
+    return ask_llm(prompt, "eval")
 
 
 def synthesize_answer(question: str, sources: list) -> str:
@@ -146,7 +281,7 @@ Rules:
 - Do NOT invent facts not supported by the sources.
 - If sources are insufficient, say what is missing.
 """
-    return ask_llm(prompt)
+    return ask_llm(prompt, "synth")
 
 
 def print_sources_table(sources: list):
@@ -161,43 +296,86 @@ def print_sources_table(sources: list):
     console.print(table)
 
 
-def research(question: str):
+def save_checkpoint(stage: str, question: str, sources: list, loop: dict) -> str:
+    """Persist the loop state after `stage` under this run's ID; returns the stage."""
+    if CHECKPOINTS:
+        try:
+            get_checkpoint_store().save(
+                thinking_log.run_id, "main", stage, {"question": question, "sources": sources, "loop": loop}
+            )
+        except (OSError, sqlite3.Error) as e:
+            log("checkpoint_error", {"stage": stage, "error": str(e)[:200]})
+    return stage
+
+
+def research(question: str, checkpoint: dict | None = None):
+    """Run the research loop; with a checkpoint (see resume()) finished stages are skipped."""
+    global thinking_log, metrics, deduper
+    thinking_log = RunLog.resume(checkpoint["run_id"]) if checkpoint else RunLog()
+    metrics = RunMetrics()
     console.print(Panel(f"[bold cyan]Research Question:[/bold cyan] {question}"))
+    cache_before = get_search_cache().stats()
+    llm_cache_before = get_llm_cache().stats()
+    deduper = SourceDeduper()
 
     # 0) Plan
-    plan = make_plan(question)
-    log("plan_created", plan)
+    if checkpoint:
+        stage, loop = checkpoint["stage"], dict(checkpoint["state"]["loop"])
+        context_data = checkpoint["state"]["sources"]
+        deduper.add(context_data)
+        plan = loop["plan"]
+        log("resumed", {"stage": stage, "iteration": loop["iteration"] + 1, "sources": len(context_data)})
+    else:
+        plan = make_plan(question)
+        log("plan_created", plan)
+        context_data = []
+        loop = {"plan": plan, "search_queries": [], "evaluation": "", "iteration": -1}
+        stage = save_checkpoint("plan", question, context_data, loop)
     console.print(Panel(plan, title="PLAN", border_style="cyan"))
 
-    context_data = []
-    evaluation = ""
-    search_query = ""
+    evaluation = loop["evaluation"]
+    search_queries = loop["search_queries"]
+    k = max(1, QUERY_FANOUT)
+    # After an evaluation the next iteration starts; after a search, its evaluation is still due
+    start = loop["iteration"] + (0 if stage == "search" else 1)
+    if stage == "eval" and "DECISION: YES" in evaluation.upper():
+        start = MAX_ITERATIONS
 
     # 1) Iterative loop
-    for iteration in range(MAX_ITERATIONS):
+    for iteration in range(start, MAX_ITERATIONS):
         console.print(f"\n[yellow]Iteration {iteration + 1}[/yellow]")
 
-        if iteration == 0:
-            search_query = choose_initial_query(question)
+        if stage == "search" and iteration == loop["iteration"]:
+            new_sources = context_data[len(context_data) - loop["new_count"]:]
         else:
-            search_query = improve_query(question, search_query, evaluation)
-
-        log("search_query", {"iteration": iteration + 1, "query": search_query})
-        console.print(f"[blue]Search Query:[/blue] {search_query}")
-
-        results = search.search(search_query, max_results=MAX_RESULTS_PER_SEARCH)
-
-        new_sources = []
-        for r in results.get("results", []):
-            item = {
-                "title": r.get("title"),
-                "url": r.get("url"),
-                "content": r.get("content"),
-            }
-            context_data.append(item)
-            new_sources.append(item)
-
-        log("search_results", {"iteration": iteration + 1, "count": len(new_sources)})
+            if k == 1:
+                if iteration == 0:
+                    search_queries = [choose_initial_query(question)]
+                else:
+                    search_queries = [improve_query(question, search_queries[0], evaluation)]
+                log("search_query", {"iteration": iteration + 1, "query": search_queries[0]})
+            else:
+                if iteration == 0:
+                    search_queries = choose_initial_queries(question, k)
+                else:
+                    search_queries = improve_queries(question, search_queries, evaluation, k)
+                log("search_query", {"iteration": iteration + 1, "queries": search_queries})
+
+            for search_query in search_queries:
+                console.print(f"[blue]Search Query:[/blue] {search_query}")
+
+            found = search_all(search_queries)
+            # Drop sources already collected in earlier iterations (same URL or syndicated copy)
+            new_sources = deduper.add(found)
+            context_data.extend(new_sources)
+
+            log("search_results", {
+                "iteration": iteration + 1,
+                "count": len(new_sources),
+                "duplicates": len(found) - len(new_sources),
+            })
+            loop.update(iteration=iteration, search_queries=search_queries, new_count=len(new_sources))
+            stage = save_checkpoint("search", question, context_data, loop)
 
         # Show sources each iteration (nice for demo)
         if new_sources:
@@ -205,31 +383,78 @@ def research(question: str):
         else:
             console.print("[red]No results returned from search.[/red]")
 
-        # Evaluate sufficiency using only recent sources (prevents huge prompts)
-        evaluation = evaluate_enough(question, new_sources or context_data[-3:])
-        log("evaluation", {"iteration": iteration + 1, "evaluation": evaluation})
+        # Score coverage locally first; the LLM only decides the uncertain band
+        pre = pre_evaluate(question, context_data)
+        log("pre_eval", {"iteration": iteration + 1, **{k: v for k, v in pre.items() if k != "evaluation"}})
+        if pre["evaluation"] is not None:
+            evaluation, decided_by = pre["evaluation"], "pre_eval"
+        else:
+            # Evaluate sufficiency using only recent sources (prevents huge prompts)
+            evaluation, decided_by = evaluate_enough(question, new_sources or context_data[-3:]), "llm"
+        log("evaluation", {"iteration": iteration + 1, "evaluation": evaluation, "decided_by": decided_by})
         console.print(f"[magenta]Evaluation:[/magenta]\n{evaluation}")
+        loop.update(iteration=iteration, evaluation=evaluation)
+        stage = save_checkpoint("eval", question, context_data, loop)
 
         if "DECISION: YES" in evaluation.upper():
             log("stop", {"reason": "sufficient_information"})
             break
     else:
-        log("stop", {"reason": "max_iterations_reached"})
+        if "DECISION: YES" not in evaluation.upper():
+            log("stop", {"reason": "max_iterations_reached"})
+
+    log("dedup_stats", deduper.stats())
 
     # 2) Final synthesis
     final_answer = synthesize_answer(question, context_data)
     log("final_answer", final_answer)
+    log("search_cache_stats", {
+        "bypassed": SEARCH_CACHE_BYPASS,
+        **stats_delta(cache_before, get_search_cache().stats()),
+    })
+    log("llm_cache_stats", llm_stats_delta(llm_cache_before, get_llm_cache().stats()))
+    log("rate_limit_stats", limiter_stats())
+    log("client_pool_stats", pool_stats())
+    if KNOWLEDGE_INDEX:
+        log("knowledge_index_stats", get_knowledge_index().stats())
+    log("model_routing", routing_table())
+    log("run_summary", metrics.summary())
+    if CHECKPOINTS:
+        get_checkpoint_store().finish(thinking_log.run_id)
 
     console.print(Panel(final_answer, title="FINAL ANSWER", border_style="green"))
 
-    # 3) Optional: export thinking log (for submission)
-    with open("thinking_log.json", "w", encoding="utf-8") as f:
-        json.dump(thinking_log, f, ensure_ascii=False, indent=2)
+    # 3) Events were streamed as they happened; `python log_sink.py` exports this run as JSON
+    console.print(f"[bold green]Thinking log: {thinking_log.sink.path} (run {thinking_log.run_id})[/bold green]")
 
-    console.print("[bold green]Saved thinking log to thinking_log.json[/bold green]")
+
+def resume(run_id: str):
+    """Continue an interrupted research() run from its last checkpointed stage."""
+    checkpoint = get_checkpoint_store().load(run_id)
+    if checkpoint is None or checkpoint["pipeline"] != "main":
+        raise KeyError(f"No checkpoint for run {run_id!r}")
+    research(checkpoint["state"]["question"], checkpoint)
 
 
 if __name__ == "__main__":
+    try:
+        require_keys(GROQ_API_KEY=GROQ_API_KEY, TAVILY_API_KEY=TAVILY_API_KEY)
+    except MissingKeyError as e:
+        console.print(f"[red]{e}[/red]")
+        console.print("Make sure .env contains:")
+        console.print("GROQ_API_KEY=...\nTAVILY_API_KEY=...")
+        raise SystemExit(1)
+
+    # python main.py --resume [RUN_ID]: continue an interrupted run (default: the most recent one)
+    if len(sys.argv) > 1 and sys.argv[1] == "--resume":
+        run_id = sys.argv[2] if len(sys.argv) > 2 else get_checkpoint_store().latest("main")
+        try:
+            resume(run_id or "")
+        except KeyError as e:
+            console.print(f"[red]{e.args[0]}[/red]")
+            raise SystemExit(1)
+        raise SystemExit(0)
+
     q = input("Enter your research question: ").strip()
     if not q:
         console.print("[red]Please enter a question.[/red]")
@@ -1,75 +1,218 @@
 import os
-import json
+import math
+import asyncio
+import argparse
+import sqlite3
+import threading
+import time
+from contextlib import nullcontext
 from datetime import datetime, timezone
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List, Set, Tuple
 
 from dotenv import load_dotenv
-from rich.console import Console
-from rich.panel import Panel
-from rich.table import Table
 
-from langchain_groq import ChatGroq
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnableLambda, RunnablePassthrough
-
-from langchain_tavily import TavilySearch
+# rich and langchain_core are imported where they are first used: importing this
+# module (app.py, batch.py) stays cheap and clients are only built when a run needs them
+from checkpoint import CHECKPOINTS, get_checkpoint_store
+from clients import MissingKeyError, get_chat_model, get_tavily_client, pool_stats, require_keys, run_closing
+from context_packer import batch_sources, pack_context, source_tokens
+from deadline import Deadline, get_stage_costs
+from dedup import SourceDeduper
+from fanout import merge_by_url, parse_queries, search_concurrently
+from knowledge_index import KNOWLEDGE_INDEX, get_knowledge_index
+from llm_cache import get_llm_cache, make_key
+from log_sink import RunLog
+from model_routing import MAX_OUTPUT_TOKENS, SYNTH_MAP_OUTPUT_TOKENS, routing_table, stage_model
+from page_fetch import PAGE_FETCH, PAGE_FETCH_RAW, PAGE_MAX_BYTES, enrich_sources
+from pre_eval import QUESTION_FILLER, pre_evaluate
+from rate_limit import get_limiter, limiter_stats
+from search_cache import SEARCH_CACHE_BYPASS, get_search_cache
+from telemetry import RunMetrics, print_breakdown, usage_tokens
+from textutil import content_terms, estimate_tokens
 
 # ---------------------------
 # Setup
 # ---------------------------
 load_dotenv()
-console = Console()
 
+# Checked when a run starts (require_keys), not at import
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
 
-if not GROQ_API_KEY or not TAVILY_API_KEY:
-    console.print("[red]Missing API keys in .env file[/red]")
-    raise SystemExit(1)
-
-# Use a model that works for you (you said it’s working now)
-MODEL = os.getenv("GROQ_MODEL", "llama-3.1-8b-instant")
-TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.3"))
-MAX_OUTPUT_TOKENS = int(os.getenv("MAX_OUTPUT_TOKENS", "1400"))
+# Model, temperature and max_tokens are chosen per stage: see model_routing.py (GROQ_MODEL, GROQ_FAST_MODEL, GROQ_SYNTH_MODEL)
 
 MAX_ITERATIONS = int(os.getenv("MAX_ITERATIONS", "3"))
 MAX_RESULTS = int(os.getenv("MAX_RESULTS", "3"))
-
-llm = ChatGroq(
-    model=MODEL,
-    temperature=TEMPERATURE,
-    max_tokens=MAX_OUTPUT_TOKENS,
-    api_key=GROQ_API_KEY,
-)
+QUERY_FANOUT = int(os.getenv("QUERY_FANOUT", "1"))  # queries searched per iteration
 
-thinking_log: List[Dict[str, Any]] = []
+# Speculation: draft the next query (and optionally search it) while the LLM evaluator runs
+SPECULATE = os.getenv("SPECULATE", "0") == "1"
+SPECULATE_SEARCH = os.getenv("SPECULATE_SEARCH", "0") == "1"
+SPECULATE_ACCEPT = float(os.getenv("SPECULATE_ACCEPT", "0.5"))  # share of real gap terms the draft must cover
 
+# Prompt budgets (estimated tokens) for packed source context
+CONTEXT_WINDOW_TOKENS = int(os.getenv("CONTEXT_WINDOW_TOKENS", "8192"))
+EVAL_CONTEXT_TOKENS = int(os.getenv("EVAL_CONTEXT_TOKENS", "600"))
+PROMPT_OVERHEAD_TOKENS = 400  # instructions + question around the packed sources
+
+# Map-reduce synthesis: summarize source batches in parallel, then merge the summaries
+SYNTH_MODE = os.getenv("SYNTH_MODE", "auto")  # "single", "map_reduce", or "auto" (when sources overflow the budget)
+SYNTH_MAP_REDUCE_AT = float(os.getenv("SYNTH_MAP_REDUCE_AT", "1.5"))  # auto: source tokens / synth budget
+SYNTH_MAP_WORKERS = int(os.getenv("SYNTH_MAP_WORKERS", "4"))  # batch summaries in flight
+SYNTH_BATCH_MIN_TOKENS = int(os.getenv("SYNTH_BATCH_MIN_TOKENS", "1000"))
+
 
 def utc_now_iso() -> str:
     return datetime.now(timezone.utc).isoformat()
 
 
-def log(step: str, data: Any = None):
-    thinking_log.append({"time": utc_now_iso(), "step": step, "data": data})
+_console = None
+
 
+def get_console():
+    """Shared rich console, created on first use."""
+    global _console
+    if _console is None:
+        from rich.console import Console
 
-def print_sources_table(sources: List[Dict[str, Any]], title: str):
+        _console = Console()
+    return _console
+
+
+def print_sources_table(sources: List[Dict[str, Any]], title: str, out: Any = None):
+    from rich.table import Table
+
+    out = out or get_console()
     table = Table(title=title, show_lines=True)
     table.add_column("#", justify="right", style="cyan")
     table.add_column("Title", style="white")
     table.add_column("URL", style="green")
     for i, s in enumerate(sources, start=1):
         table.add_row(str(i), (s.get("title") or "")[:70], (s.get("url") or "")[:90])
-    console.print(table)
+    out.print(table)
+
+
+class AgentRun:
+    """
+    Everything one research run owns: settings, search client, thinking log,
+    metrics and collected sources. Nothing here is shared between runs, so
+    concurrent runs (Streamlit sessions, batch workers) cannot interfere.
+    """
+
+    def __init__(
+        self,
+        question: str,
+        max_iterations: int | None = None,
+        max_results: int | None = None,
+        mode: str = "Balanced",
+        fanout: int | None = None,
+        bypass_cache: bool = False,
+        on_token: Callable[[str], None] | None = None,
+        search_tool: Any = None,
+        llm: Any = None,
+        quiet: bool = False,
+        speculate: bool | None = None,
+        fetch_pages: bool | None = None,
+        deadline_s: float | None = None,
+    ):
+        self.question = question
+        self.mode = mode
+        self.iterations = max(1, int(max_iterations if max_iterations is not None else MAX_ITERATIONS))
+        self.max_results = max(1, int(max_results if max_results is not None else MAX_RESULTS))
+        self.fanout = max(1, int(fanout if fanout is not None else QUERY_FANOUT))
+        self.bypass_cache = bypass_cache or SEARCH_CACHE_BYPASS
+        self.speculate = SPECULATE if speculate is None else speculate
+        self.fetch_pages = PAGE_FETCH if fetch_pages is None else fetch_pages
+        # Wall-clock budget (DEADLINE_S by default); its clock starts now
+        self.deadline = Deadline(deadline_s)
+        self.synth_mode = mode  # length tier synthesis actually runs at (smaller when the deadline is tight)
+        self.deadline_truncated = False
+        self.checkpoints = CHECKPOINTS
+        self.resume_state: Dict[str, Any] | None = None  # set by resume_agent: checkpointed stage + loop state
+        self.on_token = on_token
+        # Pooled, process-wide clients unless the caller injects its own (tests, benchmarks);
+        # the defaults are resolved on first use, but their keys are checked up front
+        needed: Dict[str, str | None] = {}
+        if llm is None:
+            needed["GROQ_API_KEY"] = GROQ_API_KEY
+        if search_tool is None:
+            needed["TAVILY_API_KEY"] = TAVILY_API_KEY
+        require_keys(**needed)
+        self.search_tool = search_tool
+        self.llm = llm
+        if quiet:
+            from rich.console import Console
+
+            self.console = Console(quiet=True)
+        else:
+            self.console = get_console()
+
+        # Events stream to the JSONL sink as they happen; only a bounded ring stays in memory
+        self.run_log = RunLog()
+        self.run_id = self.run_log.run_id
+        self.metrics = RunMetrics(on_span=self._on_span)
+        self.deduper = SourceDeduper()
+        self.sources: List[Dict[str, Any]] = []
+        self.final_answer = ""
+
+    def settings(self) -> Dict[str, Any]:
+        """Constructor arguments that shape the run (stored in checkpoints to resume it the same way)."""
+        return {
+            "max_iterations": self.iterations,
+            "max_results": self.max_results,
+            "mode": self.mode,
+            "fanout": self.fanout,
+            "bypass_cache": self.bypass_cache,
+            "speculate": self.speculate,
+            "fetch_pages": self.fetch_pages,
+            "deadline_s": self.deadline.seconds,
+        }
+
+    def _on_span(self, span: Dict[str, Any]) -> None:
+        self.log("span", span)
+        # Measured stages refine the cost estimates deadline decisions are based on
+        if span.get("cached") or "error" in span:
+            return
+        stage = span["stage"]
+        if stage in ("synth", "synth_reduce"):
+            stage = synth_stage(self.synth_mode)
+        get_stage_costs().observe(stage, span["wall_ms"] / 1000)
+
+    def log(self, step: str, data: Any = None):
+        # Thread-safe: search fan-out logs from worker threads
+        self.run_log.append({"time": utc_now_iso(), "step": step, "data": data})
+
+    @property
+    def thinking_log(self) -> List[Dict[str, Any]]:
+        return self.run_log.events()
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Per-run cache hits/misses, read off the spans (cached=None means cache not consulted)."""
+        search = {"hits": 0, "misses": 0}
+        llm_chains: Dict[str, Dict[str, int]] = {}
+        for s in list(self.metrics.spans):
+            if s.get("cached") is None:
+                continue
+            field = "hits" if s["cached"] else "misses"
+            if s["stage"] == "search":
+                search[field] += 1
+            else:
+                llm_chains.setdefault(s["stage"], {"hits": 0, "misses": 0})[field] += 1
+        return {
+            "search": {"bypassed": self.bypass_cache, **search},
+            "llm": {
+                "hits": sum(c["hits"] for c in llm_chains.values()),
+                "misses": sum(c["misses"] for c in llm_chains.values()),
+                "by_chain": llm_chains,
+            },
+        }
 
 
 # ---------------------------
 # LCEL Chains
 # ---------------------------
 
-plan_prompt = ChatPromptTemplate.from_template(
-    """You are an autonomous research agent.
+plan_prompt = """You are an autonomous research agent.
 Create a short plan for answering the question.
 
 Question: {question}
@@ -81,22 +224,15 @@ PLAN:
 3) ...
 STOP_CRITERIA: one sentence
 """
-)
 
-plan_chain = plan_prompt | llm | StrOutputParser()
-
-query_prompt = ChatPromptTemplate.from_template(
-    """Research question: {question}
+query_prompt = """Research question: {question}
 
 Return ONLY ONE short Google-style search query (max 12 words).
 No explanations. No quotes. No bullet points.
 Only the query text.
 """
-)
-query_chain = query_prompt | llm | StrOutputParser()
 
-improve_query_prompt = ChatPromptTemplate.from_template(
-    """Research question: {question}
+improve_query_prompt = """Research question: {question}
 Previous query: {prev_query}
 
 Evaluator feedback:
@@ -110,11 +246,31 @@ Rules:
 - max 12 words, no quotes, no bullet points
 Only the query text.
 """
-)
-improve_query_chain = improve_query_prompt | llm | StrOutputParser()
 
-eval_prompt = ChatPromptTemplate.from_template(
-    """We are researching: {question}
+# Fan-out variants: K diverse queries per iteration, one per line
+multi_query_prompt = """Research question: {question}
+
+Return {k} diverse Google-style search queries (max 12 words each).
+Each query should cover a different angle of the question.
+One query per line. No numbering. No explanations. No quotes.
+"""
+
+improve_multi_query_prompt = """Research question: {question}
+Previous queries: {prev_query}
+
+Evaluator feedback:
+{evaluation}
+
+Return {k} diverse improved search queries targeting the missing gaps.
+Rules:
+- include year 2025 if the question is about 2025
+- include 1-2 specific entities if missing (company/lab/paper)
+- prefer credible sources (site:arxiv.org OR site:nature.com OR site:ieee.org OR site:mit.edu OR site:ibm.com)
+- max 12 words each, no quotes, no bullet points, no numbering
+One query per line.
+"""
+
+eval_prompt = """We are researching: {question}
 
 Here are the most recent sources:
 {recent_sources}
@@ -125,15 +281,12 @@ DECISION: YES or NO
 GAPS: If DECISION is YES, write "None".
 If DECISION is NO, write one short sentence explaining what is missing.
 """
-)
-eval_chain = eval_prompt | llm | StrOutputParser()
 
-synth_prompt = ChatPromptTemplate.from_template(
-    """You are a research assistant. Use ONLY the sources below.
+synth_prompt = """You are a research assistant. Use ONLY the sources below.
 
 Question: {question}
 
-Sources (title, url, snippet):
+Sources ([n] title | url, then the most relevant passages):
 {all_sources}
 
 Write the final response with:
@@ -148,18 +301,223 @@ Rules:
 - If sources are insufficient, say what is missing.
 - Length target: {length_target}
 """
-)
-synth_chain = synth_prompt | llm | StrOutputParser()
+
+synth_map_prompt = """You are summarizing part of the evidence for a research question. Use ONLY the sources below.
+
+Question: {question}
+
+Sources ([n] title | url, then the most relevant passages):
+{sources}
+
+Write at most {summary_words} words of bullet points:
+- One fact per bullet, ending with the URL it comes from in parentheses.
+- Mention it when sources disagree.
+- Leave out anything that does not help answer the question.
+"""
+
+synth_reduce_prompt = """You are a research assistant. Use ONLY the evidence below, summarized from {source_count} sources.
+
+Question: {question}
+
+Evidence (each bullet ends with the URL it comes from):
+{summaries}
+
+Write the final response with:
+1) Answer (clear)
+2) Key points (bullets)
+3) Contradictions / uncertainty (if any)
+4) Citations (list URLs used)
+5) Confidence (0-100) + one sentence why
+
+Rules:
+- Do NOT invent facts not supported by the evidence.
+- Cite only URLs that appear in the evidence.
+- If the evidence is insufficient, say what is missing.
+- Length target: {length_target}
+"""
+
+# Prompt templates by stage; each call pipes one into the pooled chat model (prompt | llm | StrOutputParser)
+CHAINS = {
+    "plan": plan_prompt,
+    "query": query_prompt,
+    "improve_query": improve_query_prompt,
+    "multi_query": multi_query_prompt,
+    "improve_multi_query": improve_multi_query_prompt,
+    "eval": eval_prompt,
+    "synth": synth_prompt,
+    "synth_map": synth_map_prompt,
+    "synth_reduce": synth_reduce_prompt,
+}
+
+
+_prompts: Dict[str, Any] = {}
+
+
+def get_prompt(name: str):
+    """ChatPromptTemplate for a stage, parsed once on first use."""
+    prompt = _prompts.get(name)
+    if prompt is None:
+        from langchain_core.prompts import ChatPromptTemplate
+
+        prompt = _prompts[name] = ChatPromptTemplate.from_template(CHAINS[name])
+    return prompt
+
+
+def _span(run: AgentRun | None, stage: str, **fields: Any):
+    return run.metrics.span(stage, **fields) if run is not None else nullcontext({})
+
+
+def _retry_logger(run: AgentRun | None, span: Dict[str, Any], stage: str):
+    def on_retry(info: Dict[str, Any]):
+        span["retries"] = span.get("retries", 0) + 1
+        if info["throttled"]:
+            span["throttled"] = span.get("throttled", 0) + 1
+        if run is not None:
+            run.log("retry", {"stage": stage, **info})
+
+    return on_retry
+
+
+async def acall_chain(
+    name: str,
+    inputs: Dict[str, Any],
+    run: AgentRun | None = None,
+    on_token: Callable[[str], None] | None = None,
+) -> str:
+    """
+    Invoke a named chain, serving repeated prompts from the completion cache.
+    With on_token the chain is streamed and every text chunk is passed on as it arrives.
+    """
+    from langchain_core.callbacks import UsageMetadataCallbackHandler
+    from langchain_core.output_parsers import StrOutputParser
+
+    prompt = get_prompt(name)
+    cfg = stage_model(name)
+    if run is not None and run.llm is not None:
+        llm = run.llm
+    else:
+        llm = get_chat_model(cfg["model"], cfg["temperature"], cfg["max_tokens"], GROQ_API_KEY)
+    chain = prompt | llm | StrOutputParser()
+    rendered = prompt.format(**inputs)
+    cache = get_llm_cache()
+    key = make_key(cfg["model"], cfg["temperature"], cfg["max_tokens"], rendered) if cache.enabled(name) else None
+
+    with _span(run, name, llm=True, model=getattr(llm, "model_name", cfg["model"]), prompt_bytes=len(rendered.encode("utf-8")), cached=None) as span:
+        if key:
+            cached = cache.get(name, key)
+            if cached is not None:
+                span["cached"] = True
+                if on_token:
+                    on_token(cached)
+                return cached
+            span["cached"] = False
+
+        # Set once a token has reached on_token. Kept outside attempt() because a timeout
+        # cancels the attempt mid-stream, so it never sees the exception the limiter gets.
+        streamed = False
+
+        async def attempt():
+            nonlocal streamed
+            usage = UsageMetadataCallbackHandler()
+            config = {"callbacks": [usage]}
+            if on_token is None:
+                return await chain.ainvoke(inputs, config=config), usage
+            started = time.perf_counter()
+            parts: List[str] = []
+            async for chunk in chain.astream(inputs, config=config):
+                if not chunk:
+                    continue
+                if not parts:
+                    span["ttft_ms"] = round((time.perf_counter() - started) * 1000, 1)
+                parts.append(chunk)
+                streamed = True
+                on_token(chunk)
+            return "".join(parts), usage
+
+        limiter = get_limiter("groq")
+        estimated = estimate_tokens(rendered)
+        out, usage = await limiter.acall(
+            attempt,
+            tokens=estimated,
+            on_retry=_retry_logger(run, span, name),
+            retry_if=lambda e: not streamed,  # tokens already shown; a retry would duplicate them
+        )
+        tokens = usage_tokens(usage.usage_metadata)
+        span.update(tokens)
+        if tokens["prompt_tokens"]:
+            # Settle the TPM reservation against what the provider actually counted
+            limiter.tokens.adjust(tokens["prompt_tokens"] + tokens["completion_tokens"] - estimated)
+
+    if key:
+        cache.put(name, key, out)
+    return out
 
 
 # ---------------------------
 # Tool wrapper
 # ---------------------------
-def run_search(query: str) -> List[Dict[str, Any]]:
+def run_search(run: AgentRun, query: str, exclude: Set[str] | None = None) -> List[Dict[str, Any]]:
     q = (query or "").strip()[:300]
-    log("tool_search_call", {"query": q})
+    run.log("tool_search_call", {"query": q})
+
+    with _span(run, "search", prompt_bytes=len(q.encode("utf-8")), cached=None) as span:
+        cleaned, cached = _search_backend(run, q, span, exclude)
+        span["result_count"] = len(cleaned)
+        span["cached"] = None if run.bypass_cache else cached
+
+    run.log("tool_search_result", {"count": len(cleaned), "cached": cached})
+    return cleaned
+
+
+def _invoke_search(run: AgentRun, q: str) -> Any:
+    tool = run.search_tool if run.search_tool is not None else get_tavily_client(TAVILY_API_KEY)
+    # TavilyClient-style tools take max_results per call; LangChain tools have it baked in
+    if hasattr(tool, "search"):
+        # With page fetching on, Tavily's extracted page text saves most of the fetches
+        extra = {"include_raw_content": True} if run.fetch_pages and PAGE_FETCH_RAW else {}
+        results = tool.search(q, max_results=run.max_results, **extra)
+    else:
+        results = tool.invoke(q)
+    # TavilySearch reports HTTP failures as {"error": exc}; raise so the limiter can retry
+    if isinstance(results, dict) and isinstance(results.get("error"), BaseException):
+        raise results["error"]
+    return results
+
+
+def _search_backend(
+    run: AgentRun, q: str, span: Dict[str, Any], exclude: Set[str] | None = None
+) -> Tuple[List[Dict[str, Any]], bool]:
+    """exclude: canonical URLs the index must not serve (default: what the run has seen so far)."""
+    use_cache = not run.bypass_cache
+    if use_cache:
+        cached = get_search_cache().get(q, run.max_results)
+        if cached is not None:
+            return cached, True
+
+    # Sources collected by earlier runs: skip the web when the local corpus covers the query
+    # with documents this run does not have yet (otherwise a gap query would just get
+    # back what the evaluator already judged insufficient)
+    index = get_knowledge_index() if KNOWLEDGE_INDEX else None
+    if use_cache and index is not None:
+        seen = run.deduper.seen_urls() if exclude is None else exclude
+        local = index.search(q, run.max_results, exclude=seen)
+        if len(local) >= run.max_results:
+            run.log("knowledge_hit", {
+                "query": q,
+                "count": len(local),
+                "oldest_age_h": round((time.time() - min(d["fetched_at"] for d in local)) / 3600, 1),
+            })
+            span["source"] = "index"
+            return [{"title": d["title"], "url": d["url"], "content": d["content"]} for d in local], True
 
-    results = search_tool.invoke(q)
+    try:
+        results = get_limiter("tavily").call(
+            lambda: _invoke_search(run, q), on_retry=_retry_logger(run, span, "search")
+        )
+    except Exception as e:
+        # Same outcome as before: no sources, and the evaluator gap asks for another query
+        run.log("tool_search_error", {"query": q, "error": f"{type(e).__name__}: {str(e)[:200]}"})
+        return [], False
 
     cleaned = []
 
@@ -167,29 +525,103 @@ def run_search(query: str) -> List[Dict[str, Any]]:
     if isinstance(results, list):
         for r in results:
             if isinstance(r, dict):
-                cleaned.append({
-                    "title": r.get("title", ""),
-                    "url": r.get("url", ""),
-                    "content": r.get("content", r.get("snippet", "")),
-                })
+                cleaned.append(_result_item(r))
             else:
                 cleaned.append({"title": "", "url": "", "content": str(r)})
 
     elif isinstance(results, dict):
         for r in results.get("results", []):
-            cleaned.append({
-                "title": r.get("title", ""),
-                "url": r.get("url", ""),
-                "content": r.get("content", r.get("snippet", "")),
-            })
+            cleaned.append(_result_item(r))
 
     else:
         cleaned.append({"title": "", "url": "", "content": str(results)})
 
-    log("tool_search_result", {"count": len(cleaned)})
-    return cleaned
+    # Only cache real hits; empty/error responses may be transient. Raw page text is
+    # only kept for this run's page stage, never in the cache
+    if use_cache and any(c["url"] for c in cleaned):
+        get_search_cache().put(q, run.max_results, [_without_raw(c) for c in cleaned])
+    if index is not None:
+        index.add(cleaned)
+
+    return cleaned, False
+
+
+def _result_item(r: Dict[str, Any]) -> Dict[str, Any]:
+    item = {
+        "title": r.get("title", ""),
+        "url": r.get("url", ""),
+        "content": r.get("content", r.get("snippet", "")),
+    }
+    if r.get("raw_content"):
+        item["raw_content"] = r["raw_content"][:PAGE_MAX_BYTES]
+    return item
+
+
+def _without_raw(item: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in item.items() if k != "raw_content"}
 
 
+def _search_or_empty(run: AgentRun, query: str, exclude: Set[str] | None = None) -> List[Dict[str, Any]]:
+    # One failing query must not sink the other fan-out queries
+    try:
+        return run_search(run, query, exclude)
+    except Exception as e:
+        run.log("tool_search_error", {"query": query, "error": str(e)[:200]})
+        return []
+
+
+def run_searches(
+    run: AgentRun,
+    queries: List[str],
+    exclude: Set[str] | None = None,
+    stop: threading.Event | None = None,
+) -> List[Dict[str, Any]]:
+    """Search every query (fanned out); once `stop` is set, queries not yet started are skipped."""
+
+    def one(q: str) -> List[Dict[str, Any]]:
+        return [] if stop is not None and stop.is_set() else _search_or_empty(run, q, exclude)
+
+    if len(queries) == 1:
+        return [] if stop is not None and stop.is_set() else run_search(run, queries[0], exclude)
+    per_query = search_concurrently(one, queries)
+    merged = merge_by_url(per_query)
+    run.log("tool_search_merged", {
+        "queries": len(queries),
+        "raw_count": sum(len(r) for r in per_query),
+        "unique_count": len(merged),
+    })
+    return merged
+
+
+async def generate_queries(
+    run: AgentRun,
+    prev_query: str = "",
+    evaluation: str = "",
+) -> List[str]:
+    """Initial queries when no evaluation exists yet, otherwise gap-targeted improvements."""
+    question, k = run.question, run.fanout
+    if k == 1:
+        if not evaluation:
+            q = await acall_chain("query", {"question": question}, run)
+        else:
+            q = await acall_chain(
+                "improve_query",
+                {"question": question, "prev_query": prev_query, "evaluation": evaluation},
+                run,
+            )
+        return [(q or "").strip()[:300]]
+
+    if not evaluation:
+        raw = await acall_chain("multi_query", {"question": question, "k": k}, run)
+    else:
+        raw = await acall_chain(
+            "improve_multi_query",
+            {"question": question, "prev_query": prev_query, "evaluation": evaluation, "k": k},
+            run,
+        )
+    return parse_queries(raw, k) or [question.strip()[:300]]
+
+
 def get_length_target(mode: str) -> str:
     m = (mode or "Balanced").strip().lower()
     if m == "fast":
@@ -199,76 +631,384 @@ def get_length_target(mode: str) -> str:
     return "Provide moderate detail (~220-350 words total)."
 
 
+def synth_stage(mode: str) -> str:
+    """Cost-estimate key of synthesis at a length tier (deadline.STAGE_PRIOR_S)."""
+    m = (mode or "Balanced").strip().lower()
+    return f"synth_{m if m in ('fast', 'deep') else 'balanced'}"
+
+
+def iteration_stages(run: AgentRun) -> List[str]:
+    """Stages one more search iteration costs."""
+    stages = ["improve_query" if run.fanout == 1 else "improve_multi_query", "search", "eval"]
+    if run.fetch_pages:
+        stages.append("fetch")
+    return stages
+
+
+def fit_synth_mode(run: AgentRun) -> str:
+    """The run's mode, or the largest smaller length tier whose synthesis still fits the deadline."""
+    tiers = ["Fast", "Balanced", "Deep"]
+    top = {"fast": 0, "deep": 2}.get((run.mode or "").strip().lower(), 1)
+    for tier in reversed(tiers[1:top + 1]):
+        if run.deadline.fits([synth_stage(tier)]):
+            return run.mode if tier == tiers[top] else tier
+    return run.mode if top == 0 else tiers[0]
+
+
+DEADLINE_NOTE = "\n\n---\n*Deadline reached before synthesis finished: this answer is incomplete (deadline-truncated).*"
+
+
+def deadline_tail(run: AgentRun, streamed: str) -> str:
+    """What completes a synthesis cut off by the deadline: a note, or the source list if nothing streamed yet."""
+    if streamed.strip():
+        return DEADLINE_NOTE
+    lines = [f"- {s.get('title') or s.get('url')}: {s.get('url')}" for s in run.sources[:10]]
+    if not lines:
+        return "No answer: no sources were collected before the deadline." + DEADLINE_NOTE
+    return "Synthesis did not finish before the deadline. Sources collected:\n" + "\n".join(lines) + DEADLINE_NOTE
+
+
+def get_context_budget(mode: str, stage: str = "synth") -> int:
+    """Token budget for packed sources: what the window leaves after the reply, scaled by mode."""
+    if stage == "eval":
+        return EVAL_CONTEXT_TOKENS
+    reply = stage_model("synth")["max_tokens"] or MAX_OUTPUT_TOKENS
+    available = CONTEXT_WINDOW_TOKENS - reply - PROMPT_OVERHEAD_TOKENS
+    m = (mode or "Balanced").strip().lower()
+    share = {"fast": 0.35, "deep": 1.0}.get(m, 0.6)
+    return max(300, int(available * share))
+
+
+def use_map_reduce(sources: List[Dict[str, Any]], budget: int) -> bool:
+    if SYNTH_MODE == "map_reduce":
+        return len(sources) > 1
+    if SYNTH_MODE != "auto":
+        return False
+    return len(sources) > 1 and sum(source_tokens(s) for s in sources) > budget * SYNTH_MAP_REDUCE_AT
+
+
+async def map_sources(run: AgentRun, budget: int) -> Dict[str, Any]:
+    """
+    Map step of map-reduce synthesis: summarize batches of sources in parallel
+    (bounded by SYNTH_MAP_WORKERS) and return the inputs of the synth_reduce chain.
+    Batches are sized so the work spreads over the workers without overflowing the window.
+    """
+    total = sum(source_tokens(s) for s in run.sources)
+    window = CONTEXT_WINDOW_TOKENS - SYNTH_MAP_OUTPUT_TOKENS - PROMPT_OVERHEAD_TOKENS
+    batch_budget = max(300, min(window, max(SYNTH_BATCH_MIN_TOKENS, math.ceil(total / max(1, SYNTH_MAP_WORKERS)))))
+    batches = batch_sources(run.sources, batch_budget)
+    # All summaries together must fit the reduce prompt's budget
+    summary_tokens = max(100, min(SYNTH_MAP_OUTPUT_TOKENS, budget // len(batches)))
+    sem = asyncio.Semaphore(max(1, SYNTH_MAP_WORKERS))
+
+    async def summarize(batch: List[Dict[str, Any]]) -> str:
+        packed, _ = pack_context(run.question, batch, batch_budget)
+        async with sem:
+            return await acall_chain(
+                "synth_map",
+                {"question": run.question, "sources": packed, "summary_words": int(summary_tokens * 0.75)},
+                run,
+            )
+
+    results = await asyncio.gather(*(summarize(b) for b in batches), return_exceptions=True)
+    summaries = [r.strip() for r in results if isinstance(r, str) and r.strip()]
+    failed = [r for r in results if isinstance(r, BaseException)]
+    run.log("synth_map", {
+        "sources": len(run.sources),
+        "source_tokens": total,
+        "batches": len(batches),
+        "batch_budget": batch_budget,
+        "batch_sizes": [len(b) for b in batches],
+        "summary_tokens": summary_tokens,
+        "failed": len(failed),
+    })
+    if not summaries:
+        raise failed[0] if failed else RuntimeError("map step produced no summaries")
+    return {"source_count": len(run.sources), "summaries": "\n\n".join(summaries)}
+
+
+async def _timed_search(
+    run: AgentRun, queries: List[str], exclude: Set[str], stop: threading.Event
+) -> Tuple[List[Dict[str, Any]], float]:
+    found = await asyncio.to_thread(run_searches, run, queries, exclude, stop)
+    return found, time.perf_counter()
+
+
+async def _speculate(run: AgentRun, prev_query: str, guess: str) -> Dict[str, Any]:
+    """
+    Draft the next queries; with SPECULATE_SEARCH their search starts right away in the
+    background, against a snapshot of the run's seen URLs (the real iteration keeps
+    updating the deduper while the search threads run).
+    """
+    started = time.perf_counter()
+    queries = await generate_queries(run, prev_query, guess)
+    stop = threading.Event()
+    search = None
+    if SPECULATE_SEARCH:
+        search = asyncio.create_task(_timed_search(run, queries, run.deduper.seen_urls(), stop))
+    return {"queries": queries, "started": started, "drafted": time.perf_counter(), "search": search, "stop": stop}
+
+
+def _stop_speculation(task: "asyncio.Task") -> Dict[str, Any] | None:
+    """
+    Cancel a speculative draft and its search; search queries not yet started are
+    skipped (those already in flight finish in their thread). Returns the draft if done.
+    """
+    spec = task.result() if task.done() and not task.cancelled() and task.exception() is None else None
+    task.cancel()
+    if spec and spec["search"] is not None:
+        spec["stop"].set()
+        spec["search"].cancel()
+    return spec
+
+
+async def _discard_speculation(task: "asyncio.Task") -> Dict[str, Any] | None:
+    spec = _stop_speculation(task)
+    pending = [task] + ([spec["search"]] if spec and spec["search"] is not None else [])
+    await asyncio.gather(*pending, return_exceptions=True)
+    return spec
+
+
+def _guess_gaps(pre: Dict[str, Any]) -> str:
+    """Stand-in evaluator feedback for the speculative query, built from the pre-eval score."""
+    if pre.get("missing_terms"):
+        return "DECISION: NO\nGAPS: Sources do not cover: " + ", ".join(pre["missing_terms"]) + "."
+    return "DECISION: NO\nGAPS: Need more specific, recent evidence from credible sources."
+
+
+# How evaluators phrase gaps; says nothing about what to search for
+GAP_FILLER = frozenset(
+    """missing lacks lack lacking need needs needed information info data details detail specific
+    sources source evidence figures numbers unclear insufficient limited provided mentioned
+    explanation examples example""".split()
+)
+
+
+def _gap_overlap(evaluation: str, queries: List[str]) -> float:
+    """Share of the real GAPS terms the speculative queries already contain (1.0 if GAPS is generic)."""
+    gaps = evaluation.split("GAPS:", 1)[-1]
+    terms = {t for t in content_terms(gaps) if t not in QUESTION_FILLER and t not in GAP_FILLER}
+    if not terms:
+        return 1.0
+    drafted = set(content_terms(" ".join(queries)))
+    return len(terms & drafted) / len(terms)
+
+
+async def _reconcile(
+    run: AgentRun, task: "asyncio.Task", evaluation: str, iteration: int
+) -> Dict[str, Any] | None:
+    """
+    Settle a speculative draft once the evaluator has answered. Returns
+    {"queries", "found"} when the draft fits the real GAPS; found is None if
+    the next iteration still has to search.
+    """
+    eval_done = time.perf_counter()
+    if "DECISION: YES" in evaluation.upper():
+        spec = await _discard_speculation(task)
+        run.log("speculation", {
+            "iteration": iteration,
+            "outcome": "discarded",
+            "wasted_llm_calls": 1,
+            "wasted_searches": len(spec["queries"]) if spec and spec["search"] is not None else 0,
+        })
+        return None
+
+    try:
+        spec = await task
+    except Exception as e:
+        run.log("speculation", {"iteration": iteration, "outcome": "failed", "error": type(e).__name__})
+        return None
+    overlap = _gap_overlap(evaluation, spec["queries"])
+    accepted = overlap >= SPECULATE_ACCEPT
+    searched = spec["search"] is not None
+    found = None
+    finished = spec["drafted"]
+    if accepted and searched:
+        try:
+            found, finished = await spec["search"]
+        except Exception:
+            found = None  # the next iteration searches again
+    elif searched:
+        await _discard_speculation(task)
+    # Speculative work that ran while the evaluator was thinking is off the critical path
+    saved_ms = (min(finished, eval_done) - spec["started"]) * 1000 if accepted else 0.0
+    run.log("speculation", {
+        "iteration": iteration,
+        "outcome": "accepted" if accepted else "regenerated",
+        "overlap": round(overlap, 2),
+        "queries": spec["queries"],
+        "saved_ms": round(max(0.0, saved_ms), 1),
+        "wasted_llm_calls": 0 if accepted else 1,
+        "wasted_searches": len(spec["queries"]) if searched and not accepted else 0,
+    })
+    return {"queries": spec["queries"], "found": found} if accepted else None
+
+
+async def collect_sources(
+    run: AgentRun, i: int, queries: List[str], drafted: Dict[str, Any] | None
+) -> Tuple[int, List[Dict[str, Any]]]:
+    """Search (unless a speculative search already did), dedup and optionally read pages; returns (found, new sources)."""
+    # Search tool (blocking client → worker threads, fanned out when k > 1)
+    if drafted is not None and drafted["found"] is not None:
+        found = drafted["found"]
+    else:
+        run.console.print("[bold blue]→ Searching web (Tavily)...[/bold blue]")
+        found = await asyncio.to_thread(run_searches, run, queries)
+
+    # Drop sources already collected in earlier iterations (same URL or syndicated copy)
+    new_sources = run.deduper.add(found)
+    if len(new_sources) < len(found):
+        run.log("dedup", {"iteration": i + 1, "found": len(found), "new": len(new_sources)})
+
+    # Optional page stage: swap snippets for the best chunks of each (new) page
+    if run.fetch_pages and new_sources:
+        run.console.print("[bold blue]→ Reading full pages...[/bold blue]")
+        with _span(run, "fetch", result_count=len(new_sources)):
+            new_sources, fetched = await asyncio.to_thread(
+                enrich_sources, f"{run.question} {' | '.join(queries)}", new_sources
+            )
+        run.log("page_fetch", {"iteration": i + 1, **fetched})
+    else:
+        new_sources = [_without_raw(s) for s in new_sources]
+    run.sources.extend(new_sources)
+    return len(found), new_sources
+
+
+def _checkpoint(run: AgentRun, stage: str, loop: Dict[str, Any]) -> str:
+    """Persist the loop state after `stage` (no-op when checkpoints are off); returns the stage."""
+    if run.checkpoints:
+        state = {"question": run.question, "settings": run.settings(), "sources": run.sources, "loop": loop}
+        try:
+            get_checkpoint_store().save(run.run_id, "langchain", stage, state)
+        except (OSError, sqlite3.Error) as e:
+            run.log("checkpoint_error", {"stage": stage, "error": str(e)[:200]})
+    return stage
+
+
 # ---------------------------
 # Orchestrator (LangChain-style, but controlled loop)
 # ---------------------------
-def run_agent(
-    question: str,
-    max_iterations: int | None = None,
-    max_results: int | None = None,
-    mode: str = "Balanced",
-):
-    console.print(Panel(f"[bold cyan]Research Question:[/bold cyan] {question}"))
-    log("question", question)
-    length_target = get_length_target(mode)
-
-    iterations = max(1, int(max_iterations if max_iterations is not None else MAX_ITERATIONS))
-    results = max(1, int(max_results if max_results is not None else MAX_RESULTS))
-
-    global search_tool
-    search_tool = TavilySearch(max_results=results)
+async def execute_run(run: AgentRun):
+    from rich.live import Live
+    from rich.panel import Panel
 
-    # 1) PLAN (LCEL)
-    console.print("[bold cyan]→ Creating plan...[/bold cyan]")
-    plan = plan_chain.invoke({"question": question})
-    log("plan_created", plan)
-    console.print(Panel(plan, title="PLAN", border_style="cyan"))
+    out = run.console
+    question = run.question
+    out.print(Panel(f"[bold cyan]Research Question:[/bold cyan] {question}"))
+    # Loop state, checkpointed after every stage so a resumed run skips finished work
+    resumed = run.resume_state
+    loop: Dict[str, Any] = dict(resumed["loop"]) if resumed else {}
+    stage = resumed["stage"] if resumed else None
 
-    all_sources: List[Dict[str, Any]] = []
-    evaluation = ""
-    prev_query = ""
-    final_answer = ""
+    # 1) PLAN + initial query (LCEL) — independent of each other, so run both at once
+    if resumed:
+        # loop["iteration"] is the 0-based index of the last checkpointed iteration; logs count from 1
+        run.log("resumed", {"stage": stage, "iteration": loop["iteration"] + 1, "sources": len(run.sources)})
+        out.print(f"[bold cyan]→ Resuming run {run.run_id} after stage '{stage}'[/bold cyan]")
+    else:
+        run.log("question", question)
+        out.print("[bold cyan]→ Creating plan and initial search query...[/bold cyan]")
+        plan, first_queries = await asyncio.gather(
+            acall_chain("plan", {"question": question}, run),
+            generate_queries(run),
+        )
+        run.log("plan_created", plan)
+        out.print(Panel(plan, title="PLAN", border_style="cyan"))
+        loop = {"plan": plan, "first_queries": first_queries, "evaluation": "", "prev_query": "", "iteration": -1}
+        stage = _checkpoint(run, "plan", loop)
+
+    evaluation = loop["evaluation"]
+    prev_query = loop["prev_query"]
+    drafted: Dict[str, Any] | None = None  # accepted speculative queries (and results) for this iteration
+    # A checkpoint taken after evaluation resumes with the next iteration; after search, with its evaluation
+    start = loop["iteration"] + 1 if stage in ("plan", "eval") else loop["iteration"]
+    done_searching = stage == "map" or (stage == "eval" and "DECISION: YES" in evaluation.upper())
 
     # 2) ITERATE
-    for i in range(iterations):
-        console.print(f"\n[yellow]Iteration {i+1}[/yellow]")
+    for i in range(start, 0 if done_searching else run.iterations):
+        restored = stage == "search" and i == loop["iteration"]
+        if i > 0 and not restored and not run.deadline.fits(iteration_stages(run), [synth_stage(run.mode)]):
+            # Another search + evaluation would eat into the time synthesis needs. Like every
+            # stop event, "iteration" is the 1-based number of the last iteration that ran
+            # (iterations 1..i did; batch.py reports it as the run's iteration count)
+            run.log("stop", {"reason": "deadline", "iteration": i, **run.deadline.status()})
+            out.print("[yellow]→ Deadline: skipping further iterations[/yellow]")
+            break
+        out.print(f"\n[yellow]Iteration {i+1}[/yellow]")
 
-        # Query (LCEL)
-        if i == 0:
-            console.print("[bold blue]→ Generating initial search query...[/bold blue]")
-            q = query_chain.invoke({"question": question})
+        if restored:
+            # Search finished before the interruption: its sources are already in run.sources
+            queries = loop["queries"]
+            found_count = loop["found_count"]
+            new_sources = run.sources[len(run.sources) - loop["new_count"]:]
+            out.print("[bold blue]→ Search results restored from checkpoint[/bold blue]")
         else:
-            console.print("[bold blue]→ Improving search query (self-correction)...[/bold blue]")
-            q = improve_query_chain.invoke(
-                {"question": question, "prev_query": prev_query, "evaluation": evaluation}
-            )
+            # Query (LCEL)
+            if i == 0:
+                queries = loop["first_queries"]
+            elif drafted is not None:
+                out.print("[bold blue]→ Using the query drafted during evaluation...[/bold blue]")
+                queries = drafted["queries"]
+            else:
+                out.print("[bold blue]→ Improving search query (self-correction)...[/bold blue]")
+                queries = await generate_queries(run, prev_query, evaluation)
 
-        q = (q or "").strip()[:300]
-        prev_query = q
-        log("search_query", {"iteration": i + 1, "query": q})
-        console.print(f"[blue]Search Query:[/blue] {q}")
+            prev_query = " | ".join(queries)
+            if run.fanout == 1:
+                run.log("search_query", {"iteration": i + 1, "query": queries[0]})
+            else:
+                run.log("search_query", {"iteration": i + 1, "query": prev_query, "queries": queries})
+            for q in queries:
+                out.print(f"[blue]Search Query:[/blue] {q}")
 
-        # Search tool
-        console.print("[bold blue]→ Searching web (Tavily)...[/bold blue]")
-        new_sources = run_search(q)
-        all_sources.extend(new_sources)
+            found_count, new_sources = await collect_sources(run, i, queries, drafted)
+            drafted = None
+            loop.update(iteration=i, queries=queries, prev_query=prev_query,
+                        found_count=found_count, new_count=len(new_sources))
+            stage = _checkpoint(run, "search", loop)
 
         if new_sources:
-            print_sources_table(new_sources, title="Collected Sources (this iteration)")
+            print_sources_table(new_sources, title="Collected Sources (this iteration)", out=out)
         else:
-            console.print("[red]No sources found for this query.[/red]")
+            out.print("[red]No sources found for this query.[/red]")
 
         # Evaluate (LCEL)
-        console.print("[bold magenta]→ Evaluating if we have enough info...[/bold magenta]")
+        out.print("[bold magenta]→ Evaluating if we have enough info...[/bold magenta]")
 
-        # If nothing came back, force NO with an explicit gap
-        if not new_sources:
+        # If nothing (new) came back, force NO with an explicit gap
+        decided_by = "rule"
+        if found_count and not new_sources:
+            evaluation = "DECISION: NO\nGAPS: Only duplicates of earlier sources returned. Try a different angle."
+        elif not new_sources:
             evaluation = "DECISION: NO\nGAPS: No relevant sources returned. Try a different query."
         else:
-            recent_str = json.dumps(new_sources[:3], ensure_ascii=False, indent=2)
-            evaluation = eval_chain.invoke(
-                {"question": question, "recent_sources": recent_str}
-            ).strip()
+            # Clear-cut cases are scored locally; only the uncertain band pays for an LLM call
+            pre = pre_evaluate(question, run.sources)
+            run.log("pre_eval", {"iteration": i + 1, **{k: v for k, v in pre.items() if k != "evaluation"}})
+            if pre["evaluation"] is not None:
+                evaluation, decided_by = pre["evaluation"], "pre_eval"
+            elif not run.deadline.fits(["eval", *iteration_stages(run)], [synth_stage(run.mode)]):
+                # No further iteration fits, so the verdict could not change what happens next
+                evaluation, decided_by = "DECISION: NO\nGAPS: Not evaluated (deadline).", "deadline"
+            else:
+                decided_by = "llm"
+                recent_str, packed = pack_context(question, new_sources, get_context_budget(run.mode, "eval"))
+                run.log("context_packed", {"iteration": i + 1, "stage": "eval", **packed})
+                spec_task = None
+                if run.speculate and i + 1 < run.iterations:
+                    spec_task = asyncio.create_task(_speculate(run, prev_query, _guess_gaps(pre)))
+                try:
+                    evaluation = (
+                        await acall_chain(
+                            "eval", {"question": question, "recent_sources": recent_str}, run
+                        )
+                    ).strip()
+                except BaseException:
+                    if spec_task is not None:
+                        _stop_speculation(spec_task)
+                    raise
+                if spec_task is not None:
+                    drafted = await _reconcile(run, spec_task, evaluation, i + 1)
 
         # Normalize evaluation format (prevent YES + weird gaps)
         if "DECISION:" not in evaluation.upper():
@@ -278,44 +1018,243 @@ def run_agent(
             # Force GAPS: None when YES (for clean logic)
             evaluation = "DECISION: YES\nGAPS: None"
 
-        log("evaluation", {"iteration": i + 1, "evaluation": evaluation})
-        console.print(f"[magenta]Evaluation:[/magenta]\n{evaluation}")
+        run.log("evaluation", {"iteration": i + 1, "evaluation": evaluation, "decided_by": decided_by})
+        out.print(f"[magenta]Evaluation:[/magenta]\n{evaluation}")
+        loop.update(iteration=i, evaluation=evaluation)
+        stage = _checkpoint(run, "eval", loop)
 
         if "DECISION: YES" in evaluation.upper():
-            log("stop", {"reason": "sufficient_information", "iteration": i + 1})
+            run.log("stop", {"reason": "sufficient_information", "iteration": i + 1})
+            break
+        if decided_by == "deadline":
+            run.log("stop", {"reason": "deadline", "iteration": i + 1, **run.deadline.status()})
             break
     else:
-        log("stop", {"reason": "max_iterations_reached", "iteration": iterations})
+        if stage == "eval" and done_searching:
+            run.log("stop", {"reason": "sufficient_information", "iteration": loop["iteration"] + 1})
+        elif not done_searching:
+            run.log("stop", {"reason": "max_iterations_reached", "iteration": run.iterations})
+
+    run.log("dedup_stats", run.deduper.stats())
 
     # 3) SYNTHESIZE (LCEL)
-    console.print("\n[bold green]→ Synthesizing final answer...[/bold green]")
-    all_sources_str = json.dumps(all_sources, ensure_ascii=False, indent=2)
-    final_answer = synth_chain.invoke(
-        {
-            "question": question,
-            "all_sources": all_sources_str,
-            "length_target": length_target,
-        }
-    )
-    log("final_answer", final_answer)
+    out.print("\n[bold green]→ Synthesizing final answer...[/bold green]")
+    # Under a tight deadline: shorter length target and smaller context, and no separate map step
+    run.synth_mode = fit_synth_mode(run)
+    map_reduce = stage != "map" and use_map_reduce(run.sources, get_context_budget(run.synth_mode, "synth"))
+    if map_reduce and not run.deadline.fits(["synth_map"], [synth_stage(run.synth_mode)]):
+        map_reduce = False
+        run.log("deadline", {"action": "single_pass_synthesis", **run.deadline.status()})
+    if run.synth_mode != run.mode:
+        run.log("deadline", {"action": "shrink_synthesis", "mode": run.mode, "synth_mode": run.synth_mode,
+                             **run.deadline.status()})
+    length_target = get_length_target(run.synth_mode)
+    budget = get_context_budget(run.synth_mode, "synth")
+    if stage == "map":
+        synth_chain, synth_inputs = "synth_reduce", loop["synth_inputs"]
+    elif map_reduce:
+        out.print(f"[bold green]→ Summarizing {len(run.sources)} sources in parallel batches...[/bold green]")
+        synth_chain = "synth_reduce"
+        synth_inputs = await map_sources(run, budget)
+        loop["synth_inputs"] = synth_inputs
+        stage = _checkpoint(run, "map", loop)
+    else:
+        all_sources_str, packed = pack_context(question, run.sources, budget)
+        run.log("context_packed", {"stage": "synth", **packed})
+        synth_chain = "synth"
+        synth_inputs = {"all_sources": all_sources_str}
+    streamed: List[str] = []
+    with Live(
+        Panel("", title="FINAL ANSWER", border_style="green"),
+        console=out,
+        refresh_per_second=12,
+    ) as live:
 
-    console.print(Panel(final_answer, title="FINAL ANSWER", border_style="green"))
+        def on_synth_token(chunk: str):
+            streamed.append(chunk)
+            live.update(Panel("".join(streamed), title="FINAL ANSWER", border_style="green"))
+            if run.on_token:
+                run.on_token(chunk)
 
-    # 4) Export thinking log
-    with open("thinking_log.json", "w", encoding="utf-8") as f:
-        json.dump(thinking_log, f, ensure_ascii=False, indent=2)
+        synthesis = acall_chain(
+            synth_chain,
+            {"question": question, "length_target": length_target, **synth_inputs},
+            run,
+            on_token=on_synth_token,
+        )
+        try:
+            run.final_answer = await asyncio.wait_for(
+                synthesis, max(0.0, run.deadline.remaining()) if run.deadline.enabled else None
+            )
+        except asyncio.TimeoutError:
+            # Anytime answer: keep what streamed so far rather than answering late
+            partial = "".join(streamed)
+            on_synth_token(deadline_tail(run, partial))
+            run.final_answer = "".join(streamed)
+            run.deadline_truncated = True
+            run.log("deadline", {"action": "truncated", "streamed_chars": len(partial), **run.deadline.status()})
+        live.update(Panel(run.final_answer, title="FINAL ANSWER", border_style="green"))
+    if not out.is_terminal:
+        out.line()
+    run.log("final_answer", run.final_answer)
+    cache_stats = run.cache_stats()
+    run.log("search_cache_stats", {**cache_stats["search"], "entries": get_search_cache().stats()["entries"]})
+    run.log("llm_cache_stats", cache_stats["llm"])
+    run.log("rate_limit_stats", limiter_stats())
+    run.log("client_pool_stats", pool_stats())
+    if KNOWLEDGE_INDEX:
+        run.log("knowledge_index_stats", get_knowledge_index().stats())
+    if run.deadline.enabled:
+        run.log("deadline_stats", {
+            **run.deadline.status(),
+            "synth_mode": run.synth_mode,
+            "truncated": run.deadline_truncated,
+            "stage_costs": get_stage_costs().snapshot(),
+        })
+    if run.llm is None:
+        run.log("model_routing", routing_table())
+    run.log("run_summary", run.metrics.summary())
+    if run.checkpoints:
+        get_checkpoint_store().finish(run.run_id)
 
-    console.print("[bold green]Saved thinking log to thinking_log.json[/bold green]")
+    out.print(f"[bold green]Thinking log: {run.run_log.sink.path} (run {run.run_id})[/bold green]")
 
     # ✅ IMPORTANT for Streamlit
-    return final_answer, thinking_log
+    return run.final_answer, run.thinking_log
+
+
+async def arun_agent(
+    question: str,
+    max_iterations: int | None = None,
+    max_results: int | None = None,
+    mode: str = "Balanced",
+    fanout: int | None = None,
+    bypass_cache: bool = False,
+    on_token: Callable[[str], None] | None = None,
+    quiet: bool = False,
+    fetch_pages: bool | None = None,
+    deadline_s: float | None = None,
+):
+    run = AgentRun(
+        question,
+        max_iterations=max_iterations,
+        max_results=max_results,
+        mode=mode,
+        fanout=fanout,
+        bypass_cache=bypass_cache,
+        on_token=on_token,
+        quiet=quiet,
+        fetch_pages=fetch_pages,
+        deadline_s=deadline_s,
+    )
+    return await execute_run(run)
+
+
+def run_agent(
+    question: str,
+    max_iterations: int | None = None,
+    max_results: int | None = None,
+    mode: str = "Balanced",
+    fanout: int | None = None,
+    bypass_cache: bool = False,
+    on_token: Callable[[str], None] | None = None,
+    quiet: bool = False,
+    fetch_pages: bool | None = None,
+    deadline_s: float | None = None,
+):
+    """Blocking entry point (CLI / Streamlit) around `arun_agent`. Safe to call from many threads."""
+    # One loop per call: its async LLM connection pool is shared by every stage and closed at the end
+    return run_closing(
+        arun_agent(
+            question,
+            max_iterations=max_iterations,
+            max_results=max_results,
+            mode=mode,
+            fanout=fanout,
+            bypass_cache=bypass_cache,
+            on_token=on_token,
+            quiet=quiet,
+            fetch_pages=fetch_pages,
+            deadline_s=deadline_s,
+        )
+    )
+
+
+async def aresume_agent(
+    run_id: str,
+    on_token: Callable[[str], None] | None = None,
+    quiet: bool = False,
+):
+    """
+    Continue an interrupted run from its last checkpointed stage: finished plan, search,
+    evaluation and map calls are not repeated, and the thinking log carries on under the same run ID.
+    """
+    checkpoint = get_checkpoint_store().load(run_id)
+    if checkpoint is None or checkpoint["pipeline"] != "langchain":
+        raise KeyError(f"No checkpoint for run {run_id!r}")
+    state = checkpoint["state"]
+    run = AgentRun(state["question"], on_token=on_token, quiet=quiet, **state["settings"])
+    run.run_log = RunLog.resume(run_id)
+    run.run_id = run_id
+    run.sources = state["sources"]
+    run.deduper.add(run.sources)  # so later iterations still drop repeats of restored sources
+    run.resume_state = {"stage": checkpoint["stage"], "loop": state["loop"]}
+    return await execute_run(run)
+
+
+def resume_agent(
+    run_id: str,
+    on_token: Callable[[str], None] | None = None,
+    quiet: bool = False,
+):
+    """Blocking entry point around `aresume_agent`."""
+    return run_closing(aresume_agent(run_id, on_token=on_token, quiet=quiet))
 
 
 if __name__ == "__main__":
-    q = input("Enter your research question: ").strip()
-    if not q:
-        console.print("[red]Please enter a question.[/red]")
+    parser = argparse.ArgumentParser(description="AutoResearch Agent (LangChain)")
+    parser.add_argument(
+        "--timings",
+        action="store_true",
+        help="print a per-stage latency / token breakdown after the run",
+    )
+    parser.add_argument(
+        "--resume",
+        nargs="?",
+        const="latest",
+        metavar="RUN_ID",
+        help="continue an interrupted run from its last checkpoint (default: the most recent one)",
+    )
+    parser.add_argument(
+        "--deadline",
+        type=float,
+        default=None,
+        metavar="SECONDS",
+        help="answer within this wall-clock budget (default: DEADLINE_S; 0 = none)",
+    )
+    args = parser.parse_args()
+    console = get_console()
+
+    try:
+        require_keys(GROQ_API_KEY=GROQ_API_KEY, TAVILY_API_KEY=TAVILY_API_KEY)
+    except MissingKeyError as e:
+        console.print(f"[red]{e}[/red]")
         raise SystemExit(1)
 
-    # For CLI run, we don't need the returned values
-    run_agent(q)
+    if args.resume:
+        run_id = get_checkpoint_store().latest("langchain") if args.resume == "latest" else args.resume
+        try:
+            _, run_log = resume_agent(run_id or "")
+        except KeyError as e:
+            console.print(f"[red]{e.args[0]}[/red]")
+            raise SystemExit(1)
+    else:
+        q = input("Enter your research question: ").strip()
+        if not q:
+            console.print("[red]Please enter a question.[/red]")
+            raise SystemExit(1)
+
+        _, run_log = run_agent(q, deadline_s=args.deadline)
+    if args.timings:
+        summaries = [e["data"] for e in run_log if e["step"] == "run_summary"]
+        print_breakdown(summaries[-1] if summaries else None, console)
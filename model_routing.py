@@ -0,0 +1,52 @@
+import os
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# ---------------------------
+# Config
+# ---------------------------
+MODEL = os.getenv("GROQ_MODEL", "llama-3.1-8b-instant")
+FAST_MODEL = os.getenv("GROQ_FAST_MODEL", MODEL)  # plan, queries, evaluation, batch summaries
+SYNTH_MODEL = os.getenv("GROQ_SYNTH_MODEL", MODEL)  # final answer (e.g. llama-3.3-70b-versatile)
+TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.3"))
+MAX_OUTPUT_TOKENS = int(os.getenv("MAX_OUTPUT_TOKENS", "1400"))  # final answer
+SYNTH_MAP_OUTPUT_TOKENS = int(os.getenv("SYNTH_MAP_OUTPUT_TOKENS", "400"))  # longest summary per batch
+
+# Default (model, temperature, max_tokens) per stage. Short-output stages get a
+# tight max_tokens: it bounds the reply, and a smaller reservation is served faster.
+# Any field can be overridden with LLM_<STAGE>_MODEL / _TEMPERATURE / _MAX_TOKENS.
+STAGE_DEFAULTS = {
+    "plan": (FAST_MODEL, TEMPERATURE, 300),  # 3 steps + stop criteria
+    "query": (FAST_MODEL, TEMPERATURE, 48),  # one query, max 12 words
+    "improve_query": (FAST_MODEL, TEMPERATURE, 48),
+    "multi_query": (FAST_MODEL, TEMPERATURE, 256),  # one query per line
+    "improve_multi_query": (FAST_MODEL, TEMPERATURE, 256),
+    "eval": (FAST_MODEL, TEMPERATURE, 96),  # DECISION + one GAPS sentence
+    "synth_map": (FAST_MODEL, TEMPERATURE, SYNTH_MAP_OUTPUT_TOKENS),
+    "synth": (SYNTH_MODEL, TEMPERATURE, MAX_OUTPUT_TOKENS),
+    "synth_reduce": (SYNTH_MODEL, TEMPERATURE, MAX_OUTPUT_TOKENS),
+}
+
+
+def _stage_env(stage: str, field: str) -> Optional[str]:
+    value = os.getenv(f"LLM_{stage.upper()}_{field}")
+    return value if value not in (None, "") else None
+
+
+def stage_model(stage: str) -> Dict[str, Any]:
+    """{"model", "temperature", "max_tokens"} for a chain stage (unknown stages: the base model, no cap)."""
+    model, temperature, max_tokens = STAGE_DEFAULTS.get(stage, (MODEL, TEMPERATURE, None))
+    model = _stage_env(stage, "MODEL") or model
+    temperature = float(_stage_env(stage, "TEMPERATURE") or temperature)
+    tokens = _stage_env(stage, "MAX_TOKENS")
+    if tokens is not None:
+        max_tokens = int(tokens) if int(tokens) > 0 else None
+    return {"model": model, "temperature": temperature, "max_tokens": max_tokens}
+
+
+def routing_table() -> Dict[str, Dict[str, Any]]:
+    """Resolved configuration of every known stage (logged once per run)."""
+    return {stage: stage_model(stage) for stage in STAGE_DEFAULTS}
@@ -0,0 +1,213 @@
+import os
+import time
+import codecs
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from textutil import content_terms
+
+# ---------------------------
+# Config
+# ---------------------------
+PAGE_FETCH = os.getenv("PAGE_FETCH", "0") == "1"  # 1 = read full pages, not just the search snippet
+PAGE_FETCH_RAW = os.getenv("PAGE_FETCH_RAW", "1") == "1"  # ask Tavily for raw page text so most pages need no fetch
+PAGE_FETCH_WORKERS = int(os.getenv("PAGE_FETCH_WORKERS", "4"))
+PAGE_FETCH_TIMEOUT_S = float(os.getenv("PAGE_FETCH_TIMEOUT_S", "8"))  # whole page, connect to last byte
+PAGE_MAX_BYTES = int(os.getenv("PAGE_MAX_BYTES", str(512 * 1024)))  # stop reading a page after this
+PAGE_CHUNK_WORDS = int(os.getenv("PAGE_CHUNK_WORDS", "120"))
+PAGE_CHUNKS_PER_SOURCE = int(os.getenv("PAGE_CHUNKS_PER_SOURCE", "3"))
+
+_READ_SIZE = 16 * 1024
+_USER_AGENT = "Mozilla/5.0 (compatible; AutoResearchAgent/1.0)"
+_TEXT_TYPES = ("text/html", "application/xhtml+xml", "text/plain")
+# Never visible as article text
+_SKIP_TAGS = {"script", "style", "noscript", "svg", "template", "head", "nav", "footer", "aside", "form", "iframe"}
+
+
+class ChunkSelector:
+    """
+    Splits a stream of text into ~chunk_words chunks and keeps only the `keep`
+    best-scoring ones (query-term overlap), so memory does not grow with the page.
+    """
+
+    def __init__(self, query_terms: Set[str], chunk_words: int = PAGE_CHUNK_WORDS, keep: int = PAGE_CHUNKS_PER_SOURCE):
+        self.query_terms = query_terms
+        self.chunk_words = max(20, chunk_words)
+        self.keep = max(1, keep)
+        self.chunks_seen = 0
+        self._words: List[str] = []
+        self._heap: List[Tuple[float, int, str]] = []  # (score, position, text), min-heap of the best
+
+    def add(self, text: str) -> None:
+        self._words.extend(text.split())
+        while len(self._words) >= self.chunk_words:
+            self._emit(self._words[: self.chunk_words])
+            del self._words[: self.chunk_words]
+
+    def _score(self, words: List[str]) -> float:
+        terms = content_terms(" ".join(words))
+        if not terms or not self.query_terms:
+            return 0.0
+        hits = sum(1 for t in terms if t in self.query_terms)
+        distinct = len(self.query_terms.intersection(terms))
+        # Distinct query terms dominate; density breaks ties
+        return distinct + hits / len(terms)
+
+    def _emit(self, words: List[str]) -> None:
+        position = self.chunks_seen
+        self.chunks_seen += 1
+        score = self._score(words)
+        if score <= 0:
+            return
+        item = (score, -position, " ".join(words))
+        if len(self._heap) < self.keep:
+            heapq.heappush(self._heap, item)
+        elif item > self._heap[0]:
+            heapq.heapreplace(self._heap, item)
+
+    def close(self) -> List[str]:
+        """Best chunks in document order."""
+        if len(self._words) >= 8:
+            self._emit(self._words)
+        self._words = []
+        return [text for _, _, text in sorted(self._heap, key=lambda c: -c[1])]
+
+
+class _TextExtractor(HTMLParser):
+    """Streaming HTML → visible text, handed to a ChunkSelector as it is parsed."""
+
+    def __init__(self, sink: ChunkSelector):
+        super().__init__(convert_charrefs=True)
+        self.sink = sink
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "body":
+            self._skip_depth = 0  # </head> is optional in HTML
+        elif tag in _SKIP_TAGS:
+            self._skip_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag in _SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.sink.add(data)
+
+
+def _query_terms(query: str) -> Set[str]:
+    return set(content_terms(query))
+
+
+def chunks_from_text(text: str, query: str) -> List[str]:
+    """Top chunks of already-extracted text (e.g. Tavily raw_content), capped at PAGE_MAX_BYTES."""
+    selector = ChunkSelector(_query_terms(query))
+    data = (text or "").encode("utf-8")[:PAGE_MAX_BYTES].decode("utf-8", errors="ignore")
+    for start in range(0, len(data), _READ_SIZE):
+        selector.add(data[start:start + _READ_SIZE])
+    return selector.close()
+
+
+def _charset(content_type: Optional[str]) -> str:
+    # requests assumes ISO-8859-1 for text/* without a charset; most of the web is UTF-8
+    for param in (content_type or "").split(";")[1:]:
+        name, _, value = param.partition("=")
+        if name.strip().lower() == "charset":
+            try:
+                return codecs.lookup(value.strip().strip('"')).name
+            except LookupError:
+                break
+    return "utf-8"
+
+
+def fetch_chunks(url: str, query: str, session: Any = None) -> Dict[str, Any]:
+    """
+    Stream one page (bounded by PAGE_MAX_BYTES and PAGE_FETCH_TIMEOUT_S), extract its
+    text incrementally and return {"chunks", "bytes", "truncated"}. Raises on HTTP/content errors.
+    """
+    if session is None:
+        from clients import get_http_session
+
+        session = get_http_session()
+    deadline = time.monotonic() + PAGE_FETCH_TIMEOUT_S
+    selector = ChunkSelector(_query_terms(query))
+    received = 0
+    truncated = False
+    with session.get(
+        url,
+        stream=True,
+        timeout=(min(3.0, PAGE_FETCH_TIMEOUT_S), PAGE_FETCH_TIMEOUT_S),
+        headers={"User-Agent": _USER_AGENT, "Accept": "text/html,text/plain;q=0.9"},
+    ) as resp:
+        resp.raise_for_status()
+        ctype = (resp.headers.get("Content-Type") or "text/html").split(";")[0].strip().lower()
+        if ctype not in _TEXT_TYPES:
+            raise ValueError(f"unsupported content type {ctype}")
+        decoder = codecs.getincrementaldecoder(_charset(resp.headers.get("Content-Type")))(errors="replace")
+        parser = _TextExtractor(selector) if ctype != "text/plain" else None
+        for block in resp.iter_content(_READ_SIZE):
+            received += len(block)
+            text = decoder.decode(block)
+            if parser is not None:
+                parser.feed(text)
+            else:
+                selector.add(text)
+            if received >= PAGE_MAX_BYTES or time.monotonic() > deadline:
+                truncated = True
+                break
+        if parser is not None:
+            parser.feed(decoder.decode(b"", final=True))
+            parser.close()
+    return {"chunks": selector.close(), "bytes": received, "truncated": truncated}
+
+
+def enrich_sources(
+    query: str,
+    sources: List[Dict[str, Any]],
+    fetch: Optional[Callable[[str, str], Dict[str, Any]]] = None,
+    workers: int = PAGE_FETCH_WORKERS,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Replace each source's snippet with snippet + its best page chunks. Uses Tavily
+    raw_content when present, otherwise fetches the page (bounded pool). Sources whose
+    page cannot be read keep their snippet. Returns (sources, stats).
+    """
+    fetch = fetch or fetch_chunks
+    stats = {"sources": len(sources), "raw": 0, "fetched": 0, "failed": 0, "bytes": 0, "chunks": 0, "truncated": 0}
+    if not sources:
+        return [], stats
+
+    def one(source: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        raw = source.get("raw_content")
+        if raw:
+            return "raw", {"chunks": chunks_from_text(raw, query), "bytes": min(len(raw), PAGE_MAX_BYTES)}
+        url = source.get("url") or ""
+        if not url.startswith(("http://", "https://")):
+            return "failed", {}
+        try:
+            return "fetched", fetch(url, query)
+        except Exception as e:
+            return "failed", {"error": f"{type(e).__name__}: {str(e)[:120]}"}
+
+    n = max(1, min(workers, len(sources)))
+    with ThreadPoolExecutor(max_workers=n, thread_name_prefix="fetch") as pool:
+        outcomes = list(pool.map(one, sources))
+
+    enriched = []
+    for source, (how, page) in zip(sources, outcomes):
+        stats[how] += 1
+        stats["bytes"] += page.get("bytes", 0)
+        stats["truncated"] += int(bool(page.get("truncated")))
+        if "error" in page and len(stats.setdefault("errors", [])) < 3:
+            stats["errors"].append({"url": source.get("url"), "error": page["error"]})
+        chunks = page.get("chunks") or []
+        stats["chunks"] += len(chunks)
+        item = {k: v for k, v in source.items() if k != "raw_content"}
+        if chunks:
+            snippet = (source.get("content") or "").strip()
+            item["content"] = "\n".join([snippet] + chunks) if snippet else "\n".join(chunks)
+        enriched.append(item)
+    return enriched, stats
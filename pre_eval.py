@@ -0,0 +1,129 @@
+import os
+import re
+from typing import Any, Dict, List, Optional, Set
+from urllib.parse import urlsplit
+
+from textutil import content_terms, tokenize
+
+# ---------------------------
+# Config
+# ---------------------------
+PRE_EVAL = os.getenv("PRE_EVAL", "1") == "1"  # 0 = always ask the LLM evaluator
+PRE_EVAL_YES = float(os.getenv("PRE_EVAL_YES", "0.8"))  # score >= this → YES without an LLM call
+PRE_EVAL_NO = float(os.getenv("PRE_EVAL_NO", "0.3"))  # score < this → NO without an LLM call
+
+# Words that shape a question but never need to appear in a source
+QUESTION_FILLER = frozenset(
+    """latest recent current currently main key significant important major best new compare compared
+    comparison difference differences explain overview much many announced happening today vs versus""".split()
+)
+_ENTITY = re.compile(r"\b(?:[A-Z][A-Za-z0-9&.-]*[A-Z0-9][A-Za-z0-9]*|[A-Z][a-z]+|\d{4})\b")
+_YEAR = re.compile(r"\b(19\d{2}|20\d{2})\b")
+
+
+def _variants(term: str) -> Set[str]:
+    # Cheap plural folding so "battery" matches "batteries" and "model" matches "models"
+    out = {term, term + "s", term + "es"}
+    if term.endswith("ies"):
+        out.add(term[:-3] + "y")
+    elif term.endswith("y"):
+        out.add(term[:-1] + "ies")
+    if term.endswith("es"):
+        out.add(term[:-2])
+    if term.endswith("s"):
+        out.add(term[:-1])
+    return out
+
+
+def key_terms(question: str) -> Dict[str, float]:
+    """Question terms worth finding in sources, weighted: named entities / years 2, other terms 1."""
+    words = (question or "").split()
+    # The first word is capitalized by grammar, not because it names something
+    entities = {t for t in tokenize(" ".join(_ENTITY.findall(" ".join(words[1:]))))}
+    weights: Dict[str, float] = {}
+    for t in content_terms(question):
+        if t in QUESTION_FILLER or len(t) < 2:
+            continue
+        weights[t] = 2.0 if t in entities else 1.0
+    return weights
+
+
+def _domain(url: str) -> str:
+    host = urlsplit(url or "").netloc.lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def score_sources(question: str, sources: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Score in [0, 1] for "the sources answer the question":
+    - coverage: weighted share of key terms found, full credit once two sources mention a term
+    - diversity: distinct domains (3+ = full credit)
+    - recency: for year-bounded questions, sources mentioning that year or later (2+ = full credit)
+    """
+    weights = key_terms(question)
+    docs = [
+        set(tokenize(f"{s.get('title') or ''} {s.get('content') or ''} {s.get('url') or ''}"))
+        for s in sources
+    ]
+
+    credit = 0.0
+    missing: List[str] = []
+    for term, w in weights.items():
+        forms = _variants(term)
+        hits = sum(1 for d in docs if forms & d)
+        credit += w * min(1.0, hits / 2)
+        if not hits:
+            missing.append(term)
+    total = sum(weights.values())
+    coverage = credit / total if total else 0.0
+
+    domains = {_domain(s.get("url") or "") for s in sources} - {""}
+    diversity = min(1.0, len(domains) / 3)
+
+    years = [int(y) for y in _YEAR.findall(question or "")]
+    recency: Optional[float] = None
+    if years:
+        since = min(years)
+        recent = sum(
+            1 for d in docs if any(t.isdigit() and len(t) == 4 and int(t) >= since for t in d)
+        )
+        recency = min(1.0, recent / 2)
+
+    if recency is None:
+        score = 0.75 * coverage + 0.25 * diversity
+    else:
+        score = 0.6 * coverage + 0.2 * diversity + 0.2 * recency
+    return {
+        "score": round(score, 3),
+        "coverage": round(coverage, 3),
+        "diversity": round(diversity, 3),
+        "recency": None if recency is None else round(recency, 3),
+        "missing_terms": missing[:8],
+        "sources": len(sources),
+    }
+
+
+def pre_evaluate(
+    question: str,
+    sources: List[Dict[str, Any]],
+    yes_at: float = PRE_EVAL_YES,
+    no_below: float = PRE_EVAL_NO,
+) -> Dict[str, Any]:
+    """
+    Decide locally when the score is clear-cut. "evaluation" holds the
+    DECISION/GAPS text to use, or None when the LLM evaluator should decide.
+    """
+    result = score_sources(question, sources)
+    if not PRE_EVAL:
+        return {**result, "decision": "llm", "evaluation": None}
+    if result["score"] >= yes_at:
+        return {**result, "decision": "yes", "evaluation": "DECISION: YES\nGAPS: None"}
+    if result["score"] < no_below:
+        if result["missing_terms"]:
+            gap = "Sources do not cover: " + ", ".join(result["missing_terms"]) + "."
+        elif result["recency"] is not None and result["recency"] < 1:
+            gap = "Too few sources from the period the question asks about."
+        else:
+            gap = "Too few independent sources."
+        return {**result, "decision": "no", "evaluation": f"DECISION: NO\nGAPS: {gap}"}
+    return {**result, "decision": "llm", "evaluation": None}
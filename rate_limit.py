@@ -0,0 +1,270 @@
+import os
+import time
+import random
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+# ---------------------------
+# Config (per provider, from env)
+# ---------------------------
+# Defaults follow Groq's free tier for llama-3.1-8b-instant and Tavily's dev limits.
+# 0 disables a limit.
+PROVIDER_DEFAULTS = {
+    "groq": {"rpm": 30, "tpm": 6000, "concurrency": 8, "timeout_s": 60.0},
+    "tavily": {"rpm": 100, "tpm": 0, "concurrency": 8, "timeout_s": 30.0},
+}
+MAX_RETRIES = int(os.getenv("RATE_LIMIT_MAX_RETRIES", "4"))
+BACKOFF_BASE_S = float(os.getenv("RATE_LIMIT_BACKOFF_BASE_S", "1.0"))
+BACKOFF_MAX_S = float(os.getenv("RATE_LIMIT_BACKOFF_MAX_S", "30.0"))
+
+OnRetry = Optional[Callable[[Dict[str, Any]], None]]
+RetryIf = Optional[Callable[[BaseException], bool]]
+
+
+def _env(provider: str, field: str, default: float) -> float:
+    return float(os.getenv(f"{provider.upper()}_{field.upper()}", str(default)))
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled at rate_per_min, holding up to one minute of budget.
+    Callers reserve up front (the balance may go negative) and sleep off the debt,
+    so waiting happens outside the lock and reservations are served in order.
+    """
+
+    def __init__(self, rate_per_min: float):
+        self.rate = rate_per_min / 60.0
+        self.capacity = float(rate_per_min)
+        self._level = self.capacity
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """Take `amount` and return how long the caller must wait before using it."""
+        if self.rate <= 0 or amount <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._level = min(self.capacity, self._level + (now - self._stamp) * self.rate)
+            self._stamp = now
+            self._level -= min(amount, self.capacity)
+            return 0.0 if self._level >= 0 else -self._level / self.rate
+
+    def adjust(self, delta: float) -> None:
+        """Correct an earlier reservation once the real cost is known (positive = used more)."""
+        if self.rate <= 0 or not delta:
+            return
+        with self._lock:
+            self._level = min(self.capacity, self._level - delta)
+
+
+class AdaptiveConcurrency:
+    """AIMD limit on in-flight calls: +1 per window of successes, halved on throttling."""
+
+    def __init__(self, max_limit: int, min_limit: int = 1):
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.limit = float(self.max_limit)
+        self.in_flight = 0
+        self._cond = threading.Condition()
+
+    def _try_enter(self) -> bool:
+        with self._cond:
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return True
+            return False
+
+    def acquire(self) -> None:
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait(0.25)
+            self.in_flight += 1
+
+    async def aacquire(self) -> None:
+        # Limiters are shared across threads and event loops, so poll instead of asyncio primitives
+        while not self._try_enter():
+            await asyncio.sleep(0.05)
+
+    def release(self, throttled: bool) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(self.min_limit, self.limit / 2)
+            else:
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    code = getattr(exc, "status_code", None)
+    if code is None:
+        code = getattr(getattr(exc, "response", None), "status_code", None)
+    return code if isinstance(code, int) else None
+
+
+def is_throttle(exc: BaseException) -> bool:
+    name = type(exc).__name__
+    return _status_code(exc) == 429 or any(
+        marker in name for marker in ("RateLimit", "LimitExceeded", "TooManyRequests")
+    )
+
+
+def is_retryable(exc: BaseException) -> bool:
+    flag = getattr(exc, "retryable", None)
+    if flag is not None:
+        return bool(flag)
+    if is_throttle(exc):
+        return True
+    code = _status_code(exc)
+    if code is not None:
+        return code >= 500 or code in (408, 409)
+    name = type(exc).__name__
+    return isinstance(exc, (TimeoutError, ConnectionError, asyncio.TimeoutError)) or any(
+        marker in name for marker in ("Timeout", "Connection")
+    )
+
+
+def retry_after_s(exc: BaseException) -> Optional[float]:
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None  # HTTP-date form; fall back to backoff
+
+
+class ProviderLimiter:
+    """
+    Process-wide guard for one provider: RPM/TPM token buckets, adaptive concurrency,
+    per-call timeout, and retries with jittered exponential backoff honoring Retry-After.
+    """
+
+    def __init__(self, name: str):
+        d = PROVIDER_DEFAULTS.get(name, {"rpm": 0, "tpm": 0, "concurrency": 8, "timeout_s": 60.0})
+        self.name = name
+        self.requests = TokenBucket(_env(name, "rpm", d["rpm"]))
+        self.tokens = TokenBucket(_env(name, "tpm", d["tpm"]))
+        self.concurrency = AdaptiveConcurrency(int(_env(name, "max_concurrency", d["concurrency"])))
+        self.timeout_s = _env(name, "timeout_s", d["timeout_s"]) or None
+        self.max_retries = MAX_RETRIES
+        self._counts = {"calls": 0, "retries": 0, "throttles": 0, "timeouts": 0, "failures": 0}
+        self._lock = threading.Lock()
+
+    def _bump(self, field: str) -> None:
+        with self._lock:
+            self._counts[field] += 1
+
+    def _backoff(self, attempt: int, exc: BaseException) -> float:
+        hinted = retry_after_s(exc)
+        if hinted is not None:
+            return min(BACKOFF_MAX_S, hinted) + random.uniform(0, 0.25)
+        # Full jitter: uniform(0, base * 2^attempt)
+        return random.uniform(0, min(BACKOFF_MAX_S, BACKOFF_BASE_S * (2 ** attempt)))
+
+    def _on_failure(self, exc: BaseException, attempt: int, on_retry: OnRetry, retry_if: RetryIf = None) -> float:
+        """Record a failed attempt; return the delay before retrying, or raise if giving up."""
+        throttled = is_throttle(exc)
+        if throttled:
+            self._bump("throttles")
+        if isinstance(exc, (TimeoutError, asyncio.TimeoutError)):
+            self._bump("timeouts")
+        vetoed = retry_if is not None and not retry_if(exc)
+        if attempt >= self.max_retries or vetoed or not is_retryable(exc):
+            self._bump("failures")
+            raise exc
+        delay = self._backoff(attempt, exc)
+        self._bump("retries")
+        if on_retry:
+            on_retry({
+                "provider": self.name,
+                "attempt": attempt + 1,
+                "delay_s": round(delay, 2),
+                "throttled": throttled,
+                "error": f"{type(exc).__name__}: {str(exc)[:160]}",
+            })
+        return delay
+
+    def call(self, fn: Callable[[], Any], tokens: float = 0, on_retry: OnRetry = None, retry_if: RetryIf = None) -> Any:
+        """
+        Blocking call through the limiter (for worker threads / sync clients).
+        retry_if, when given, can veto retrying an otherwise retryable failure.
+        """
+        self._bump("calls")
+        for attempt in range(self.max_retries + 1):
+            time.sleep(max(self.requests.reserve(1), self.tokens.reserve(tokens)))
+            self.concurrency.acquire()
+            throttled = False
+            try:
+                return _run_with_timeout(fn, self.timeout_s)
+            except Exception as e:
+                throttled = is_throttle(e)
+                delay = self._on_failure(e, attempt, on_retry, retry_if)
+            finally:
+                self.concurrency.release(throttled)
+            time.sleep(delay)
+
+    async def acall(
+        self,
+        fn: Callable[[], Awaitable[Any]],
+        tokens: float = 0,
+        on_retry: OnRetry = None,
+        retry_if: RetryIf = None,
+    ) -> Any:
+        """Async call through the limiter; fn must build a fresh awaitable per attempt (retry_if as in call)."""
+        self._bump("calls")
+        for attempt in range(self.max_retries + 1):
+            await asyncio.sleep(max(self.requests.reserve(1), self.tokens.reserve(tokens)))
+            await self.concurrency.aacquire()
+            throttled = False
+            try:
+                return await asyncio.wait_for(fn(), timeout=self.timeout_s)
+            except Exception as e:
+                throttled = is_throttle(e)
+                delay = self._on_failure(e, attempt, on_retry, retry_if)
+            finally:
+                self.concurrency.release(throttled)
+            await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._counts)
+        return {
+            **counts,
+            "concurrency_limit": round(self.concurrency.limit, 2),
+            "in_flight": self.concurrency.in_flight,
+        }
+
+
+_timeout_pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix="limited-call")
+
+
+def _run_with_timeout(fn: Callable[[], Any], timeout_s: Optional[float]) -> Any:
+    # Blocking clients without their own timeout: stop waiting (the thread finishes in the background)
+    if not timeout_s:
+        return fn()
+    future = _timeout_pool.submit(fn)
+    try:
+        return future.result(timeout=timeout_s)
+    except FutureTimeout:
+        raise TimeoutError(f"call exceeded {timeout_s:.0f}s") from None
+
+
+_limiters: Dict[str, ProviderLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(provider: str) -> ProviderLimiter:
+    with _limiters_lock:
+        if provider not in _limiters:
+            _limiters[provider] = ProviderLimiter(provider)
+        return _limiters[provider]
+
+
+def limiter_stats() -> Dict[str, Dict[str, Any]]:
+    with _limiters_lock:
+        names = list(_limiters)
+    return {name: get_limiter(name).stats() for name in names}
@@ -0,0 +1,151 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional
+
+# ---------------------------
+# Config
+# ---------------------------
+SEARCH_CACHE_PATH = os.getenv("SEARCH_CACHE_PATH", os.path.join(".cache", "search_cache.sqlite3"))
+SEARCH_CACHE_TTL_S = float(os.getenv("SEARCH_CACHE_TTL_S", str(6 * 60 * 60)))
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "5000"))
+SEARCH_CACHE_BYPASS = os.getenv("SEARCH_CACHE_BYPASS", "").strip().lower() in ("1", "true", "yes")
+
+
+def normalize_query(query: str) -> str:
+    return " ".join((query or "").lower().split())
+
+
+class SearchCache:
+    """SQLite-backed search result cache with TTL and LRU size bound (thread-safe)."""
+
+    def __init__(
+        self,
+        path: str = SEARCH_CACHE_PATH,
+        ttl_s: float = SEARCH_CACHE_TTL_S,
+        max_entries: int = SEARCH_CACHE_MAX_ENTRIES,
+    ):
+        self.path = path
+        self.ttl_s = ttl_s
+        self.max_entries = max(1, max_entries)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            folder = os.path.dirname(self.path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute(
+                """CREATE TABLE IF NOT EXISTS search_cache (
+                    key TEXT PRIMARY KEY,
+                    query TEXT NOT NULL,
+                    max_results INTEGER NOT NULL,
+                    results TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )"""
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_search_cache_access ON search_cache(last_access)"
+            )
+            self._db.commit()
+        return self._db
+
+    @staticmethod
+    def make_key(query: str, max_results: int) -> str:
+        raw = f"{normalize_query(query)}\x1f{int(max_results)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, query: str, max_results: int) -> Optional[List[Dict[str, Any]]]:
+        key = self.make_key(query, max_results)
+        now = time.time()
+        with self._lock:
+            db = self._conn()
+            row = db.execute(
+                "SELECT results, created_at FROM search_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_s:
+                if row is not None:
+                    db.execute("DELETE FROM search_cache WHERE key = ?", (key,))
+                    db.commit()
+                self.misses += 1
+                return None
+            db.execute("UPDATE search_cache SET last_access = ? WHERE key = ?", (now, key))
+            db.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, query: str, max_results: int, results: List[Dict[str, Any]]) -> None:
+        key = self.make_key(query, max_results)
+        now = time.time()
+        payload = json.dumps(results, ensure_ascii=False)
+        with self._lock:
+            db = self._conn()
+            db.execute(
+                "INSERT OR REPLACE INTO search_cache VALUES (?, ?, ?, ?, ?, ?)",
+                (key, normalize_query(query), int(max_results), payload, now, now),
+            )
+            self._evict(db, now)
+            db.commit()
+
+    def _evict(self, db: sqlite3.Connection, now: float) -> None:
+        # Expired rows first, then least-recently-used rows beyond the size bound
+        cur = db.execute("DELETE FROM search_cache WHERE created_at < ?", (now - self.ttl_s,))
+        self.evictions += max(cur.rowcount, 0)
+        (count,) = db.execute("SELECT COUNT(*) FROM search_cache").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            cur = db.execute(
+                """DELETE FROM search_cache WHERE key IN (
+                    SELECT key FROM search_cache ORDER BY last_access ASC LIMIT ?
+                )""",
+                (overflow,),
+            )
+            self.evictions += max(cur.rowcount, 0)
+
+    def clear(self) -> None:
+        with self._lock:
+            db = self._conn()
+            db.execute("DELETE FROM search_cache")
+            db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            (size,) = self._conn().execute("SELECT COUNT(*) FROM search_cache").fetchone()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": size,
+        }
+
+
+_search_cache: Optional[SearchCache] = None
+_search_cache_lock = threading.Lock()
+
+
+def get_search_cache() -> SearchCache:
+    """Process-wide cache shared by main.py and main_langchain.py."""
+    global _search_cache
+    with _search_cache_lock:
+        if _search_cache is None:
+            _search_cache = SearchCache()
+        return _search_cache
+
+
+def stats_delta(before: Dict[str, Any], after: Dict[str, Any]) -> Dict[str, Any]:
+    """Hit/miss/eviction counts between two stats() snapshots, plus current size."""
+    return {
+        "hits": after["hits"] - before["hits"],
+        "misses": after["misses"] - before["misses"],
+        "evictions": after["evictions"] - before["evictions"],
+        "entries": after["entries"],
+    }
@@ -0,0 +1,396 @@
+import os
+import json
+import time
+import queue
+import uuid
+import asyncio
+import argparse
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from rich.console import Console
+
+console = Console(stderr=True)
+
+# ---------------------------
+# Config
+# ---------------------------
+SERVER_HOST = os.getenv("SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8765"))
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "4"))  # research runs in flight
+SERVER_QUEUE_MAX = int(os.getenv("SERVER_QUEUE_MAX", "16"))  # waiting jobs before submit answers 429
+SERVER_JOB_TTL_S = float(os.getenv("SERVER_JOB_TTL_S", "3600"))  # finished jobs stay queryable this long
+SERVER_EVENT_BUFFER = int(os.getenv("SERVER_EVENT_BUFFER", "5000"))  # events kept per job for (re)connecting streams
+SERVER_SSE_KEEPALIVE_S = 15.0
+
+# Request fields passed through to AgentRun, with their types
+RUN_FIELDS = {
+    "mode": str,
+    "max_iterations": int,
+    "max_results": int,
+    "fanout": int,
+    "fetch_pages": bool,
+    "deadline_s": float,
+}
+
+
+class JobEvents:
+    """Bounded, append-only event buffer a job publishes to and any number of SSE streams read from."""
+
+    def __init__(self, maxlen: int = SERVER_EVENT_BUFFER):
+        self._events: deque = deque(maxlen=max(1, maxlen))
+        self._dropped = 0  # events that fell off the front; cursors are absolute positions
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def publish(self, kind: str, data: Any) -> None:
+        with self._cond:
+            if len(self._events) == self._events.maxlen:
+                self._dropped += 1
+            self._events.append((kind, data))
+            self._cond.notify_all()
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def read(self, cursor: int, timeout: float) -> Tuple[List[Tuple[str, Any]], int, bool]:
+        """Events after `cursor` (waiting up to timeout for new ones); returns (events, cursor, closed)."""
+        with self._cond:
+            end = self._dropped + len(self._events)
+            if cursor >= end and not self._closed:
+                self._cond.wait(timeout)
+                end = self._dropped + len(self._events)
+            start = max(cursor, self._dropped)  # a slow reader skips what was dropped
+            events = list(self._events)[start - self._dropped:]
+            return events, end, self._closed and start + len(events) >= end
+
+
+class Job:
+    def __init__(self, question: str, params: Dict[str, Any]):
+        self.id = uuid.uuid4().hex[:12]
+        self.question = question
+        self.params = params
+        self.status = "queued"
+        self.run_id: Optional[str] = None
+        self.answer: Optional[str] = None
+        self.error: Optional[str] = None
+        self.truncated = False  # answer cut off by its deadline
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.events = JobEvents()
+
+    def to_dict(self, position: Optional[int] = None) -> Dict[str, Any]:
+        out: Dict[str, Any] = {
+            "job_id": self.id,
+            "status": self.status,
+            "question": self.question,
+            "params": self.params,
+            "run_id": self.run_id,
+            "created": self.created,
+            "queued_s": round((self.started or time.time()) - self.created, 3),
+        }
+        if position is not None:
+            out["position"] = position
+        if self.started is not None:
+            out["elapsed_s"] = round((self.finished or time.time()) - self.started, 3)
+        if self.status == "done":
+            out["answer"] = self.answer
+            out["truncated"] = self.truncated
+        if self.error:
+            out["error"] = self.error
+        return out
+
+
+def default_run_factory(question: str, params: Dict[str, Any]):
+    from main_langchain import AgentRun
+
+    return AgentRun(question, quiet=True, **params)
+
+
+class JobQueue:
+    """
+    Bounded FIFO of research jobs served by a fixed pool of worker threads; each
+    worker runs one job at a time on its own long-lived event loop, so the loop's
+    pooled LLM connections carry over from job to job. submit() refuses work
+    (returns None) instead of queueing without limit.
+    """
+
+    def __init__(
+        self,
+        workers: int = SERVER_WORKERS,
+        max_queue: int = SERVER_QUEUE_MAX,
+        run_factory: Callable[[str, Dict[str, Any]], Any] = default_run_factory,
+        job_ttl_s: float = SERVER_JOB_TTL_S,
+    ):
+        self.workers = max(1, workers)
+        self.run_factory = run_factory
+        self.job_ttl_s = job_ttl_s
+        self._queue: "queue.Queue[Job]" = queue.Queue(maxsize=max(1, max_queue))
+        self._jobs: Dict[str, Job] = {}
+        self._order: deque = deque()  # queued job IDs, for positions
+        self._lock = threading.Lock()
+        self._running = 0
+        self.counts = {"submitted": 0, "rejected": 0, "done": 0, "error": 0}
+        self._threads = [
+            threading.Thread(target=self._work, name=f"job-worker-{n}", daemon=True) for n in range(self.workers)
+        ]
+        for t in self._threads:
+            t.start()
+
+    def submit(self, question: str, params: Dict[str, Any]) -> Optional[Job]:
+        job = Job(question, params)
+        with self._lock:
+            self._gc()
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                self.counts["rejected"] += 1
+                return None
+            self._jobs[job.id] = job
+            self._order.append(job.id)
+            self.counts["submitted"] += 1
+        job.events.publish("status", {"status": "queued"})
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def position(self, job: Job) -> Optional[int]:
+        with self._lock:
+            try:
+                return self._order.index(job.id) + 1
+            except ValueError:
+                return None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "running": self._running,
+                "queued": self._queue.qsize(),
+                "queue_max": self._queue.maxsize,
+                "jobs": len(self._jobs),
+                **self.counts,
+            }
+
+    def _gc(self) -> None:
+        cutoff = time.time() - self.job_ttl_s
+        for job_id in [j.id for j in self._jobs.values() if j.finished is not None and j.finished < cutoff]:
+            del self._jobs[job_id]
+
+    def _work(self) -> None:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        while True:
+            job = self._queue.get()
+            with self._lock:
+                self._order.remove(job.id)
+                self._running += 1
+            try:
+                self._run(job, loop)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self.counts[job.status] = self.counts.get(job.status, 0) + 1
+                self._queue.task_done()
+
+    def _run(self, job: Job, loop: asyncio.AbstractEventLoop) -> None:
+        from main_langchain import execute_run
+
+        job.status, job.started = "running", time.time()
+        job.events.publish("status", {"status": "running"})
+        try:
+            run = self.run_factory(job.question, job.params)
+            job.run_id = run.run_id
+            run.run_log.on_event = lambda event: job.events.publish("log", event)
+            run.on_token = lambda chunk: job.events.publish("token", chunk)
+            job.answer, _ = loop.run_until_complete(execute_run(run))
+            job.truncated = run.deadline_truncated
+            job.status = "done"
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {str(e)[:500]}"
+            job.status = "error"
+        job.finished = time.time()
+        job.events.publish("status", job.to_dict())
+        job.events.close()
+
+
+def parse_job_request(body: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    """(question, AgentRun kwargs) from a submit body; raises ValueError on bad input."""
+    question = str(body.get("question") or "").strip()
+    if not question:
+        raise ValueError("'question' is required")
+    params: Dict[str, Any] = {}
+    for name, kind in RUN_FIELDS.items():
+        if body.get(name) is None:
+            continue
+        value = body[name]
+        if kind is bool:
+            if not isinstance(value, bool):
+                raise ValueError(f"'{name}' must be true or false")
+        else:
+            try:
+                value = kind(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"'{name}' must be {kind.__name__}")
+        params[name] = value
+    if params.get("mode", "Balanced") not in ("Fast", "Balanced", "Deep"):
+        raise ValueError("'mode' must be Fast, Balanced or Deep")
+    return question, params
+
+
+class Handler(BaseHTTPRequestHandler):
+    """
+    POST /jobs                 {"question": ..., "mode"?, "max_iterations"?, ...} → 202 {job_id}, 429 when full
+    GET  /jobs/<id>            status, answer when done
+    GET  /jobs/<id>/events     server-sent events: status, log (thinking-log events), token (answer chunks)
+    GET  /healthz              queue and worker counters
+    """
+
+    jobs: JobQueue  # set by make_server
+    protocol_version = "HTTP/1.1"
+    server_version = "AutoResearchAgent/1.0"
+
+    def log_message(self, fmt, *args):
+        pass  # the thinking log is the record; keep stderr for progress
+
+    def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _path(self) -> List[str]:
+        return [p for p in urlsplit(self.path).path.split("/") if p]
+
+    def do_POST(self):
+        if self._path() != ["jobs"]:
+            return self._send_json(404, {"error": "not found"})
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}") if length else {}
+            if not isinstance(body, dict):
+                raise ValueError("body must be a JSON object")
+            question, params = parse_job_request(body)
+        except (ValueError, json.JSONDecodeError) as e:
+            return self._send_json(400, {"error": str(e)})
+        job = self.jobs.submit(question, params)
+        if job is None:
+            # Backpressure: tell the caller to come back instead of queueing without bound
+            return self._send_json(429, {**self.jobs.stats(), "error": "queue full"}, {"Retry-After": "5"})
+        self._send_json(202, job.to_dict(self.jobs.position(job)), {"Location": f"/jobs/{job.id}"})
+
+    def do_GET(self):
+        parts = self._path()
+        if parts == ["healthz"]:
+            return self._send_json(200, {"ok": True, **self.jobs.stats()})
+        if len(parts) in (2, 3) and parts[0] == "jobs":
+            job = self.jobs.get(parts[1])
+            if job is None:
+                return self._send_json(404, {"error": "unknown job"})
+            if len(parts) == 2:
+                return self._send_json(200, job.to_dict(self.jobs.position(job)))
+            if parts[2] == "events":
+                return self._stream(job)
+        self._send_json(404, {"error": "not found"})
+
+    def _stream(self, job: Job) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        cursor = 0
+        try:
+            while True:
+                events, cursor, closed = job.events.read(cursor, SERVER_SSE_KEEPALIVE_S)
+                if events:
+                    self.wfile.write("".join(
+                        f"event: {kind}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+                        for kind, data in events
+                    ).encode("utf-8"))
+                else:
+                    self.wfile.write(b": keep-alive\n\n")
+                self.wfile.flush()
+                if closed:
+                    self.wfile.write(b"event: end\ndata: {}\n\n")
+                    self.wfile.flush()
+                    return
+        except (BrokenPipeError, ConnectionResetError):
+            return  # client went away; the job keeps running
+
+
+def make_server(host: str, port: int, jobs: JobQueue) -> ThreadingHTTPServer:
+    handler = type("BoundHandler", (Handler,), {"jobs": jobs})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def _offline_factory(args) -> Callable[[str, Dict[str, Any]], Any]:
+    # Stub backends from bench.py: no API keys, configurable latency (end-to-end testing)
+    import bench
+
+    bench.prepare_env(offline=True)
+    from main_langchain import AgentRun
+
+    backend = bench.SyntheticBackend(llm_latency_ms=args.llm_latency_ms, search_latency_ms=args.search_latency_ms)
+    chat = bench.make_chat_model(backend)
+    search = bench.BackendTavilyClient(backend)
+
+    def factory(question: str, params: Dict[str, Any]):
+        return AgentRun(question, quiet=True, bypass_cache=True, llm=chat, search_tool=search, **params)
+
+    return factory
+
+
+def main(argv: List[str] | None = None):
+    parser = argparse.ArgumentParser(description="Serve the research agent over HTTP (job queue + SSE progress).")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("-w", "--workers", type=int, default=SERVER_WORKERS)
+    parser.add_argument("--queue-max", type=int, default=SERVER_QUEUE_MAX)
+    parser.add_argument("--offline", action="store_true", help="use bench.py's synthetic LLM/search backends")
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0, help="--offline: mean LLM latency")
+    parser.add_argument("--search-latency-ms", type=float, default=400.0, help="--offline: mean search latency")
+    args = parser.parse_args(argv)
+
+    if args.offline:
+        factory = _offline_factory(args)
+    else:
+        from clients import MissingKeyError, require_keys
+        from main_langchain import GROQ_API_KEY, TAVILY_API_KEY
+
+        try:
+            require_keys(GROQ_API_KEY=GROQ_API_KEY, TAVILY_API_KEY=TAVILY_API_KEY)
+        except MissingKeyError as e:
+            console.print(f"[red]{e}[/red]")
+            raise SystemExit(1)
+        factory = default_run_factory
+
+    jobs = JobQueue(workers=args.workers, max_queue=args.queue_max, run_factory=factory)
+    server = make_server(args.host, args.port, jobs)
+    console.print(f"[cyan]Serving on http://{args.host}:{server.server_address[1]} "
+                  f"({jobs.workers} workers, queue {args.queue_max}{', offline' if args.offline else ''})[/cyan]")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from typing import Any, Dict, List
+
+from rich.console import Console
+from rich.table import Table
+
+console = Console()
+
+# ---------------------------
+# Config
+# ---------------------------
+# Import-time budget per entry module (ms, median of --repeat cold interpreter runs)
+STARTUP_BUDGETS_MS = {
+    "main_langchain": 250.0,  # what app.py and batch.py import
+    "main": 250.0,
+    "batch": 300.0,
+}
+STARTUP_BUDGET_MS = os.getenv("STARTUP_BUDGET_MS")  # one budget for every module, overriding the above
+
+# Loaded only when a run needs them; importing an entry module must not pull these in
+HEAVY_MODULES = ("langchain_core", "langchain_groq", "langchain_tavily", "groq", "tavily", "httpx", "streamlit")
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_PROBE = """
+import sys, time, json
+t = time.perf_counter()
+import {module}
+ms = (time.perf_counter() - t) * 1000
+print(json.dumps({{"ms": ms, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def _env() -> Dict[str, str]:
+    env = dict(os.environ)
+    # Startup must not depend on configuration: no keys, no .env side effects on the result
+    env.pop("GROQ_API_KEY", None)
+    env.pop("TAVILY_API_KEY", None)
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    return env
+
+
+def probe(module: str, importtime: bool = False) -> subprocess.CompletedProcess:
+    cmd = [sys.executable]
+    if importtime:
+        cmd += ["-X", "importtime"]
+    cmd += ["-c", _PROBE.format(module=module, heavy=HEAVY_MODULES)]
+    return subprocess.run(cmd, cwd=REPO_DIR, env=_env(), capture_output=True, text=True)
+
+
+def parse_importtime(stderr: str) -> Dict[str, float]:
+    """Self time (ms) per top-level package from `python -X importtime` output."""
+    totals: Dict[str, float] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # header row
+        root = parts[2].strip().split(".")[0]
+        totals[root] = totals.get(root, 0.0) + int(parts[0]) / 1000
+    return totals
+
+
+def measure(module: str, repeat: int, top: int) -> Dict[str, Any]:
+    timings: List[float] = []
+    heavy: List[str] = []
+    for _ in range(max(1, repeat)):
+        proc = probe(module)
+        if proc.returncode != 0:
+            output = (proc.stderr or proc.stdout).strip().splitlines()
+            return {"module": module, "error": output[-1] if output else f"exit code {proc.returncode}"}
+        out = json.loads(proc.stdout.strip().splitlines()[-1])
+        timings.append(out["ms"])
+        heavy = out["heavy"]
+    breakdown = parse_importtime(probe(module, importtime=True).stderr)
+    ranked = sorted(breakdown.items(), key=lambda kv: kv[1], reverse=True)[:top]
+    return {
+        "module": module,
+        "median_ms": round(statistics.median(timings), 1),
+        "min_ms": round(min(timings), 1),
+        "heavy": heavy,
+        "top": [{"package": name, "ms": round(ms, 1)} for name, ms in ranked],
+    }
+
+
+def budget_for(module: str) -> float:
+    if STARTUP_BUDGET_MS:
+        return float(STARTUP_BUDGET_MS)
+    return STARTUP_BUDGETS_MS.get(module, 250.0)
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure import time of the entry modules against a budget.")
+    parser.add_argument("modules", nargs="*", default=list(STARTUP_BUDGETS_MS), help="modules to import")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="cold interpreter runs per module")
+    parser.add_argument("--top", type=int, default=5, help="packages listed in the breakdown")
+    parser.add_argument("--budget-ms", type=float, default=None, help="override every module's budget")
+    parser.add_argument("--json", metavar="PATH", help="also write the results here")
+    args = parser.parse_args(argv)
+
+    results = [measure(m, args.repeat, args.top) for m in args.modules]
+
+    table = Table(title=f"Import time (median of {args.repeat})")
+    for col in ("Module", "Median ms", "Budget ms", "Heavy deps loaded", "Top packages (self ms)"):
+        table.add_column(col, justify="right" if "ms" in col and "Top" not in col else "left")
+    status = 0
+    for r in results:
+        if "error" in r:
+            table.add_row(r["module"], "-", "-", "-", r["error"], style="red")
+            status = 1
+            continue
+        r["budget_ms"] = args.budget_ms if args.budget_ms is not None else budget_for(r["module"])
+        r["over_budget"] = r["median_ms"] > r["budget_ms"] or bool(r["heavy"])
+        status = status or int(r["over_budget"])
+        table.add_row(
+            r["module"],
+            str(r["median_ms"]),
+            str(r["budget_ms"]),
+            ", ".join(r["heavy"]) or "none",
+            ", ".join(f"{t['package']} {t['ms']}" for t in r["top"]),
+            style="red" if r["over_budget"] else "",
+        )
+    console.print(table)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if status:
+        console.print("[bold red]Startup budget exceeded (or a heavy dependency is imported eagerly)[/bold red]")
+    return status
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,105 @@
+import time
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+SPAN_FIELDS = ("prompt_tokens", "completion_tokens", "prompt_bytes", "result_count", "retries", "throttled")
+
+
+class RunMetrics:
+    """Collects timing spans (wall time, tokens, bytes, result counts) for one agent run."""
+
+    def __init__(self, on_span: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.spans: List[Dict[str, Any]] = []
+        self.on_span = on_span
+        self._lock = threading.Lock()
+        self._t0 = time.perf_counter()
+
+    @contextmanager
+    def span(self, stage: str, **fields: Any) -> Iterator[Dict[str, Any]]:
+        """
+        Time a block. The yielded dict can be filled in by the caller
+        (tokens, result counts, ...) and is recorded when the block exits.
+        Model calls pass llm=True; only those count towards llm_calls.
+        """
+        rec: Dict[str, Any] = {"stage": stage, **fields}
+        start = time.perf_counter()
+        rec["start_ms"] = round((start - self._t0) * 1000, 1)
+        try:
+            yield rec
+        except BaseException as e:
+            rec["error"] = type(e).__name__
+            raise
+        finally:
+            rec["wall_ms"] = round((time.perf_counter() - start) * 1000, 1)
+            with self._lock:
+                self.spans.append(rec)
+            if self.on_span:
+                self.on_span(rec)
+
+    def summary(self) -> Dict[str, Any]:
+        stages: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            spans = list(self.spans)
+        for s in spans:
+            agg = stages.setdefault(s["stage"], {"calls": 0, "wall_ms": 0.0, "cached": 0, **{f: 0 for f in SPAN_FIELDS}})
+            agg["calls"] += 1
+            agg["wall_ms"] = round(agg["wall_ms"] + s["wall_ms"], 1)
+            agg["cached"] += 1 if s.get("cached") else 0
+            if s.get("model"):
+                agg["model"] = s["model"]
+            for f in SPAN_FIELDS:
+                agg[f] += s.get(f) or 0
+        return {
+            "total_wall_ms": round((time.perf_counter() - self._t0) * 1000, 1),
+            "llm_calls": sum(1 for s in spans if s.get("llm") and not s.get("cached")),
+            "search_calls": stages.get("search", {}).get("calls", 0),
+            "stages": stages,
+        }
+
+
+def usage_tokens(usage_by_model: Dict[str, Any]) -> Dict[str, int]:
+    """Sum prompt/completion tokens from a UsageMetadataCallbackHandler.usage_metadata dict."""
+    prompt = sum((u or {}).get("input_tokens", 0) for u in usage_by_model.values())
+    completion = sum((u or {}).get("output_tokens", 0) for u in usage_by_model.values())
+    return {"prompt_tokens": prompt, "completion_tokens": completion}
+
+
+def print_breakdown(summary: Optional[Dict[str, Any]], console: Any = None) -> None:
+    """Rich table of where a run spent its time (from a run_summary event)."""
+    from rich.console import Console
+    from rich.table import Table
+
+    console = console or Console()
+    if not summary:
+        console.print("[red]No run summary available.[/red]")
+        return
+    total = summary.get("total_wall_ms") or 0.0
+    table = Table(title=f"Stage breakdown — {total / 1000:.2f}s wall", show_lines=False)
+    table.add_column("Stage", style="cyan")
+    table.add_column("Model")
+    table.add_column("Calls", justify="right")
+    table.add_column("Cached", justify="right")
+    table.add_column("Wall ms", justify="right")
+    table.add_column("% of run", justify="right")
+    table.add_column("Prompt tok", justify="right")
+    table.add_column("Compl. tok", justify="right")
+    table.add_column("Prompt KB", justify="right")
+    table.add_column("Results", justify="right")
+    table.add_column("Retries", justify="right")
+    for stage, a in sorted(summary["stages"].items(), key=lambda kv: -kv[1]["wall_ms"]):
+        table.add_row(
+            stage,
+            a.get("model", "-"),
+            str(a["calls"]),
+            str(a["cached"]),
+            f"{a['wall_ms']:.0f}",
+            f"{100 * a['wall_ms'] / total:.0f}%" if total else "-",
+            str(a["prompt_tokens"]),
+            str(a["completion_tokens"]),
+            f"{a['prompt_bytes'] / 1024:.1f}",
+            str(a["result_count"]),
+            f"{a['retries']} ({a['throttled']} 429)" if a["retries"] else "0",
+        )
+    console.print(table)
+    console.print("[dim]Stages can overlap (plan ‖ query, fan-out searches), so percentages may exceed 100%.[/dim]")
@@ -0,0 +1,67 @@
+import os
+import sys
+import asyncio
+import tempfile
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+# The agent modules read their config at import time
+os.environ["THINKING_LOG_PATH"] = os.path.join(tempfile.mkdtemp(prefix="tlog-"), "thinking_log.jsonl")
+os.environ["CHECKPOINTS"] = "0"
+os.environ["KNOWLEDGE_INDEX"] = "0"
+
+import bench  # noqa: E402
+
+bench.prepare_env(offline=True)
+
+import main_langchain  # noqa: E402
+
+# One distinctive term per run; every other word of the questions is shared
+TOPICS = [
+    "aardvark", "bassoon", "cobalt", "dirigible", "emerald", "falcon",
+    "glacier", "harpsichord", "iguana", "jasmine", "kayak", "lighthouse",
+]
+
+
+def make_runs():
+    backend = bench.SyntheticBackend(llm_latency_ms=20, search_latency_ms=20, p_yes=0.5)
+    chat = bench.make_chat_model(backend)
+    search = bench.BackendTavilyClient(backend)
+    runs = []
+    for n, topic in enumerate(TOPICS):
+        runs.append(main_langchain.AgentRun(
+            f"What drives the maintenance costs of {topic} programs?",
+            max_iterations=3,
+            max_results=1 + n % 4,  # distinct per run, so result counts are traceable
+            search_tool=search,
+            llm=chat,
+            bypass_cache=True,
+        ))
+    return runs
+
+
+async def run_all(runs):
+    return await asyncio.gather(*(main_langchain.execute_run(run) for run in runs))
+
+
+def test_concurrent_runs_keep_their_logs_apart():
+    runs = make_runs()
+    results = asyncio.run(run_all(runs))
+
+    assert len({run.run_id for run in runs}) == len(runs)
+    for run, topic, (answer, events) in zip(runs, TOPICS, results):
+        assert answer
+        assert events, topic
+        # Every event belongs to this run ...
+        assert {e["run_id"] for e in events} == {run.run_id}
+        assert [e["data"] for e in events if e["step"] == "question"] == [run.question]
+        # ... and mentions no other run's question
+        text = repr([e["data"] for e in events])
+        others = [t for t in TOPICS if t != topic and t in text]
+        assert not others, f"{topic} run log mentions {others}"
+        # Result counts are this run's max_results, not another run's
+        counts = [e["data"]["count"] for e in events if e["step"] == "tool_search_result"]
+        assert counts and set(counts) == {run.max_results}
+        urls = " ".join(s["url"] for s in run.sources)
+        assert run.sources and not [t for t in TOPICS if t != topic and t in urls]
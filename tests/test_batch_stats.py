@@ -0,0 +1,60 @@
+import os
+import sys
+import asyncio
+import tempfile
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+# The agent modules read their config at import time
+os.environ["THINKING_LOG_PATH"] = os.path.join(tempfile.mkdtemp(prefix="tlog-"), "thinking_log.jsonl")
+os.environ["CHECKPOINTS"] = "0"
+os.environ["KNOWLEDGE_INDEX"] = "0"
+
+import bench  # noqa: E402
+
+bench.prepare_env(offline=True)
+
+import batch  # noqa: E402
+import main_langchain  # noqa: E402
+from deadline import STAGE_PRIOR_S, StageCosts  # noqa: E402
+
+
+class FixedCosts(StageCosts):
+    """Stage estimates that measurements do not change, so deadline decisions are predictable."""
+
+    def observe(self, stage, seconds):
+        pass
+
+
+def never_enough(question, sources):
+    return {"score": 0.0, "evaluation": "DECISION: NO\nGAPS: Need more detail."}
+
+
+def answer(monkeypatch, **run_kwargs):
+    # Every iteration ends NO, decided locally, so only the iteration limit or the deadline stops the loop
+    monkeypatch.setattr(main_langchain, "pre_evaluate", never_enough)
+    backend = bench.SyntheticBackend(llm_latency_ms=5, search_latency_ms=5)
+    kwargs = {
+        "llm": bench.make_chat_model(backend),
+        "search_tool": bench.BackendTavilyClient(backend),
+        "bypass_cache": True,
+        **run_kwargs,
+    }
+    record = asyncio.run(batch.answer_one({"id": "q", "question": "How do tidal power plants store energy?"}, kwargs))
+    assert record["error"] is None
+    return record["stats"]
+
+
+def test_iteration_limit_reports_iterations_run(monkeypatch):
+    stats = answer(monkeypatch, max_iterations=3)
+    assert stats["stop_reason"] == "max_iterations_reached"
+    assert stats["iterations"] == 3
+
+
+def test_deadline_stop_reports_iterations_run(monkeypatch):
+    monkeypatch.setattr("deadline._costs", FixedCosts(priors={stage: 5.0 for stage in STAGE_PRIOR_S}))
+    stats = answer(monkeypatch, max_iterations=3, deadline_s=8)
+    # Iteration 1 ran; iteration 2 (search + eval, then synthesis) would not fit
+    assert stats["stop_reason"] == "deadline"
+    assert stats["iterations"] == 1
@@ -0,0 +1,40 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from context_packer import pack_context  # noqa: E402
+from textutil import estimate_tokens  # noqa: E402
+
+QUESTION = "How efficient are perovskite solar cells?"
+LONG = "Perovskite solar cells reached record efficiency " + "in certified laboratory tests " * 60 + "this year."
+
+
+def test_oversized_best_passage_is_trimmed_not_dropped():
+    sources = [{"title": "Perovskite efficiency record", "url": "https://a.example/p", "content": LONG}]
+    text, stats = pack_context(QUESTION, sources, 120)
+
+    assert stats["sources_used"] == 1 and stats["passages_trimmed"] == 1
+    assert text.startswith("[1] Perovskite efficiency record") and "Perovskite solar cells reached" in text
+    assert text.endswith("…")
+    assert stats["tokens"] <= 120
+
+
+def test_trimming_leaves_room_for_other_sources():
+    sources = [
+        {"title": "Perovskite efficiency record", "url": "https://a.example/p", "content": LONG},
+        {"title": "Solar cell review", "url": "https://b.example/r", "content": "Perovskite solar cells degrade in humid air."},
+        {"title": "Silicon cells", "url": "https://c.example/s", "content": "Silicon solar cells are about 22 percent efficient."},
+    ]
+    text, stats = pack_context(QUESTION, sources, 150)
+
+    assert stats["sources_used"] == 3
+    assert stats["passages_trimmed"] == 1
+    assert estimate_tokens(text) <= 150
+
+
+def test_fitting_passages_are_untouched():
+    sources = [{"title": "Short", "url": "https://a.example/s", "content": "Perovskite cells are efficient. They are cheap."}]
+    text, stats = pack_context(QUESTION, sources, 500)
+    assert stats["passages_trimmed"] == 0
+    assert text.endswith("Perovskite cells are efficient. They are cheap.")
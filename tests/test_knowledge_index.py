@@ -0,0 +1,35 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dedup import canonicalize_url  # noqa: E402
+from knowledge_index import KnowledgeIndex  # noqa: E402
+
+DOCS = [
+    {
+        "title": f"Solid-state battery density report {n}",
+        "url": f"http://www.example.com/battery/{n}/amp?b=2&a=1",
+        "content": "Solid-state battery energy density compared with lithium-ion cells.",
+    }
+    for n in range(4)
+]
+
+
+def make_index(tmp_path):
+    index = KnowledgeIndex(path=str(tmp_path / "knowledge.sqlite3"))
+    index.add(DOCS)
+    return index
+
+
+def test_serves_original_urls(tmp_path):
+    index = make_index(tmp_path)
+    served = {d["url"] for d in index.search("solid-state battery density", 4)}
+    assert served == {d["url"] for d in DOCS}
+
+
+def test_excludes_urls_the_run_already_has(tmp_path):
+    index = make_index(tmp_path)
+    have = {canonicalize_url(d["url"]) for d in DOCS[:3]}
+    served = index.search("solid-state battery density", 4, exclude=have)
+    assert [d["url"] for d in served] == [DOCS[3]["url"]]
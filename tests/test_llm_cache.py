@@ -0,0 +1,52 @@
+import os
+import sys
+import time
+import sqlite3
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_cache import LLMCache  # noqa: E402
+
+
+def rows(path):
+    with sqlite3.connect(path) as db:
+        return [k for (k,) in db.execute("SELECT key FROM llm_cache ORDER BY key")]
+
+
+def test_disk_rows_are_bounded_lru(tmp_path):
+    path = str(tmp_path / "llm.sqlite3")
+    cache = LLMCache(max_entries=1, path=path, chains="all", disk_max_entries=3)
+    for n in range(3):
+        cache.put("plan", f"k{n}", f"v{n}")
+        time.sleep(0.01)  # distinct access times
+    cache._memory.clear()
+    assert cache.get("plan", "k0") == "v0"  # disk hit refreshes k0
+    cache.put("plan", "k3", "v3")
+
+    assert rows(path) == ["k0", "k2", "k3"]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_expired_rows_are_pruned(tmp_path):
+    path = str(tmp_path / "llm.sqlite3")
+    cache = LLMCache(max_entries=1, path=path, chains="all", ttl_s=60)
+    cache.put("plan", "old", "stale")
+    with sqlite3.connect(path) as db:
+        db.execute("UPDATE llm_cache SET created_at = ?", (time.time() - 120,))
+    cache._memory.clear()
+
+    assert cache.get("plan", "old") is None
+    cache.put("plan", "new", "fresh")
+    assert rows(path) == ["new"]
+
+
+def test_upgrades_tables_without_last_access(tmp_path):
+    path = str(tmp_path / "llm.sqlite3")
+    with sqlite3.connect(path) as db:
+        db.execute("CREATE TABLE llm_cache (key TEXT PRIMARY KEY, chain TEXT NOT NULL, value TEXT NOT NULL, created_at REAL NOT NULL)")
+        db.execute("INSERT INTO llm_cache VALUES ('k', 'plan', 'v', ?)", (time.time(),))
+
+    cache = LLMCache(path=path, chains="all")
+    assert cache.get("plan", "k") == "v"
+    cache.put("plan", "k2", "v2")
+    assert rows(path) == ["k", "k2"]
@@ -0,0 +1,119 @@
+import os
+import sys
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import page_fetch  # noqa: E402
+from page_fetch import ChunkSelector, enrich_sources, fetch_chunks  # noqa: E402
+
+QUERY = "glacier melt rates"
+FILLER = "the committee met on tuesday and discussed parking budgets for next year "
+
+LATIN1_PAGE = (
+    "<html><head><title>ignored</title><script>var glacier = 1;</script></head><body>"
+    "<p>Glacier melt rates near the Café Müller station doubled, the crème of the survey team said "
+    "after measuring ice loss on every slope of the valley this summer.</p></body></html>"
+)
+
+PAGES = {
+    "/latin1": ("text/html; charset=iso-8859-1", LATIN1_PAGE.encode("iso-8859-1")),
+    "/big": ("text/plain", ("glacier melt rates " + FILLER * 40).encode("utf-8") * 200),
+    "/image": ("image/png", b"\x89PNG\r\n\x1a\n" + b"\0" * 64),
+}
+
+
+class PageHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        page = PAGES.get(self.path)
+        if page is None:
+            self.send_error(404)
+            return
+        ctype, body = page
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the fetcher stops reading at its byte cap
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def site():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), PageHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def closed_port_url():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    return f"http://127.0.0.1:{port}/gone"
+
+
+def test_decodes_declared_charset(site):
+    page = fetch_chunks(f"{site}/latin1", QUERY)
+    text = " ".join(page["chunks"])
+    assert "Café Müller" in text and "crème" in text
+    assert "var glacier" not in text  # script text is not page text
+    assert not page["truncated"]
+
+
+def test_stops_reading_at_byte_cap(site, monkeypatch):
+    monkeypatch.setattr(page_fetch, "PAGE_MAX_BYTES", 64 * 1024)
+    page = fetch_chunks(f"{site}/big", QUERY)
+    assert page["truncated"]
+    assert 64 * 1024 <= page["bytes"] < 64 * 1024 + page_fetch._READ_SIZE
+    assert page["chunks"]
+
+
+def test_non_text_content_is_skipped(site):
+    with pytest.raises(ValueError, match="image/png"):
+        fetch_chunks(f"{site}/image", QUERY)
+
+
+def test_unreadable_pages_keep_their_snippet(site, closed_port_url):
+    sources = [
+        {"title": "missing", "url": f"{site}/missing", "content": "snippet one"},
+        {"title": "image", "url": f"{site}/image", "content": "snippet two"},
+        {"title": "down", "url": closed_port_url, "content": "snippet three"},
+        {"title": "good", "url": f"{site}/latin1", "content": "snippet four"},
+    ]
+    enriched, stats = enrich_sources(QUERY, sources)
+
+    assert [s["content"] for s in enriched[:3]] == ["snippet one", "snippet two", "snippet three"]
+    assert enriched[3]["content"].startswith("snippet four\n") and "Café" in enriched[3]["content"]
+    assert stats["fetched"] == 1 and stats["failed"] == 3
+    assert any("404" in e["error"] for e in stats["errors"])
+
+
+def test_keeps_best_chunks_in_document_order():
+    selector = ChunkSelector({"glacier", "melt", "rates"}, chunk_words=20, keep=2)
+    leads = [
+        "glacier ",  # 1 term
+        "",  # no terms: never kept
+        "glacier melt rates ",  # 3 terms
+        "glacier melt ",  # 2 terms
+        "melt ",  # 1 term
+    ]
+    for lead in leads:
+        selector.add(" ".join((lead + FILLER * 2).split()[:20]))  # exactly one chunk each
+    kept = selector.close()
+
+    assert selector.chunks_seen == len(leads)
+    assert [c.split()[:3] for c in kept] == [["glacier", "melt", "rates"], ["glacier", "melt", "the"]]
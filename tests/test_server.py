@@ -0,0 +1,129 @@
+import os
+import sys
+import json
+import time
+import tempfile
+import threading
+import urllib.error
+import urllib.request
+from types import SimpleNamespace
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+# The agent modules read their config at import time
+os.environ["THINKING_LOG_PATH"] = os.path.join(tempfile.mkdtemp(prefix="tlog-"), "thinking_log.jsonl")
+os.environ["CHECKPOINTS"] = "0"
+os.environ["KNOWLEDGE_INDEX"] = "0"
+
+import server  # noqa: E402
+
+OFFLINE = SimpleNamespace(llm_latency_ms=10, search_latency_ms=10)
+
+
+def serve(jobs):
+    httpd = server.make_server("127.0.0.1", 0, jobs)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd, f"http://127.0.0.1:{httpd.server_address[1]}"
+
+
+@pytest.fixture
+def start():
+    servers = []
+
+    def _start(**queue_kwargs):
+        httpd, base = serve(server.JobQueue(**queue_kwargs))
+        servers.append(httpd)
+        return base
+
+    yield _start
+    for httpd in servers:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def request(method, url, body=None):
+    data = body if isinstance(body, bytes) or body is None else json.dumps(body).encode("utf-8")
+    req = urllib.request.Request(url, data=data, method=method, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=10) as resp:
+            return resp.status, json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def read_events(url):
+    """(kind, data) pairs of an SSE stream, up to and including its end event."""
+    events, kind = [], None
+    with urllib.request.urlopen(url, timeout=30) as resp:
+        for raw in resp:
+            line = raw.decode("utf-8").rstrip("\n")
+            if line.startswith("event: "):
+                kind = line[len("event: "):]
+            elif line.startswith("data: "):
+                events.append((kind, json.loads(line[len("data: "):])))
+                if kind == "end":
+                    return events
+    return events
+
+
+def test_job_runs_and_streams_to_its_final_status(start):
+    base = start(workers=2, max_queue=4, run_factory=server._offline_factory(OFFLINE))
+
+    status, job = request("POST", f"{base}/jobs", {"question": "How do heat pumps work?", "max_iterations": 2})
+    assert status == 202 and job["status"] == "queued"
+
+    events = read_events(f"{base}/jobs/{job['job_id']}/events")
+    kinds = [kind for kind, _ in events]
+    assert [data["status"] for kind, data in events if kind == "status"][:2] == ["queued", "running"]
+    assert "log" in kinds and "token" in kinds
+    assert kinds.index("token") > kinds.index("log")
+    final_kind, final = events[-2]
+    assert kinds[-1] == "end" and final_kind == "status"
+    assert final["status"] == "done" and final["answer"]
+    assert kinds.count("end") == 1
+
+    status, polled = request("GET", f"{base}/jobs/{job['job_id']}")
+    assert status == 200
+    assert polled["status"] == "done"
+    assert polled["answer"] == final["answer"]
+    assert polled["run_id"] == final["run_id"]
+
+
+def test_bad_bodies_are_rejected(start):
+    base = start(workers=1, max_queue=1, run_factory=server._offline_factory(OFFLINE))
+
+    for body in (b"not json", b"[1, 2]", {"question": "  "}, {"question": "q", "mode": "Slow"},
+                 {"question": "q", "max_iterations": "many"}, {"question": "q", "fetch_pages": "yes"}):
+        status, payload = request("POST", f"{base}/jobs", body)
+        assert status == 400, body
+        assert payload["error"]
+    assert request("GET", f"{base}/healthz")[1]["submitted"] == 0
+
+
+def test_full_queue_answers_429(start):
+    factory = server._offline_factory(OFFLINE)
+    gate = threading.Event()
+
+    def gated(question, params):
+        gate.wait(10)  # hold the only worker so the queue fills up
+        return factory(question, params)
+
+    base = start(workers=1, max_queue=1, run_factory=gated)
+    try:
+        first = request("POST", f"{base}/jobs", {"question": "first question"})
+        for _ in range(200):
+            if request("GET", f"{base}/healthz")[1]["running"] == 1:
+                break
+            time.sleep(0.01)
+        second = request("POST", f"{base}/jobs", {"question": "second question"})
+        status, payload = request("POST", f"{base}/jobs", {"question": "third question"})
+    finally:
+        gate.set()
+
+    assert first[0] == 202 and second[0] == 202
+    assert second[1]["position"] == 1
+    assert status == 429
+    assert payload["error"] == "queue full" and payload["rejected"] == 1
@@ -0,0 +1,67 @@
+import os
+import sys
+import asyncio
+import tempfile
+import threading
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+# The agent modules read their config at import time
+os.environ["THINKING_LOG_PATH"] = os.path.join(tempfile.mkdtemp(prefix="tlog-"), "thinking_log.jsonl")
+os.environ["CHECKPOINTS"] = "0"
+os.environ["KNOWLEDGE_INDEX"] = "0"
+
+import bench  # noqa: E402
+
+bench.prepare_env(offline=True)
+
+import main_langchain  # noqa: E402
+
+
+class GatedSearch:
+    """Search tool whose calls block until the gate opens; records the queries it was asked."""
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.queries = []
+
+    def search(self, query, max_results=5, **kwargs):
+        self.queries.append(query)
+        self.gate.wait(5)
+        return {"results": [{"title": query, "url": f"https://example.com/{len(self.queries)}", "content": query}]}
+
+
+def test_discarded_speculation_stops_its_search(monkeypatch):
+    monkeypatch.setattr(main_langchain, "SPECULATE_SEARCH", True)
+    monkeypatch.setattr("fanout.SEARCH_WORKERS", 1)  # one query at a time, so later ones are still pending
+    backend = bench.SyntheticBackend(llm_latency_ms=1, search_latency_ms=1)
+    tool = GatedSearch()
+    run = main_langchain.AgentRun(
+        "How do tidal power plants store energy?",
+        quiet=True,
+        fanout=3,
+        bypass_cache=True,
+        llm=bench.make_chat_model(backend),
+        search_tool=tool,
+    )
+
+    async def scenario():
+        task = asyncio.create_task(main_langchain._speculate(run, "tidal power", "DECISION: NO\nGAPS: storage."))
+        while not tool.queries:
+            await asyncio.sleep(0.01)
+        spec = task.result()
+        drafted = await main_langchain._reconcile(run, task, "DECISION: YES\nGAPS: None", 1)
+        assert spec["stop"].is_set() and spec["search"].done()
+        tool.gate.set()  # let the in-flight query finish
+        await asyncio.sleep(0.2)
+        return spec, drafted
+
+    spec, drafted = asyncio.run(scenario())
+    assert drafted is None
+    assert len(spec["queries"]) > 1
+    assert len(tool.queries) == 1  # the rest of the draft's queries never started
+    calls = [e for e in run.thinking_log if e["step"] == "tool_search_call"]
+    assert len(calls) == 1
+    outcome = [e["data"] for e in run.thinking_log if e["step"] == "speculation"]
+    assert outcome and outcome[0]["outcome"] == "discarded"
@@ -0,0 +1,90 @@
+import os
+import sys
+import asyncio
+import tempfile
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+# The agent modules read their config at import time
+os.environ["THINKING_LOG_PATH"] = os.path.join(tempfile.mkdtemp(prefix="tlog-"), "thinking_log.jsonl")
+os.environ["CHECKPOINTS"] = "0"
+os.environ["KNOWLEDGE_INDEX"] = "0"
+
+import bench  # noqa: E402
+
+bench.prepare_env(offline=True)
+
+import main_langchain  # noqa: E402
+from langchain_core.language_models.chat_models import BaseChatModel  # noqa: E402
+from langchain_core.messages import AIMessage, AIMessageChunk  # noqa: E402
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult  # noqa: E402
+from rate_limit import get_limiter  # noqa: E402
+
+TOKENS = [f"word{n} " for n in range(10)]
+
+
+class SlowStreamModel(BaseChatModel):
+    """Streams TOKENS one every `gap_s`; the first `stall_attempts` streams hang before any token."""
+
+    gap_s: float = 0.1
+    stall_attempts: int = 0
+    attempts: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "slow-stream"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(TOKENS)))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        self.attempts += 1
+        if self.attempts <= self.stall_attempts:
+            await asyncio.sleep(10)
+        for token in TOKENS:
+            await asyncio.sleep(self.gap_s)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+
+@pytest.fixture
+def groq_limiter():
+    limiter = get_limiter("groq")
+    saved = limiter.timeout_s
+    yield limiter
+    limiter.timeout_s = saved
+
+
+def stream_synth(llm):
+    run = main_langchain.AgentRun("Why is the sky blue?", quiet=True, llm=llm, search_tool=object())
+    shown = []
+    inputs = {"question": run.question, "all_sources": "", "length_target": "short"}
+    coro = main_langchain.acall_chain("synth", inputs, run=run, on_token=shown.append)
+    return run, shown, coro
+
+
+def test_timeout_mid_stream_is_not_replayed(groq_limiter):
+    groq_limiter.timeout_s = 0.45  # a few tokens in, well before the stream ends
+    llm = SlowStreamModel()
+    run, shown, coro = stream_synth(llm)
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(coro)
+
+    assert llm.attempts == 1
+    assert shown and len(shown) < len(TOKENS)
+    assert shown == TOKENS[: len(shown)]  # every token shown once, in order
+    assert not [e for e in run.thinking_log if e["step"] == "retry"]
+
+
+def test_timeout_before_first_token_is_retried(groq_limiter, monkeypatch):
+    monkeypatch.setattr("rate_limit.BACKOFF_BASE_S", 0.01)
+    groq_limiter.timeout_s = 2.0
+    llm = SlowStreamModel(gap_s=0.01, stall_attempts=1)
+    run, shown, coro = stream_synth(llm)
+
+    assert asyncio.run(coro) == "".join(TOKENS)
+    assert llm.attempts == 2
+    assert shown == TOKENS
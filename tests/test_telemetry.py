@@ -0,0 +1,24 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telemetry import RunMetrics  # noqa: E402
+
+
+def test_llm_calls_count_only_model_spans():
+    metrics = RunMetrics()
+    with metrics.span("plan", llm=True, model="m"):
+        pass
+    with metrics.span("synth", llm=True, model="m", cached=True):
+        pass
+    with metrics.span("search", result_count=5):
+        pass
+    for _ in range(3):
+        with metrics.span("fetch", result_count=2):
+            pass
+
+    summary = metrics.summary()
+    assert summary["llm_calls"] == 1  # the cached synth and the page fetches are not model calls
+    assert summary["search_calls"] == 1
+    assert summary["stages"]["fetch"]["calls"] == 3
@@ -0,0 +1,34 @@
+import re
+from typing import List
+
+_WORD = re.compile(r"[a-z0-9]+(?:[.'-][a-z0-9]+)*")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(\[])")
+
+STOPWORDS = frozenset(
+    """a about above after again against all am an and any are as at be because been before being
+    below between both but by can could did do does doing down during each few for from further had
+    has have having he her here hers herself him himself his how i if in into is it its itself just
+    me more most my myself no nor not now of off on once only or other our ours ourselves out over
+    own same she should so some such than that the their theirs them themselves then there these they
+    this those through to too under until up very was we were what when where which while who whom
+    why will with would you your yours yourself yourselves""".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens (keeps things like 2025, gpt-4, u.s)."""
+    return _WORD.findall((text or "").lower())
+
+
+def content_terms(text: str) -> List[str]:
+    """Tokens minus stopwords — what relevance scoring should look at."""
+    return [t for t in tokenize(text) if t not in STOPWORDS]
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s.strip() for s in _SENTENCE_END.split(" ".join((text or "").split())) if s.strip()]
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap LLM token estimate (~4 chars/token for English); no tokenizer dependency."""
+    return (len(text or "") + 3) // 4